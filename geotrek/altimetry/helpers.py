@@ -1,8 +1,12 @@
+import json
 import logging
+import os
+import shutil
 
+import numpy as np
 import pygal
 from django.conf import settings
-from django.contrib.gis.geos import GEOSGeometry, LineString
+from django.contrib.gis.geos import GEOSGeometry
 from django.db import connection
 from django.utils import translation
 from django.utils.translation import get_language
@@ -17,6 +21,9 @@ class AltimetryHelper:
     def elevation_profile(cls, geometry3d, precision=None, offset=0):
         """Extract elevation profile from a 3D geometry.
 
+        Distances from origin are computed in 2D from the geometry coordinates,
+        which are already sampled by the database triggers (see ``ft_drape_line``).
+
         :precision:  geometry sampling in meters
         """
         precision = precision or settings.ALTIMETRIC_PROFILE_PRECISION
@@ -24,33 +31,27 @@ class AltimetryHelper:
         if geometry3d.geom_type == "Point":
             return [[0, geometry3d.x, geometry3d.y, geometry3d.z]]
 
+        geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
         if geometry3d.geom_type == "MultiLineString":
-            profile = []
-            for subcoords in geometry3d.coords:
-                subline = LineString(subcoords, srid=geometry3d.srid)
-                offset += subline.length
-                subprofile = AltimetryHelper.elevation_profile(
-                    subline, precision, offset
-                )
-                profile.extend(subprofile)
-            return profile
+            lines = zip(geometry3d.coords, geom3dapi.coords)
+        else:
+            lines = [(geometry3d.coords, geom3dapi.coords)]
 
-        # Add measure to 2D version of geometry3d
-        # Get distance from origin for each vertex
-        sql = f"""
-        WITH line2d AS (SELECT ST_Force2D('{geometry3d.ewkt}'::geometry) AS geom),
-             line_measure AS (SELECT ST_Addmeasure(geom, 0, ST_length(geom)) AS geom FROM line2d),
-             points2dm AS (SELECT (ST_DumpPoints(geom)).geom AS point FROM line_measure)
-        SELECT ({offset} + ST_M(point)) FROM points2dm;
-        """
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        pointsm = cursor.fetchall()
-        # Join (offset+distance, x, y, z) together
-        geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
-        assert len(pointsm) == len(geom3dapi.coords), "Cannot map distance to xyz"
-        dxyz = [pointsm[i] + v for i, v in enumerate(geom3dapi.coords)]
-        return dxyz
+        profile = []
+        for coords, coords_api in lines:
+            xy = np.array(coords)[:, :2]
+            lengths = np.hypot(*np.diff(xy, axis=0).T)
+            # Each sub-line of a MultiLineString is offset by the length of the
+            # previous ones, including its own
+            if geometry3d.geom_type == "MultiLineString":
+                offset += lengths.sum()
+            distances = offset + np.concatenate(([0.0], np.cumsum(lengths)))
+            # Join (offset+distance, x, y, z) together
+            profile.extend(
+                (distance, *xyz)
+                for distance, xyz in zip(distances.tolist(), coords_api, strict=True)
+            )
+        return profile
 
     @classmethod
     def altimetry_limits(cls, profile):
@@ -129,6 +130,53 @@ class AltimetryHelper:
         )
         return (xmin, ymin, xmax, ymax)
 
+    @classmethod
+    def elevation_area_path(cls, name):
+        """Path (without extension) of a stored elevation area."""
+        return os.path.join(settings.CACHE_ROOT, "elevation_areas", name)
+
+    @classmethod
+    def save_elevation_area(cls, area, path, date_update):
+        """
+        Store an elevation area on disk: altitudes as an int16 grid (.npy),
+        and the other values as JSON, with the `date_update` of the object
+        it was computed for.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        metadata = {key: value for key, value in area.items() if key != "altitudes"}
+        metadata["date_update"] = date_update.isoformat()
+        with open(f"{path}.npy.tmp", "wb") as f:
+            np.save(f, np.rint(area["altitudes"]).astype(np.int16))
+        with open(f"{path}.json.tmp", "w") as f:
+            json.dump(metadata, f)
+        os.replace(f"{path}.npy.tmp", f"{path}.npy")
+        # Written last: its date_update tells if the area is up to date
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+    @classmethod
+    def load_elevation_area(cls, path, date_update):
+        """
+        Load an elevation area stored on disk, if it was computed for an object
+        updated at `date_update`. Returns None otherwise.
+        """
+        if date_update is None:
+            return None
+        try:
+            with open(f"{path}.json") as f:
+                area = json.load(f)
+            if area.pop("date_update", None) != date_update.isoformat():
+                return None
+            altitudes = np.load(f"{path}.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        area["altitudes"] = altitudes.tolist()
+        return area
+
+    @classmethod
+    def clear_elevation_areas(cls):
+        """Remove stored elevation areas (e.g. when the DEM changes)."""
+        shutil.rmtree(cls.elevation_area_path(""), ignore_errors=True)
+
     @classmethod
     def elevation_area(cls, geom):
         xmin, ymin, xmax, ymax = cls._nice_extent(geom)
@@ -1,5 +1,6 @@
 import os.path
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import PIPE, call
 
 from django.apps import apps
@@ -7,13 +8,38 @@ from django.conf import settings
 from django.contrib.gis.gdal import GDALRaster
 from django.contrib.gis.gdal.error import GDALException
 from django.core.management.base import BaseCommand, CommandError
-from django.db import connection
+from django.db import DatabaseError, connection, connections, transaction
 from django.db.models import F
 
+from geotrek.altimetry.helpers import AltimetryHelper
 from geotrek.altimetry.models import AltimetryMixin, Dem
 from geotrek.core.models import Topology
 
 
+class CopyDataReader:
+    """
+    File-like object reading the data of a COPY statement from raster2pgsql
+    output, until the end-of-data marker.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.count = 0
+        self.finished = False
+
+    def read(self, size=-1):
+        if self.finished:
+            return b""
+        line = next(self.lines, b"\\.\n")
+        if line.rstrip(b"\r\n") == b"\\.":
+            self.finished = True
+            return b""
+        self.count += 1
+        return line
+
+    readline = read
+
+
 class Command(BaseCommand):
     help = "Load DEM data (projecting and clipping it if necessary).\n"
     help += "You may need to create a GDAL Virtual Raster if your DEM is "
@@ -40,6 +66,18 @@ class Command(BaseCommand):
             default=False,
             help="Update altimetry of all 3D geometries, /!\\ This option takes lot of time to perform",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of parallel workers used to update altimetry of 3D geometries.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of objects updated at once when updating altimetry of 3D geometries.",
+        )
 
     def handle(self, *args, **options):
         verbose = options["verbosity"] != 0
@@ -97,7 +135,8 @@ class Command(BaseCommand):
             self.stdout.write("Everything looks fine, we can start loading DEM\n")
 
         output = tempfile.NamedTemporaryFile()  # SQL code for raster creation
-        cmd = "raster2pgsql -a -M -t 100x100 {} altimetry_dem {}".format(
+        # Tiles are written with COPY statements (-Y), much faster than INSERTs
+        cmd = "raster2pgsql -a -M -t 100x100 -Y {} altimetry_dem {}".format(
             rst.name,
             "" if verbose else "2>/dev/null",
         )
@@ -124,11 +163,21 @@ class Command(BaseCommand):
         with connection.cursor() as cur:
             output.file.seek(0)
             for sql_line in output.file:
-                cur.execute(sql_line)
+                if not sql_line.strip():
+                    continue
+                if sql_line.startswith(b"COPY "):
+                    data = CopyDataReader(output.file)
+                    cur.copy_expert(sql_line.decode(), data)
+                    if verbose:
+                        self.stdout.write(f"{data.count} tiles loaded.\n")
+                else:
+                    cur.execute(sql_line)
 
         output.close()
         if verbose:
             self.stdout.write("DEM successfully loaded.\n")
+        # Elevation areas stored on disk were computed with the previous DEM
+        AltimetryHelper.clear_elevation_areas()
         if update_altimetry_paths:
             if verbose:
                 self.stdout.write("Updating 3d geometries.\n")
@@ -138,11 +187,82 @@ class Command(BaseCommand):
                 ] and issubclass(model, AltimetryMixin):
                     if settings.TREKKING_TOPOLOGY_ENABLED:
                         if not issubclass(model, Topology):
-                            model.objects.all().update(geom=F("geom"))
+                            self.update_altimetry(model, options, verbose)
                     else:
-                        model.objects.all().update(geom=F("geom"))
+                        self.update_altimetry(model, options, verbose)
         return
 
+    def update_geom_3d(self, model, pks):
+        """Update 3D geometries of a chunk of objects (computed by triggers)"""
+        with transaction.atomic():
+            model.objects.filter(pk__in=pks).update(geom=F("geom"))
+
+    def update_geom_3d_in_thread(self, model, pks):
+        try:
+            self.update_geom_3d(model, pks)
+        finally:
+            # Each thread uses its own database connection
+            connections.close_all()
+
+    def update_altimetry(self, model, options, verbose):
+        """
+        Update 3D geometries of all objects of a model, by chunks (in parallel
+        if several workers are used). Chunks which fail are tried again one by
+        one at the end, so that the update can be resumed after errors
+        (e.g. deadlocks between workers).
+        """
+        pks = list(model.objects.order_by("pk").values_list("pk", flat=True))
+        if not pks:
+            return
+        chunk_size = options["chunk_size"]
+        chunks = [pks[i : i + chunk_size] for i in range(0, len(pks), chunk_size)]
+        model_name = model._meta.model_name
+        failed_chunks = []
+        done = 0
+
+        def report(chunk, error):
+            nonlocal done
+            if error is not None:
+                failed_chunks.append(chunk)
+                if verbose:
+                    self.stderr.write(
+                        f"{model_name}: failed to update {len(chunk)} objects ({error}), will retry.\n"
+                    )
+                return
+            done += len(chunk)
+            if verbose:
+                self.stdout.write(f"{model_name}: {done}/{len(pks)} updated.\n")
+
+        if options["workers"] > 1:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                futures = [
+                    (
+                        chunk,
+                        executor.submit(self.update_geom_3d_in_thread, model, chunk),
+                    )
+                    for chunk in chunks
+                ]
+                for chunk, future in futures:
+                    report(chunk, future.exception())
+        else:
+            for chunk in chunks:
+                try:
+                    self.update_geom_3d(model, chunk)
+                except DatabaseError as e:
+                    report(chunk, e)
+                else:
+                    report(chunk, None)
+
+        for chunk in failed_chunks:
+            try:
+                self.update_geom_3d(model, chunk)
+            except DatabaseError as e:
+                msg = f"{model_name}: could not update objects {chunk[0]} to {chunk[-1]} ({e})"
+                raise CommandError(msg)
+            done += len(chunk)
+            if verbose:
+                self.stdout.write(f"{model_name}: {done}/{len(pks)} updated.\n")
+
     def call_command_system(self, cmd, **kwargs):
         return_code = call(cmd, **kwargs)
         return return_code
@@ -71,8 +71,21 @@ class AltimetryMixin(models.Model):
     def get_elevation_profile(self):
         return AltimetryHelper.elevation_profile(self.geom_3d)
 
+    def get_elevation_area_path(self):
+        return AltimetryHelper.elevation_area_path(f"{self._meta.model_name}-{self.pk}")
+
     def get_elevation_area(self):
-        return AltimetryHelper.elevation_area(self.geom)
+        """
+        Elevation area stored on disk, computed again from the DEM if the object
+        was updated since.
+        """
+        path = self.get_elevation_area_path()
+        area = AltimetryHelper.load_elevation_area(path, self.date_update)
+        if area is None:
+            area = AltimetryHelper.elevation_area(self.geom)
+            if area and self.date_update is not None:
+                AltimetryHelper.save_elevation_area(area, path, self.date_update)
+        return area
 
     def get_elevation_limits(self):
         return AltimetryHelper.altimetry_limits(self.get_elevation_profile())
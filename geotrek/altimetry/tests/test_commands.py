@@ -66,7 +66,9 @@ class CommandLoadDemTest(TransactionTestCase):
             geom=LineString((605600, 6650000), (605900, 6650010), srid=2154)
         )
         trek = TrekFactory.create(paths=[self.path], published=False)
-        with self.assertNumQueries(8):  # 5 for loaddem initial + path + outdoor (2)
+        with self.assertNumQueries(
+            8
+        ):  # 4 for loaddem initial + path (select and update) + outdoor (2 selects)
             call_command(
                 "loaddem",
                 filename,
@@ -99,8 +101,8 @@ class CommandLoadDemTest(TransactionTestCase):
             geom=LineString((605600, 6650000), (605900, 6650010), srid=2154)
         )
         with self.assertNumQueries(
-            23
-        ):  # 5 for loaddem initial + 17 with selects and update geom + 1 for PointTopologyTestModel
+            24
+        ):  # 4 for loaddem initial + 17 selects + 2 for topology and trek updates + 1 for PointTopologyTestModel
             call_command(
                 "loaddem",
                 filename,
@@ -198,3 +200,29 @@ class CommandLoadDemTest(TransactionTestCase):
         )
         value = dems.first()
         self.assertAlmostEqual(value.int, 343.600006103516)
+
+    @skipIf(
+        not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only"
+    )
+    def test_success_update_altimetry_with_workers(self):
+        output_stdout = StringIO()
+        filename = os.path.join(os.path.dirname(__file__), "data", "elevation.tif")
+        paths = [
+            PathFactory.create(
+                geom=LineString((605600, 6650000 + i), (605900, 6650010 + i), srid=2154)
+            )
+            for i in range(0, 300, 100)
+        ]
+        call_command(
+            "loaddem",
+            filename,
+            update_altimetry=True,
+            workers=2,
+            chunk_size=1,
+            verbosity=2,
+            stdout=output_stdout,
+        )
+        self.assertIn("path: 3/3 updated.", output_stdout.getvalue())
+        for path in paths:
+            path.refresh_from_db()
+            self.assertNotEqual(path.geom_3d.coords[-1][-1], 0)
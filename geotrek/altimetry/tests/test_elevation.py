@@ -1,9 +1,11 @@
+from datetime import timedelta
 from unittest import SkipTest, skipIf
 
 from django.conf import settings
 from django.contrib.gis.geos import LineString, MultiLineString, Point
 from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
 
 from geotrek.altimetry.helpers import AltimetryHelper
 from geotrek.common.tests.utils import LineStringInBounds
@@ -144,6 +146,19 @@ class ElevationProfileTest(TestCase):
 
         profile = AltimetryHelper.elevation_profile(geom)
         self.assertEqual(len(profile), 4)
+        self.assertAlmostEqual(profile[0][0], 1.0)
+        self.assertAlmostEqual(profile[1][0], 2.0)
+        self.assertAlmostEqual(profile[2][0], 3.5)
+        self.assertAlmostEqual(profile[3][0], 6.0)
+        self.assertEqual(profile[2][3], 6.0)
+
+    def test_elevation_profile_linestring_without_query(self):
+        geom = LineString((0, 0, 8), (3, 4, 10), (3, 10, 12), srid=settings.SRID)
+
+        with self.assertNumQueries(0):
+            profile = AltimetryHelper.elevation_profile(geom)
+        self.assertEqual([round(step[0], 6) for step in profile], [0.0, 5.0, 11.0])
+        self.assertEqual([step[3] for step in profile], [8.0, 10.0, 12.0])
 
     def test_elevation_profile_point(self):
         geom = Point(1.5, 2.5, 8, srid=settings.SRID)
@@ -243,6 +258,47 @@ class ElevationAreaTest(TestCase):
         self.assertEqual(extent["altitudes"]["min"], 0)
 
 
+class ElevationAreaStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        fill_raster()
+        cls.geom = LineString((100, 370), (1100, 370), srid=settings.SRID)
+        cls.area = AltimetryHelper.elevation_area(cls.geom)
+
+    def setUp(self):
+        self.path = AltimetryHelper.elevation_area_path("test-1")
+
+    def tearDown(self):
+        AltimetryHelper.clear_elevation_areas()
+
+    def test_stored_area_is_loaded(self):
+        date_update = timezone.now()
+        AltimetryHelper.save_elevation_area(self.area, self.path, date_update)
+        with self.assertNumQueries(0):
+            area = AltimetryHelper.load_elevation_area(self.path, date_update)
+        self.assertEqual(area, self.area)
+
+    def test_outdated_stored_area_is_not_loaded(self):
+        date_update = timezone.now()
+        AltimetryHelper.save_elevation_area(self.area, self.path, date_update)
+        area = AltimetryHelper.load_elevation_area(
+            self.path, date_update + timedelta(seconds=1)
+        )
+        self.assertIsNone(area)
+
+    def test_area_stored_for_a_newer_object_is_not_loaded(self):
+        date_update = timezone.now()
+        AltimetryHelper.save_elevation_area(self.area, self.path, date_update)
+        area = AltimetryHelper.load_elevation_area(
+            self.path, date_update - timedelta(seconds=1)
+        )
+        self.assertIsNone(area)
+
+    def test_missing_stored_area_is_not_loaded(self):
+        area = AltimetryHelper.load_elevation_area(self.path, timezone.now())
+        self.assertIsNone(area)
+
+
 class ElevationOtherGeomAreaTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class ApiConfig(AppConfig):
+    name = "geotrek.api"
+    verbose_name = _("API")
+
+    def ready(self):
+        import geotrek.api.v2.cache  # NOQA
@@ -1,22 +1,31 @@
 import argparse
 import filecmp
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
 import re
 import shutil
 import stat
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from io import StringIO
 from time import sleep
 from zipfile import ZipFile
 
 import cairosvg
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.core.management.base import BaseCommand, CommandError
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+from django.db import connections
 from django.db.models import Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
 from django.utils import translation
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 from modeltranslation.utils import build_localized_fieldname
 from PIL import Image
@@ -25,8 +34,9 @@ from geotrek.api.mobile.views.common import FlatPageViewSet, SettingsView
 from geotrek.api.mobile.views.trekking import TrekViewSet
 from geotrek.common import models as common_models
 from geotrek.common.functions import GeometryType
-from geotrek.common.helpers_sync import ZipTilesBuilder
+from geotrek.common.helpers_sync import FileLocks, ZipTilesBuilder
 from geotrek.common.models import FileType  # NOQA
+from geotrek.common.utils import intersecting_pks
 from geotrek.flatpages.models import MenuItem
 from geotrek.tourism import models as tourism_models
 from geotrek.tourism import urls
@@ -34,9 +44,75 @@ from geotrek.tourism import urls
 # Register mapentity models
 from geotrek.trekking import models as trekking_models
 from geotrek.trekking import urls  # NOQA
+from geotrek.zoning import models as zoning_models
 
 logger = logging.getLogger(__name__)
 
+# Written next to the synced data in --incremental mode
+MANIFEST_NAME = "sync_manifest.json"
+
+# Reference data changing the content of treks outputs
+MANIFEST_REFERENCE_MODELS = [
+    common_models.Label,
+    common_models.Theme,
+    trekking_models.Accessibility,
+    trekking_models.DifficultyLevel,
+    trekking_models.POIType,
+    trekking_models.Practice,
+    trekking_models.Route,
+    trekking_models.ServiceType,
+    trekking_models.TrekNetwork,
+    tourism_models.InformationDeskType,
+    tourism_models.TouristicContentCategory,
+    tourism_models.TouristicContentType,
+    tourism_models.TouristicEventType,
+    zoning_models.City,
+    zoning_models.District,
+]
+if "geotrek.sensitivity" in settings.INSTALLED_APPS:
+    from geotrek.sensitivity import models as sensitivity_models
+
+    MANIFEST_REFERENCE_MODELS += [
+        sensitivity_models.SportPractice,
+        sensitivity_models.Species,
+    ]
+
+# Settings changing the content of treks outputs
+MANIFEST_SETTINGS = (
+    "API_SRID",
+    "MEDIA_URL",
+    "MOBILE_NUMBER_PICTURES_SYNC",
+    "MOBILE_TILES_URL",
+    "MOBILE_TILES_EXTENSION",
+    "MOBILE_TILES_RADIUS_LARGE",
+    "MOBILE_TILES_RADIUS_SMALL",
+    "MOBILE_TILES_LOW_ZOOMS",
+    "MOBILE_TILES_HIGH_ZOOMS",
+    "THUMBNAIL_COPYRIGHT_FORMAT",
+    "THUMBNAIL_COPYRIGHT_SIZE",
+)
+
+# Command running in a media worker process (see Command.sync_treks_media_in_workers)
+_worker_command = None
+
+
+def _init_media_worker(command):
+    global _worker_command
+    _worker_command = command
+
+
+def _sync_trek_media_in_worker(trek_pk):
+    """
+    Build the archive of a trek in a worker process, and return its output
+    and whether it succeeded (the state of the forked command is not shared).
+    """
+    command = _worker_command
+    command.stdout = OutputWrapper(StringIO())
+    command.successfull = True
+    trek = trekking_models.Trek.objects.get(pk=trek_pk)
+    command.sync_trek_by_pk_media(trek)
+    return command.stdout._out.getvalue(), command.successfull
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -68,12 +144,158 @@ class Command(BaseCommand):
         parser.add_argument(
             "--indent", "-i", default=0, type=int, help="Indent json files"
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes used to build treks archives in parallel.",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            default=False,
+            help="Only generate again treks whose data changed since the last sync",
+        )
         parser.add_argument("--task", default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
         dirname = os.path.dirname(name)
         if not os.path.exists(dirname):
-            os.makedirs(dirname)
+            os.makedirs(dirname, exist_ok=True)
+
+    def get_references_state(self):
+        """
+        State of the reference data (categories and their pictograms, labels,
+        zoning) serialized with treks, from their last update and count.
+        """
+        references = {}
+        for model in MANIFEST_REFERENCE_MODELS:
+            if "date_update" in {field.name for field in model._meta.get_fields()}:
+                references[model._meta.label] = model.last_update_and_count
+            else:
+                references[model._meta.label] = list(
+                    model.objects.order_by("pk").values()
+                )
+        return references
+
+    def get_context_fingerprint(self):
+        """Fingerprint of the options and settings all outputs depend on."""
+        context = {
+            "version": settings.VERSION,
+            "languages": list(self.languages),
+            "portal": self.portal,
+            "url": self.referer,
+            "indent": self.indent,
+            "skip_tiles": self.skip_tiles,
+            "settings": {name: getattr(settings, name) for name in MANIFEST_SETTINGS},
+            "references": self.get_references_state(),
+        }
+        return hashlib.sha1(
+            json.dumps(context, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def get_trek_fingerprint(self, trek):
+        """
+        Fingerprint of the objects the outputs of a trek are built from (the trek,
+        its children, their POIs, touristic contents and events, sensitive areas,
+        information desks and attachments), computed from their `date_update`.
+        """
+        if trek.pk in self.fingerprints:
+            return self.fingerprints[trek.pk]
+        querysets = []
+        for obj in [trek, *trek.children]:
+            querysets += [
+                trekking_models.Trek.objects.filter(pk=obj.pk),
+                obj.pois.filter(published=True),
+                obj.touristic_contents.filter(published=True),
+                obj.touristic_events.filter(published=True),
+                obj.information_desks.all(),
+            ]
+            if "geotrek.sensitivity" in settings.INSTALLED_APPS:
+                querysets.append(obj.sensitive_areas.filter(published=True))
+        sources = []
+        pks_by_model = {}
+        for queryset in querysets:
+            label = queryset.model._meta.label
+            for pk, date_update in queryset.values_list("pk", "date_update"):
+                sources.append((label, pk, date_update.isoformat()))
+                pks_by_model.setdefault(queryset.model, set()).add(pk)
+        for model, pks in pks_by_model.items():
+            attachments = common_models.Attachment.objects.filter(
+                content_type=ContentType.objects.get_for_model(model),
+                object_id__in=pks,
+            )
+            for pk, date_update in attachments.values_list("pk", "date_update"):
+                sources.append(("common.Attachment", pk, date_update.isoformat()))
+        fingerprint = hashlib.sha1(
+            json.dumps(sorted(set(sources))).encode()
+        ).hexdigest()
+        self.fingerprints[trek.pk] = fingerprint
+        return fingerprint
+
+    def is_trek_unchanged(self, trek):
+        """Whether the sources of a trek outputs did not change since the last sync."""
+        if not self.incremental:
+            return False
+        # Always computed, so that the manifest lists every synced trek
+        fingerprint = self.get_trek_fingerprint(trek)
+        if not self.previous_manifest:
+            return False
+        if self.previous_manifest.get("context") != self.context_fingerprint:
+            return False
+        previous = self.previous_manifest.get("treks", {}).get(str(trek.pk))
+        return previous == fingerprint
+
+    def link_previous(self, name):
+        """Reuse a file (or directory) of the last sync. Return False if missing."""
+        src = os.path.join(self.dst_root, name)
+        dst = os.path.join(self.tmp_root, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, dst, copy_function=os.link)
+        elif os.path.isfile(src):
+            self.mkdirs(dst)
+            os.link(src, dst)
+        else:
+            return False
+        if self.verbosity == 2:
+            self.stdout.write(
+                f"\x1b[36m**\x1b[0m \x1b[1m{name}\x1b[0m \x1b[32munchanged\x1b[0m"
+            )
+        return True
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.dst_root, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self):
+        manifest = {
+            "context": self.context_fingerprint,
+            "treks": {str(pk): value for pk, value in self.fingerprints.items()},
+        }
+        with open(os.path.join(self.tmp_root, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, sort_keys=True)
+
+    def lock(self, *key):
+        """Lock shared by media workers (no-op when building archives serially)."""
+        if self.locks is None:
+            return nullcontext()
+        return self.locks(key)
+
+    def get_resized_pictures(self, obj):
+        # Pictures of POIs, contents or children treks can be shared between treks
+        with self.lock("pictures", obj._meta.label, obj.pk):
+            return obj.resized_pictures
+
+    def get_resized_picture(self, desk):
+        with self.lock("picture", desk._meta.label, desk.pk):
+            return desk.resized_picture
+
+    def prepare_elevation_chart(self, trek, lang):
+        with self.lock("elevation_chart", trek.pk, lang):
+            trek.prepare_elevation_chart(lang)
 
     def sync_view(
         self,
@@ -184,9 +406,49 @@ class Command(BaseCommand):
             **kwargs,
         )
 
+    @cached_property
+    def nearby_pks(self):
+        """
+        Objects near each trek, resolved once for all treks and languages
+        with one spatial join per kind of object, instead of once per trek.
+        """
+        treks = list(
+            trekking_models.Trek.objects.existing()
+            .annotate(geom_type=GeometryType("geom"))
+            .filter(geom_type="LINESTRING")
+            .select_related("practice")
+            .only("pk", "geom", "practice__distance")
+        )
+        nearby_pks = {
+            "touristic_contents": intersecting_pks(
+                tourism_models.TouristicContent, treks
+            ),
+            "touristic_events": intersecting_pks(tourism_models.TouristicEvent, treks),
+        }
+        if not settings.TREKKING_TOPOLOGY_ENABLED:
+            # POIs are found along the paths aggregations otherwise
+            pois = intersecting_pks(
+                trekking_models.POI,
+                treks,
+                distance=settings.TREK_POI_INTERSECTION_MARGIN,
+            )
+            excluded = {}
+            for (
+                trek_pk,
+                poi_pk,
+            ) in trekking_models.Trek.pois_excluded.through.objects.values_list(
+                "trek_id", "poi_id"
+            ):
+                excluded.setdefault(trek_pk, set()).add(poi_pk)
+            nearby_pks["pois"] = {
+                trek_pk: [pk for pk in pks if pk not in excluded.get(trek_pk, ())]
+                for trek_pk, pks in pois.items()
+            }
+        return nearby_pks
+
     def sync_trek_pois(self, lang, trek):
         params = {"format": "geojson", "root_pk": trek.pk}
-        view = TrekViewSet.as_view({"get": "pois"})
+        view = TrekViewSet.as_view({"get": "pois"}, nearby_pks=self.nearby_pks)
         name = os.path.join(lang, str(trek.pk), "pois.geojson")
         self.sync_view(lang, view, name, params=params, pk=trek.pk)
         # Sync POIs of children too
@@ -200,7 +462,9 @@ class Command(BaseCommand):
         params = {"format": "geojson", "root_pk": trek.pk}
         if self.portal:
             params["portal"] = ",".join(self.portal)
-        view = TrekViewSet.as_view({"get": "touristic_contents"})
+        view = TrekViewSet.as_view(
+            {"get": "touristic_contents"}, nearby_pks=self.nearby_pks
+        )
         name = os.path.join(lang, str(trek.pk), "touristic_contents.geojson")
         self.sync_view(lang, view, name, params=params, pk=trek.pk)
         # Sync contents of children too
@@ -216,7 +480,9 @@ class Command(BaseCommand):
         params = {"format": "geojson", "root_pk": trek.pk}
         if self.portal:
             params["portal"] = ",".join(self.portal)
-        view = TrekViewSet.as_view({"get": "touristic_events"})
+        view = TrekViewSet.as_view(
+            {"get": "touristic_events"}, nearby_pks=self.nearby_pks
+        )
         name = os.path.join(lang, str(trek.pk), "touristic_events.geojson")
         self.sync_view(lang, view, name, params=params, pk=trek.pk)
         # Sync events of children too
@@ -388,6 +654,10 @@ class Command(BaseCommand):
             treks = treks.filter(Q(portal__name__in=self.portal) | Q(portal=None))
 
         for trek in treks:
+            if self.is_trek_unchanged(trek) and self.link_previous(
+                os.path.join(lang, str(trek.pk))
+            ):
+                continue
             self.sync_geojson(
                 lang,
                 TrekViewSet,
@@ -439,8 +709,9 @@ class Command(BaseCommand):
         if not self.skip_tiles:
             self.sync_trek_tiles(trek, trekid_zipfile)
 
-        if trek.resized_pictures:
-            for picture, thdetail in trek.resized_pictures[
+        resized_pictures = self.get_resized_pictures(trek)
+        if resized_pictures:
+            for picture, thdetail in resized_pictures[
                 : settings.MOBILE_NUMBER_PICTURES_SYNC
             ]:
                 self.sync_media_file(
@@ -450,8 +721,9 @@ class Command(BaseCommand):
         for poi in trek.published_pois.annotate(geom_type=GeometryType("geom")).filter(
             geom_type="POINT"
         ):
-            if poi.resized_pictures:
-                for picture, thdetail in poi.resized_pictures[
+            resized_pictures = self.get_resized_pictures(poi)
+            if resized_pictures:
+                for picture, thdetail in resized_pictures[
                     : settings.MOBILE_NUMBER_PICTURES_SYNC
                 ]:
                     self.sync_media_file(
@@ -463,8 +735,9 @@ class Command(BaseCommand):
         for touristic_content in trek.published_touristic_contents.annotate(
             geom_type=GeometryType("geom")
         ).filter(geom_type="POINT"):
-            if touristic_content.resized_pictures:
-                for picture, thdetail in touristic_content.resized_pictures[
+            resized_pictures = self.get_resized_pictures(touristic_content)
+            if resized_pictures:
+                for picture, thdetail in resized_pictures[
                     : settings.MOBILE_NUMBER_PICTURES_SYNC
                 ]:
                     self.sync_media_file(
@@ -476,8 +749,9 @@ class Command(BaseCommand):
         for touristic_event in trek.published_touristic_events.annotate(
             geom_type=GeometryType("geom")
         ).filter(geom_type="POINT"):
-            if touristic_event.resized_pictures:
-                for picture, thdetail in touristic_event.resized_pictures[
+            resized_pictures = self.get_resized_pictures(touristic_event)
+            if resized_pictures:
+                for picture, thdetail in resized_pictures[
                     : settings.MOBILE_NUMBER_PICTURES_SYNC
                 ]:
                     self.sync_media_file(
@@ -492,15 +766,16 @@ class Command(BaseCommand):
             .annotate(geom_type=GeometryType("geom"))
             .filter(geom_type="POINT")
         ):
-            if desk.resized_picture:
+            resized_picture = self.get_resized_picture(desk)
+            if resized_picture:
                 self.sync_media_file(
-                    desk.resized_picture,
+                    resized_picture,
                     prefix=trek.pk,
                     directory=url_trek,
                     zipfile=trekid_zipfile,
                 )
         for lang in self.languages:
-            trek.prepare_elevation_chart(lang)
+            self.prepare_elevation_chart(trek, lang)
             url_media = f"/{trek.pk}{settings.MEDIA_URL}"
             self.sync_file(
                 trek.get_elevation_chart_url_png(lang),
@@ -513,7 +788,7 @@ class Command(BaseCommand):
         for child in trek.children.annotate(geom_type=GeometryType("geom")).filter(
             geom_type="LINESTRING"
         ):
-            for picture, resized in child.resized_pictures:
+            for picture, resized in self.get_resized_pictures(child):
                 self.sync_media_file(
                     resized, prefix=trek.pk, directory=url_trek, zipfile=trekid_zipfile
                 )
@@ -523,13 +798,13 @@ class Command(BaseCommand):
                 .filter(geom_type="POINT")
             ):
                 self.sync_media_file(
-                    desk.resized_picture,
+                    self.get_resized_picture(desk),
                     prefix=trek.pk,
                     directory=url_trek,
                     zipfile=trekid_zipfile,
                 )
             for lang in self.languages:
-                child.prepare_elevation_chart(lang)
+                self.prepare_elevation_chart(child, lang)
                 url_media = f"/{trek.pk}{settings.MEDIA_URL}"
                 self.sync_file(
                     child.get_elevation_chart_url_png(lang),
@@ -552,8 +827,46 @@ class Command(BaseCommand):
         if self.portal:
             treks = treks.filter(Q(portal__name__in=self.portal) | Q(portal=None))
 
-        for trek in treks:
-            self.sync_trek_by_pk_media(trek)
+        treks = [trek for trek in treks if not self.sync_unchanged_trek_media(trek)]
+        if self.workers > 1:
+            self.sync_treks_media_in_workers([trek.pk for trek in treks])
+        else:
+            for trek in treks:
+                self.sync_trek_by_pk_media(trek)
+
+    def sync_unchanged_trek_media(self, trek):
+        """Reuse the archive and the medias of a trek if it did not change."""
+        if not self.is_trek_unchanged(trek):
+            return False
+        if not self.link_previous(os.path.join("nolang", f"{trek.pk}.zip")):
+            return False
+        self.link_previous(os.path.join("nolang", str(trek.pk)))
+        return True
+
+    def sync_treks_media_in_workers(self, trek_pks):
+        """
+        Build treks archives in a pool of forked processes. Files shared by
+        several treks are produced under inter-process locks, and outputs
+        are written in the same order as in a serial sync.
+        """
+        # Forked processes must not share the database connection
+        connections.close_all()
+        with tempfile.TemporaryDirectory(dir=settings.TMP_DIR) as locks_dir:
+            self.locks = FileLocks(locks_dir)
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_media_worker,
+                    initargs=(self,),
+                ) as executor:
+                    for output, successfull in executor.map(
+                        _sync_trek_media_in_worker, trek_pks
+                    ):
+                        self.stdout.write(output, ending="")
+                        self.successfull = self.successfull and successfull
+            finally:
+                self.locks = None
 
     def sync_global_media(self):
         url_media_nolang = os.path.join("nolang")
@@ -641,23 +954,24 @@ class Command(BaseCommand):
             )
             self.stdout._out.flush()
 
-        def _radius2bbox(lng, lat, radius):
-            return (lng - radius, lat - radius, lng + radius, lat + radius)
-
         tiles = ZipTilesBuilder(
-            zipfile, prefix=f"/{trek.pk}/tiles/", **self.builder_args
+            zipfile,
+            prefix=f"/{trek.pk}/tiles/",
+            tiles_manager=self.tiles_manager,
+            lock=self.lock,
         )
 
-        geom = trek.geom
-        if geom.geom_type == "MultiLineString":
-            geom = geom[0]  # FIXME
-        geom.transform(4326)
-
-        for lng, lat in geom.coords:
-            large = _radius2bbox(lng, lat, settings.MOBILE_TILES_RADIUS_LARGE)
-            small = _radius2bbox(lng, lat, settings.MOBILE_TILES_RADIUS_SMALL)
-            tiles.add_coverage(bbox=large, zoomlevels=settings.MOBILE_TILES_LOW_ZOOMS)
-            tiles.add_coverage(bbox=small, zoomlevels=settings.MOBILE_TILES_HIGH_ZOOMS)
+        geom = trek.geom.transform(4326, clone=True)
+        tiles.add_geometry_coverage(
+            geom,
+            radius=settings.MOBILE_TILES_RADIUS_LARGE,
+            zoomlevels=settings.MOBILE_TILES_LOW_ZOOMS,
+        )
+        tiles.add_geometry_coverage(
+            geom,
+            radius=settings.MOBILE_TILES_RADIUS_SMALL,
+            zoomlevels=settings.MOBILE_TILES_HIGH_ZOOMS,
+        )
 
         tiles.run()
 
@@ -675,7 +989,9 @@ class Command(BaseCommand):
         logger.info("Global extent is %s", global_extent)
         logger.info("Build global tiles file...")
 
-        tiles = ZipTilesBuilder(zipfile, prefix="tiles/", **self.builder_args)
+        tiles = ZipTilesBuilder(
+            zipfile, prefix="tiles/", tiles_manager=self.tiles_manager
+        )
         tiles.add_coverage(
             bbox=global_extent, zoomlevels=settings.MOBILE_TILES_GLOBAL_ZOOMS
         )
@@ -713,7 +1029,11 @@ class Command(BaseCommand):
         if not os.path.exists(self.dst_root):
             return
         existing = set([os.path.basename(p) for p in os.listdir(self.dst_root)])
-        remaining = existing - {"nolang"} - set(settings.MODELTRANSLATION_LANGUAGES)
+        remaining = (
+            existing
+            - {"nolang", MANIFEST_NAME}
+            - set(settings.MODELTRANSLATION_LANGUAGES)
+        )
         if remaining:
             msg = "Destination directory contains extra data"
             raise CommandError(msg)
@@ -739,6 +1059,10 @@ class Command(BaseCommand):
         self.successfull = True
         self.verbosity = options["verbosity"]
         self.skip_tiles = options["skip_tiles"]
+        self.workers = options["workers"]
+        self.incremental = options["incremental"]
+        self.locks = None
+        self.fingerprints = {}
         self.indent = options["indent"]
         self.factory = RequestFactory()
         self.dst_root = options["path"].rstrip("/")
@@ -764,6 +1088,9 @@ class Command(BaseCommand):
             msg = "url parameter should start with http:// or https://"
             raise CommandError(msg)
         self.referer = options["url"]
+        if self.incremental:
+            self.context_fingerprint = self.get_context_fingerprint()
+            self.previous_manifest = self.load_manifest()
         if isinstance(settings.MOBILE_TILES_URL, str):
             tiles_url = settings.MOBILE_TILES_URL
         else:
@@ -774,6 +1101,12 @@ class Command(BaseCommand):
             "ignore_errors": True,
             "tiles_dir": settings.MOBILE_TILES_PATH,
         }
+        # Shared by all archives so that common tiles are fetched once per sync
+        self.tiles_manager = (
+            None
+            if self.skip_tiles
+            else ZipTilesBuilder.build_tiles_manager(**self.builder_args)
+        )
         sync_mobile_tmp_dir = tempfile.TemporaryDirectory(dir=settings.TMP_DIR).name
         if options["empty_tmp_folder"]:
             for dir in os.listdir(sync_mobile_tmp_dir):
@@ -786,6 +1119,9 @@ class Command(BaseCommand):
         with tempfile.TemporaryDirectory(dir=sync_mobile_tmp_dir) as tmp_dir:
             self.tmp_root = tmp_dir
             self.sync()
+            # A failed sync must not be trusted by the next incremental one
+            if self.incremental and self.successfull:
+                self.write_manifest()
             if self.celery_task:
                 self.celery_task.update_state(
                     state="PROGRESS",
@@ -9,6 +9,7 @@ from rest_framework_extensions.mixins import DetailSerializerMixin
 from geotrek.api.mobile.serializers import tourism as api_serializers_tourism
 from geotrek.api.mobile.serializers import trekking as api_serializers_trekking
 from geotrek.common.functions import EndPoint, StartPoint
+from geotrek.tourism import models as tourism_models
 from geotrek.trekking import models as trekking_models
 
 if "geotrek.sensitivity" in settings.INSTALLED_APPS:
@@ -25,6 +26,15 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [
         AllowAny,
     ]
+    # {property name: {trek pk: [pks]}}, resolved ahead for all treks by sync_mobile
+    nearby_pks = None
+
+    def get_nearby(self, trek, name, model):
+        """Objects of the given property of a trek (`pois`, `touristic_contents`…)"""
+        nearby_pks = (self.nearby_pks or {}).get(name, {})
+        if trek.pk in nearby_pks:
+            return model.objects.filter(pk__in=nearby_pks[trek.pk])
+        return getattr(trek, name)
 
     def get_queryset(self, *args, **kwargs):
         lang = self.request.LANGUAGE_CODE
@@ -51,16 +61,8 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
                 start_point=Transform(StartPoint("geom"), settings.API_SRID),
                 end_point=Transform(EndPoint("geom"), settings.API_SRID),
             )
-            .filter(
-                Q(**{f"published_{lang}": True})
-                | Q(
-                    **{
-                        f"trek_parents__parent__published_{lang}": True,
-                        "trek_parents__parent__deleted": False,
-                    }
-                )
-            )
-            .distinct()
+            # Published itself or as the child of a published trek
+            .filter(visible_langs__contains=[lang])
         )
 
     def get_serializer_context(self):
@@ -71,7 +73,8 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
         trek = self.get_object()
         root_pk = self.request.GET.get("root_pk") or trek.pk
         qs = (
-            trek.pois.filter(published=True)
+            self.get_nearby(trek, "pois", trekking_models.POI)
+            .filter(published=True)
             .select_related(
                 "topo_object",
                 "type",
@@ -89,7 +92,9 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
     def touristic_contents(self, request, *args, **kwargs):
         trek = self.get_object()
         root_pk = self.request.GET.get("root_pk") or trek.pk
-        qs = trek.touristic_contents.filter(published=True)
+        qs = self.get_nearby(
+            trek, "touristic_contents", tourism_models.TouristicContent
+        ).filter(published=True)
         if "portal" in self.request.GET:
             qs = qs.filter(
                 Q(portal__name__in=self.request.GET["portal"].split(","))
@@ -108,7 +113,9 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
     def touristic_events(self, request, *args, **kwargs):
         trek = self.get_object()
         root_pk = self.request.GET.get("root_pk") or trek.pk
-        qs = trek.trek.touristic_events.filter(published=True)
+        qs = self.get_nearby(
+            trek.trek, "touristic_events", tourism_models.TouristicEvent
+        ).filter(published=True)
         if "portal" in self.request.GET:
             qs = qs.filter(
                 Q(portal__name__in=self.request.GET["portal"].split(","))
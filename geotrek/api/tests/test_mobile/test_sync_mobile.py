@@ -1,6 +1,7 @@
 import errno
 import json
 import os
+import shutil
 import zipfile
 from io import StringIO
 from tempfile import mkdtemp
@@ -12,12 +13,14 @@ from django.core import management
 from django.core.management.base import CommandError
 from django.db.models import Q
 from django.http import HttpResponse, StreamingHttpResponse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.test.utils import override_settings
 from landez.sources import DownloadError
 from modeltranslation.utils import build_localized_fieldname
 from PIL import Image
 
+from geotrek.api.management.commands.sync_mobile import Command as SyncMobileCommand
+from geotrek.common.helpers_sync import ZipTilesBuilder
 from geotrek.common.tests.factories import (
     AttachmentFactory,
     AttachmentImageFactory,
@@ -240,6 +243,51 @@ class SyncMobileTilesTest(VarTmpTestCase):
         )
 
 
+class ZipTilesBuilderTest(TestCase):
+    def setUp(self):
+        self.builder_args = {
+            "tiles_url": "http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+            "tiles_dir": settings.MOBILE_TILES_PATH,
+        }
+
+    def test_geometry_coverage_follows_the_geometry(self):
+        tiles = ZipTilesBuilder(None, **self.builder_args)
+        geom = LineString((3.0, 44.0), (3.2, 44.2), srid=4326)
+        tiles.add_geometry_coverage(geom, radius=0.001, zoomlevels=[14])
+        bbox_tiles = set(tiles.tm.tileslist(geom.buffer(0.001).extent, [14]))
+        # A diagonal line does not need the tiles in the corners of its bbox
+        self.assertTrue(tiles.tiles)
+        self.assertTrue(tiles.tiles < bbox_tiles)
+
+    def test_geometry_coverage_multilinestring(self):
+        first = LineString((3.0, 44.0), (3.01, 44.0), srid=4326)
+        second = LineString((4.0, 45.0), (4.01, 45.0), srid=4326)
+        tiles = ZipTilesBuilder(None, **self.builder_args)
+        tiles.add_geometry_coverage(
+            MultiLineString(first, second, srid=4326), radius=0.001, zoomlevels=[12]
+        )
+        expected = set()
+        for line in (first, second):
+            line_tiles = ZipTilesBuilder(None, **self.builder_args)
+            line_tiles.add_geometry_coverage(line, radius=0.001, zoomlevels=[12])
+            self.assertTrue(line_tiles.tiles)
+            expected |= line_tiles.tiles
+        self.assertEqual(tiles.tiles, expected)
+
+    @mock.patch("landez.TilesManager.tile", side_effect=DownloadError)
+    def test_unavailable_tile_requested_once(self, mock_tile):
+        tiles_manager = ZipTilesBuilder.build_tiles_manager(**self.builder_args)
+        for name in ("1.zip", "2.zip"):
+            with zipfile.ZipFile(
+                os.path.join(mkdtemp(dir=settings.TMP_DIR), name), "w"
+            ) as zfile:
+                tiles = ZipTilesBuilder(zfile, tiles_manager=tiles_manager)
+                tiles.add_coverage(bbox=(3.0, 44.0, 3.001, 44.001), zoomlevels=[9])
+                tiles.run()
+                self.assertEqual(zfile.namelist(), [])
+        self.assertEqual(mock_tile.call_count, 1)
+
+
 class SyncMobileFailTest(VarTmpTestCase):
     def test_fail_directory_not_empty(self):
         os.makedirs(os.path.join(self.sync_directory, "other"))
@@ -1230,3 +1278,175 @@ class SyncMobileTreksTest(VarTmpTestCase):
             stdout=output,
         )
         self.assertIn("Done", output.getvalue())
+
+
+class SyncMobileIncrementalTest(VarTmpTestCase):
+    def setUp(self):
+        super().setUp()
+        self.trek_1 = TrekWithPublishedPOIsFactory.create(published_fr=True)
+        self.trek_2 = TrekWithPublishedPOIsFactory.create(published_fr=True)
+        AttachmentImageFactory.create(content_object=self.trek_1)
+
+    def sync(self):
+        management.call_command(
+            "sync_mobile",
+            self.sync_directory,
+            url="http://localhost:8000",
+            skip_tiles=True,
+            incremental=True,
+            languages="fr",
+            verbosity=0,
+        )
+
+    def inode(self, *path):
+        return os.stat(os.path.join(self.sync_directory, *path)).st_ino
+
+    def test_unchanged_treks_are_reused(self):
+        self.sync()
+        self.assertTrue(
+            os.path.exists(os.path.join(self.sync_directory, "sync_manifest.json"))
+        )
+        trek_1_files = [
+            ("fr", str(self.trek_1.pk), "trek.geojson"),
+            ("fr", str(self.trek_1.pk), "pois.geojson"),
+            ("nolang", f"{self.trek_1.pk}.zip"),
+        ]
+        inodes = [self.inode(*path) for path in trek_1_files]
+        trek_2_zip_inode = self.inode("nolang", f"{self.trek_2.pk}.zip")
+
+        self.trek_2.save()
+        self.sync()
+
+        self.assertEqual([self.inode(*path) for path in trek_1_files], inodes)
+        self.assertNotEqual(
+            self.inode("nolang", f"{self.trek_2.pk}.zip"), trek_2_zip_inode
+        )
+        # Medias of unchanged treks are kept too
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(
+                    self.sync_directory,
+                    "nolang",
+                    str(self.trek_1.pk),
+                    "media",
+                    "paperclip",
+                    "trekking_trek",
+                )
+            )
+        )
+
+    def test_first_sync_lists_all_treks_in_manifest(self):
+        self.sync()
+        with open(os.path.join(self.sync_directory, "sync_manifest.json")) as f:
+            manifest = json.load(f)
+        self.assertEqual(
+            set(manifest["treks"]), {str(self.trek_1.pk), str(self.trek_2.pk)}
+        )
+
+    def test_new_attachment_regenerates_trek(self):
+        self.sync()
+        inode = self.inode("nolang", f"{self.trek_2.pk}.zip")
+        AttachmentImageFactory.create(content_object=self.trek_2)
+        self.sync()
+        self.assertNotEqual(self.inode("nolang", f"{self.trek_2.pk}.zip"), inode)
+
+    def test_reference_data_change_regenerates_all_treks(self):
+        self.sync()
+        inode = self.inode("nolang", f"{self.trek_1.pk}.zip")
+        self.trek_1.difficulty.save()
+        self.sync()
+        self.assertNotEqual(self.inode("nolang", f"{self.trek_1.pk}.zip"), inode)
+
+    def test_options_change_regenerates_all_treks(self):
+        self.sync()
+        inode = self.inode("nolang", f"{self.trek_1.pk}.zip")
+        management.call_command(
+            "sync_mobile",
+            self.sync_directory,
+            url="http://localhost:8000",
+            skip_tiles=True,
+            incremental=True,
+            languages="fr",
+            indent=2,
+            verbosity=0,
+        )
+        self.assertNotEqual(self.inode("nolang", f"{self.trek_1.pk}.zip"), inode)
+        # The manifest written after a context change is used by the next sync
+        inode = self.inode("nolang", f"{self.trek_1.pk}.zip")
+        management.call_command(
+            "sync_mobile",
+            self.sync_directory,
+            url="http://localhost:8000",
+            skip_tiles=True,
+            incremental=True,
+            languages="fr",
+            indent=2,
+            verbosity=0,
+        )
+        self.assertEqual(self.inode("nolang", f"{self.trek_1.pk}.zip"), inode)
+
+
+class SyncMobileWorkersTest(TransactionTestCase):
+    """
+    Use of TransactionTestCase so that data is visible from the worker processes.
+    """
+
+    def setUp(self):
+        self.trek_1 = TrekWithPublishedPOIsFactory.create()
+        self.trek_2 = TrekWithPublishedPOIsFactory.create()
+        AttachmentImageFactory.create(content_object=self.trek_1)
+        AttachmentImageFactory.create(content_object=self.trek_1.published_pois.first())
+        # Pictures of the child are shared by both archives
+        child = TrekFactory.create()
+        AttachmentImageFactory.create(content_object=child)
+        OrderedTrekChild.objects.create(parent=self.trek_1, child=child, order=1)
+        OrderedTrekChild.objects.create(parent=self.trek_2, child=child, order=1)
+
+    def sync(self, **options):
+        sync_directory = mkdtemp(dir=settings.TMP_DIR)
+        self.addCleanup(shutil.rmtree, sync_directory, ignore_errors=True)
+        output = StringIO()
+        management.call_command(
+            "sync_mobile",
+            sync_directory,
+            url="http://localhost:8000",
+            skip_tiles=True,
+            verbosity=2,
+            stdout=output,
+            **options,
+        )
+        return sync_directory, output.getvalue()
+
+    def test_failure_in_worker_fails_command(self):
+        sync_trek_by_pk_media = SyncMobileCommand.sync_trek_by_pk_media
+        failing_pk = self.trek_1.pk
+
+        def failing_sync(command, trek):
+            sync_trek_by_pk_media(command, trek)
+            if trek.pk == failing_pk:
+                command.successfull = False
+
+        with mock.patch.object(
+            SyncMobileCommand, "sync_trek_by_pk_media", failing_sync
+        ):
+            with self.assertRaisesRegex(
+                CommandError, "Some errors raised during synchronization."
+            ):
+                self.sync(workers=2)
+
+    def test_archives_same_as_serial_sync(self):
+        serial_directory, serial_output = self.sync()
+        workers_directory, workers_output = self.sync(workers=2)
+        self.assertIn("Done", workers_output)
+        for trek in (self.trek_1, self.trek_2):
+            name = os.path.join("nolang", f"{trek.pk}.zip")
+            self.assertIn(name, workers_output)
+            with (
+                zipfile.ZipFile(os.path.join(serial_directory, name)) as serial_zip,
+                zipfile.ZipFile(os.path.join(workers_directory, name)) as workers_zip,
+            ):
+                self.assertTrue(workers_zip.namelist())
+                self.assertEqual(
+                    {(info.filename, info.CRC) for info in serial_zip.infolist()},
+                    {(info.filename, info.CRC) for info in workers_zip.infolist()},
+                )
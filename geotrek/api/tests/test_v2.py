@@ -2,7 +2,9 @@ import datetime
 import json
 import re
 from functools import partial
+from types import SimpleNamespace
 from unittest import skipIf
+from unittest.mock import patch
 
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
@@ -15,8 +17,10 @@ from django.contrib.gis.geos import (
     Polygon,
 )
 from django.contrib.gis.geos.collections import GeometryCollection
+from django.core.cache import caches
 from django.db import connection
 from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from freezegun import freeze_time
@@ -25,7 +29,8 @@ from paperclip.models import random_suffix_regexp
 from rest_framework.test import APIClient, APITestCase
 
 from geotrek import __version__
-from geotrek.api.v2.views.trekking import TrekViewSet
+from geotrek.api.v2.cache import get_cache_version, invalidate_api_cache
+from geotrek.api.v2.views.trekking import PracticeViewSet, TrekViewSet
 from geotrek.authent import models as authent_models
 from geotrek.authent.tests import factories as authent_factory
 from geotrek.authent.tests.factories import StructureFactory
@@ -611,6 +616,15 @@ HDVIEWPOINT_DETAIL_JSON_STRUCTURE = sorted(
 )
 
 
+API_V2_CACHES = {
+    **settings.CACHES,
+    "api_v2": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api_v2_tests",
+    },
+}
+
+
 class BaseApiTest(TestCase):
     """Base TestCase for all API profiles"""
 
@@ -1418,6 +1432,10 @@ class NoPaginationTestCase(BaseApiTest):
     def setUp(self):
         self.factory = RequestFactory()
 
+    def get_streamed_data(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
     def test_json_no_page(self):
         request = self.factory.get(
             reverse("apiv2:trek-list"),
@@ -1427,10 +1445,11 @@ class NoPaginationTestCase(BaseApiTest):
         )
         response = TrekViewSet.as_view({"get": "list"})(request)
         self.assertEqual(response.status_code, 200)
-        self.assertIsInstance(response.data, list)
-        self.assertIsInstance(response.data[0], dict)
+        data = self.get_streamed_data(response)
+        self.assertIsInstance(data, list)
+        self.assertIsInstance(data[0], dict)
         self.assertEqual(
-            len(response.data[0].get("geometry").get("coordinates")[0]),
+            len(data[0].get("geometry").get("coordinates")[0]),
             3,
         )
 
@@ -1444,16 +1463,179 @@ class NoPaginationTestCase(BaseApiTest):
         )
         response = TrekViewSet.as_view({"get": "list"})(request)
         self.assertEqual(response.status_code, 200)
-        self.assertIsInstance(response.data, dict)
-        self.assertEqual(sorted(response.data.keys()), GEOJSON_COLLECTION_STRUCTURE)
+        data = self.get_streamed_data(response)
+        self.assertIsInstance(data, dict)
+        self.assertEqual(sorted(data.keys()), GEOJSON_COLLECTION_STRUCTURE)
+        self.assertEqual(len(data.get("features")), self.nb_treks, data)
         self.assertEqual(
-            len(response.data.get("features")), self.nb_treks, response.data
+            sorted(data.get("features")[0].get("properties").keys()),
+            TREK_PROPERTIES_GEOJSON_STRUCTURE,
+        )
+
+    def test_no_page_same_as_paginated(self):
+        for output_format, key in (("json", "results"), ("geojson", "features")):
+            with self.subTest(format=output_format):
+                response = self.get_trek_list(
+                    {"format": output_format, "page_size": 1000}
+                )
+                paginated = response.json()[key]
+                response = self.get_trek_list(
+                    {"format": output_format, "no_page": "true"}
+                )
+                data = self.get_streamed_data(response)
+                if output_format == "geojson":
+                    self.assertEqual(data["type"], "FeatureCollection")
+                    data = data["features"]
+                self.assertEqual(data, paginated)
+
+    def test_no_page_same_bytes_as_rendered(self):
+        for output_format in ("json", "geojson"):
+            with self.subTest(format=output_format):
+                params = {"format": output_format, "no_page": "true"}
+                response = self.get_trek_list(params)
+                self.assertTrue(response.streaming)
+                with patch.object(TrekViewSet, "can_stream_list", return_value=False):
+                    rendered = self.get_trek_list(params)
+                self.assertFalse(rendered.streaming)
+                self.assertEqual(b"".join(response.streaming_content), rendered.content)
+
+
+class DatabaseGeoJSONTestCase(BaseApiTest):
+    """
+    Integration tests for geometries serialized by PostGIS.
+    """
+
+    def flatten(self, coordinates):
+        if isinstance(coordinates, list):
+            return [value for item in coordinates for value in self.flatten(item)]
+        return [coordinates]
+
+    def assertSameFeatures(self, features, expected):
+        self.assertEqual(len(features), len(expected))
+        for feature, expected_feature in zip(features, expected):
+            self.assertEqual(feature["id"], expected_feature["id"])
+            self.assertEqual(
+                feature["geometry"]["type"], expected_feature["geometry"]["type"]
+            )
+            for value, expected_value in zip(
+                self.flatten(feature["geometry"]["coordinates"]),
+                self.flatten(expected_feature["geometry"]["coordinates"]),
+                strict=True,
+            ):
+                self.assertAlmostEqual(value, expected_value, places=6)
+            if "bbox" in expected_feature:
+                for value, expected_value in zip(
+                    feature["bbox"], expected_feature["bbox"], strict=True
+                ):
+                    self.assertAlmostEqual(value, expected_value, places=6)
+
+    def test_same_output(self):
+        for output_format, key in (("json", "results"), ("geojson", "features")):
+            with self.subTest(format=output_format):
+                expected = self.get_trek_list({"format": output_format}).json()[key]
+                with override_settings(API_V2_GEOJSON_IN_DB=True):
+                    response = self.get_trek_list({"format": output_format})
+                self.assertEqual(response.status_code, 200)
+                self.assertSameFeatures(response.json()[key], expected)
+
+    def test_same_output_no_page(self):
+        expected = self.get_trek_list({"format": "geojson"}).json()["features"]
+        with override_settings(API_V2_GEOJSON_IN_DB=True):
+            response = self.get_trek_list({"format": "geojson", "no_page": "true"})
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertSameFeatures(data["features"], expected)
+
+    def test_simplify_tolerance(self):
+        view = TrekViewSet()
+        view.request = SimpleNamespace(query_params={"zoom": "1"})
+        self.assertAlmostEqual(view.get_simplify_tolerance(), 360 / 512)
+        view.request = SimpleNamespace(query_params={"zoom": "wrong"})
+        self.assertIsNone(view.get_simplify_tolerance())
+        for zoom in ("-1", "31", "2000", "²"):
+            view.request = SimpleNamespace(query_params={"zoom": zoom})
+            self.assertIsNone(view.get_simplify_tolerance())
+        view.request = SimpleNamespace(query_params={"zoom": "30"})
+        self.assertAlmostEqual(view.get_simplify_tolerance(), 360 / (256 * 2**30))
+
+    @override_settings(API_V2_GEOJSON_IN_DB=True)
+    def test_simplify_with_zoom(self):
+        response = self.get_trek_list({"zoom": "0", "format": "geojson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["features"]), self.nb_treks)
+
+
+class VectorTilesTestCase(BaseApiTest):
+    def test_trek_tile(self):
+        response = self.client.get("/api/v2/trek/tiles/0/0/0.mvt")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertIn(b"trek", response.content)
+
+    def test_trek_tile_zoomed(self):
+        origin = 20037508.342789244
+        point = self.treks[0].geom.centroid.transform(3857, clone=True)
+        for z in (4, 6, 10, 16):
+            size = 2 * origin / 2**z
+            x, y = int((point.x + origin) // size), int((origin - point.y) // size)
+            response = self.client.get(f"/api/v2/trek/tiles/{z}/{x}/{y}.mvt")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"trek", response.content)
+
+    def test_trek_tile_filtered(self):
+        response = self.client.get(
+            "/api/v2/trek/tiles/0/0/0.mvt", {"length_min": "1000000"}
         )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+
+
+class CursorPaginationTestCase(BaseApiTest):
+    """
+    Integration tests for keyset pagination.
+    """
+
+    def walk(self, params):
+        pks = []
+        response = self.get_trek_list(params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn("count", data)
+            items = data.get("results", data.get("features"))
+            pks += [item["id"] for item in items]
+            if not data["next"]:
+                return pks
+            response = self.client.get(data["next"])
+
+    def all_pks(self):
+        response = self.get_trek_list({"no_page": "true"})
+        data = json.loads(b"".join(response.streaming_content))
+        return sorted(item["id"] for item in data)
+
+    def test_json_cursor(self):
+        pks = self.walk({"cursor": "", "page_size": 4})
+        self.assertEqual(pks, self.all_pks())
+
+    def test_geojson_cursor(self):
+        pks = self.walk({"cursor": "", "page_size": 4, "format": "geojson"})
+        self.assertEqual(pks, self.all_pks())
+
+    def test_cursor_updated_after(self):
+        two_years_ago = (timezone.now() - relativedelta(years=2)).date()
+        pks = self.walk({"cursor": "", "page_size": 4, "updated_after": two_years_ago})
         self.assertEqual(
-            sorted(response.data.get("features")[0].get("properties").keys()),
-            TREK_PROPERTIES_GEOJSON_STRUCTURE,
+            pks,
+            list(
+                trek_models.Trek.objects.filter(pk__in=self.all_pks())
+                .order_by("date_update", "pk")
+                .values_list("pk", flat=True)
+            ),
         )
 
+    def test_invalid_cursor(self):
+        response = self.get_trek_list({"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 404)
+
 
 class APIAccessAnonymousTestCase(BaseApiTest):
     """TestCase for anonymous API profile"""
@@ -6443,6 +6625,7 @@ class OutdoorFilterByPortal(BaseApiTest):
         self.assertIn(self.information_desk.pk, all_ids)
 
 
+@override_settings(CACHES=API_V2_CACHES)
 class AltimetryCacheTests(BaseApiTest):
     """Test APIV2 DEM serialization is cached"""
 
@@ -6473,16 +6656,19 @@ class AltimetryCacheTests(BaseApiTest):
         )
         cls.trek = trek_factory.TrekFactory.create(paths=[cls.path])
 
+    def setUp(self):
+        caches["api_v2"].clear()
+
     @skipIf(
         not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only"
     )
     def test_cache_is_used_when_getting_trek_DEM(self):
-        with self.assertNumQueries(10):
+        with self.assertNumQueries(9):
             response = self.client.get(reverse("apiv2:trek-dem", args=(self.trek.pk,)))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/json")
-        # When cache is used there is single query to get trek DEM
-        with self.assertNumQueries(1):
+        # When cache is used there is no query to get trek DEM
+        with self.assertNumQueries(0):
             response = self.client.get(reverse("apiv2:trek-dem", args=(self.trek.pk,)))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/json")
@@ -6495,27 +6681,27 @@ class AltimetryCacheTests(BaseApiTest):
             geom=LineString((1, 101), (81, 101), (81, 99))
         )
         # There are 9 queries to get trek DEM
-        with self.assertNumQueries(10):
+        with self.assertNumQueries(9):
             response = self.client.get(reverse("apiv2:trek-dem", args=(trek.pk,)))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/json")
-        # When cache is used there is single query to get trek DEM
-        with self.assertNumQueries(1):
+        # When cache is used there is no query to get trek DEM
+        with self.assertNumQueries(0):
             response = self.client.get(reverse("apiv2:trek-dem", args=(trek.pk,)))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/json")
 
     def test_cache_is_used_when_getting_trek_profile(self):
         # There are 8 queries to get trek profile
-        with self.assertNumQueries(10):
+        with self.assertNumQueries(9):
             response = self.client.get(
                 reverse("apiv2:trek-profile", args=(self.trek.pk,))
             )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/json")
         self.assertIn("profile", response.json().keys())
-        # When cache is used there is single query to get trek profile
-        with self.assertNumQueries(1):
+        # When cache is used there is no query to get trek profile
+        with self.assertNumQueries(0):
             response = self.client.get(
                 reverse("apiv2:trek-profile", args=(self.trek.pk,))
             )
@@ -6525,14 +6711,14 @@ class AltimetryCacheTests(BaseApiTest):
 
     def test_cache_is_used_when_getting_trek_profile_svg(self):
         # There are 8 queries to get trek profile svg
-        with self.assertNumQueries(10):
+        with self.assertNumQueries(9):
             response = self.client.get(
                 reverse("apiv2:trek-profile", args=(self.trek.pk,)), {"format": "svg"}
             )
         self.assertEqual(response.status_code, 200)
         self.assertIn("image/svg+xml", response["Content-Type"])
-        # When cache is used there is single query to get trek profile
-        with self.assertNumQueries(1):
+        # When cache is used there is no query to get trek profile
+        with self.assertNumQueries(0):
             response = self.client.get(
                 reverse("apiv2:trek-profile", args=(self.trek.pk,)), {"format": "svg"}
             )
@@ -6540,21 +6726,27 @@ class AltimetryCacheTests(BaseApiTest):
         self.assertIn("image/svg+xml", response["Content-Type"])
 
 
+@override_settings(CACHES=API_V2_CACHES)
 class GenericCacheTestCase(APITestCase):
     @classmethod
     def setUpTestData(cls):
         cls.practice = PracticeFactory.create()
 
+    def setUp(self):
+        # Versions counters are not rolled back with the previous tests, so
+        # responses they cached may still match the current versions
+        caches["api_v2"].clear()
+
     def test_cache_invalidates_along_x_forwarded_proto_header(self):
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             response = self.client.get(
                 reverse("apiv2:practice-detail", args=(self.practice.pk,))
             )
         data = response.json()
         self.assertTrue(data["pictogram"].startswith("http://"))
 
-        # after cache hit, query number is 1
-        with self.assertNumQueries(1):
+        # after cache hit, there is no query
+        with self.assertNumQueries(0):
             response = self.client.get(
                 reverse("apiv2:practice-detail", args=(self.practice.pk,))
             )
@@ -6562,7 +6754,7 @@ class GenericCacheTestCase(APITestCase):
         self.assertTrue(data["pictogram"].startswith("http://"))
 
         # we used custom header, cache is invalidate and url is now https
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             response = self.client.get(
                 reverse("apiv2:practice-detail", args=(self.practice.pk,)),
                 headers={"x-forwarded-proto": "https"},
@@ -6571,7 +6763,7 @@ class GenericCacheTestCase(APITestCase):
         self.assertTrue(data["pictogram"].startswith("https://"))
 
         # cache is hit
-        with self.assertNumQueries(1):
+        with self.assertNumQueries(0):
             response = self.client.get(
                 reverse("apiv2:practice-detail", args=(self.practice.pk,)),
                 headers={"x-forwarded-proto": "https"},
@@ -6580,13 +6772,58 @@ class GenericCacheTestCase(APITestCase):
         self.assertTrue(data["pictogram"].startswith("https://"))
 
         # first request is always cached
-        with self.assertNumQueries(1):
+        with self.assertNumQueries(0):
             response = self.client.get(
                 reverse("apiv2:practice-detail", args=(self.practice.pk,))
             )
         data = response.json()
         self.assertTrue(data["pictogram"].startswith("http://"))
 
+    def test_cache_invalidates_when_model_changes(self):
+        url = reverse("apiv2:practice-detail", args=(self.practice.pk,))
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        # Any change of a practice bumps the practices version
+        PracticeFactory.create()
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["name"]["en"], self.practice.name)
+
+    def test_cache_invalidates_explicitly(self):
+        url = reverse("apiv2:practice-detail", args=(self.practice.pk,))
+        self.client.get(url)
+        trek_models.Practice.objects.filter(pk=self.practice.pk).update(name="Foo")
+        invalidate_api_cache(trek_models.Practice)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["name"]["en"], "Foo")
+
+    def test_versions_are_not_stored_with_responses(self):
+        version = get_cache_version(trek_models.Practice)
+        caches["api_v2"].clear()
+        self.assertEqual(get_cache_version(trek_models.Practice), version)
+
+    def test_list_cache_is_opt_in(self):
+        url = reverse("apiv2:practice-list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertTrue(queries.captured_queries)
+
+    def test_list_cache(self):
+        url = reverse("apiv2:practice-list")
+        with patch.object(PracticeViewSet, "cache_list", True):
+            count = self.client.get(url).json()["count"]
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.json()["count"], count)
+            PracticeFactory.create()
+            response = self.client.get(url)
+        self.assertEqual(response.json()["count"], count + 1)
+
 
 class CreateReportsAPITest(TestCase):
     @classmethod
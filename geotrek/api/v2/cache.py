@@ -1,3 +1,9 @@
+from time import time_ns
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from rest_framework_extensions.cache.mixins import (
     ListCacheResponseMixin as BaseListCacheResponseMixin,
 )
@@ -6,6 +12,68 @@ from rest_framework_extensions.cache.mixins import (
 )
 
 from geotrek.api.v2.decorators import cache_response_detail, cache_response_list
+from geotrek.common.signals import objects_changed
+
+API_V2_CACHE = "api_v2"
+API_V2_VERSIONS_CACHE = "api_v2_versions"
+
+
+def get_version_key(model):
+    return f"version:{model._meta.label_lower}"
+
+
+def get_cache_version(model):
+    """
+    Return the version counter of a model, which changes each time an object of
+    this model is saved or deleted, and is shared by all nodes using the cache.
+    """
+    cache = caches[API_V2_VERSIONS_CACHE]
+    key = get_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # Start from the current time, so that a counter evicted from the cache
+        # never gives back the version of responses still cached
+        cache.add(key, time_ns() // 1000, timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def invalidate_api_cache(*models):
+    """Bump the version counters of the models, and of their parents (multi-table inheritance)"""
+    cache = caches[API_V2_VERSIONS_CACHE]
+    for model in models:
+        for concrete_model in (model, *model._meta.get_parent_list()):
+            try:
+                cache.incr(get_version_key(concrete_model))
+            except ValueError:
+                # Not set yet (or evicted): it will start from the current time
+                pass
+
+
+def invalidate_api_cache_on_commit(model, using=None):
+    invalidate_api_cache(model)
+    if transaction.get_connection(using).in_atomic_block:
+        # Bump again once committed, as other nodes may have cached
+        # the previous data in the meantime
+        transaction.on_commit(lambda: invalidate_api_cache(model), using=using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_api_cache_on_change(sender, using=None, raw=False, **kwargs):
+    if not raw:
+        invalidate_api_cache_on_commit(sender, using)
+
+
+@receiver(objects_changed)
+def invalidate_api_cache_on_bulk_change(sender, using=None, **kwargs):
+    invalidate_api_cache_on_commit(sender, using)
+
+
+@receiver(m2m_changed)
+def invalidate_api_cache_on_m2m_change(sender, instance, action, using=None, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_api_cache_on_commit(instance.__class__, using)
 
 
 class RetrieveCacheResponseMixin(BaseRetrieveCacheResponseMixin):
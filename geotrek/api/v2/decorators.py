@@ -1,9 +1,27 @@
+from django.core.cache import caches
 from rest_framework_extensions.cache.decorators import (
     CacheResponse as BaseCacheResponse,
 )
 
 
-class APIV2CacheResponseDetail(BaseCacheResponse):
+class APIV2CacheResponse(BaseCacheResponse):
+    def __init__(self, timeout, key_func, cache="api_v2", cache_errors=None):
+        self.cache_alias = cache
+        super().__init__(
+            timeout=timeout, key_func=key_func, cache=cache, cache_errors=cache_errors
+        )
+
+    @property
+    def cache(self):
+        # Resolved on each request, so that the backend follows CACHES settings
+        return caches[self.cache_alias]
+
+    @cache.setter
+    def cache(self, value):
+        pass
+
+
+class APIV2CacheResponseDetail(APIV2CacheResponse):
     def __init__(
         self,
         timeout="object_cache_timeout",
@@ -19,7 +37,7 @@ class APIV2CacheResponseDetail(BaseCacheResponse):
 cache_response_detail = APIV2CacheResponseDetail
 
 
-class APIV2CacheResponseList(BaseCacheResponse):
+class APIV2CacheResponseList(APIV2CacheResponse):
     def __init__(
         self,
         timeout="list_cache_timeout",
@@ -31,5 +49,13 @@ class APIV2CacheResponseList(BaseCacheResponse):
             timeout=timeout, key_func=key_func, cache=cache, cache_errors=cache_errors
         )
 
+    def process_cache_response(self, view_instance, view_method, request, args, kwargs):
+        # Caching lists is opt-in (see GeotrekViewSet.cache_list)
+        if not getattr(view_instance, "cache_list", True):
+            return view_method(view_instance, request, *args, **kwargs)
+        return super().process_cache_response(
+            view_instance, view_method, request, args, kwargs
+        )
+
 
 cache_response_list = APIV2CacheResponseList
@@ -1,9 +1,17 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
 from collections import OrderedDict
 
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
 from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class FasterPaginator(Paginator):
@@ -19,8 +27,16 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = "page_size"
     max_page_size = 1000
     django_paginator_class = FasterPaginator
+    # Keyset pagination is used instead of page numbers if this parameter is given
+    # (empty for the first page), so that walking a large collection needs
+    # neither COUNT nor OFFSET
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+    cursor = None
 
     def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.get_cursor_paginated_response(data)
         if self.request.query_params.get("format", "json") == "geojson":
             return Response(
                 OrderedDict(
@@ -39,4 +55,89 @@ class StandardResultsSetPagination(PageNumberPagination):
     def paginate_queryset(self, queryset, request, view=None):
         if "no_page" in request.query_params:
             return None
+        if self.cursor_query_param in request.query_params:
+            return self.paginate_queryset_by_cursor(queryset, request)
         return super().paginate_queryset(queryset, request, view)
+
+    def get_cursor_fields(self, queryset, request):
+        """
+        Returns the fields of the keyset: (date_update, pk) when harvesting objects
+        updated since a date, so that next runs only walk the last updated ones,
+        pk otherwise.
+        """
+        model = queryset.model
+        if {"updated_after", "updated_before"} & set(request.query_params) and any(
+            field.name == "date_update" for field in model._meta.concrete_fields
+        ):
+            return [model._meta.get_field("date_update"), model._meta.pk]
+        return [model._meta.pk]
+
+    def decode_cursor(self, request, fields):
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode("ascii"), validate=True))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (BinasciiError, UnicodeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.cursor_fields]
+        return b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.request = request
+        self.cursor_fields = self.get_cursor_fields(queryset, request)
+        page_size = self.get_page_size(request)
+        names = [
+            "pk" if field.primary_key else field.name for field in self.cursor_fields
+        ]
+        queryset = queryset.order_by(*names)
+        self.cursor = self.decode_cursor(request, self.cursor_fields) or []
+        if self.cursor:
+            # (a, b) > (x, y) <=> a > x OR (a = x AND b > y)
+            pairs = list(zip(names, self.cursor))
+            name, value = pairs[-1]
+            after = Q(**{f"{name}__gt": value})
+            for name, value in reversed(pairs[:-1]):
+                after = Q(**{f"{name}__gt": value}) | (Q(**{name: value}) & after)
+            queryset = queryset.filter(after)
+        page = list(queryset[: page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_cursor_paginated_response(self, data):
+        if self.request.query_params.get("format", "json") == "geojson":
+            return Response(
+                OrderedDict(
+                    [
+                        ("type", "FeatureCollection"),
+                        ("next", self.get_next_cursor_link()),
+                        ("previous", None),
+                        ("features", data["features"]),
+                    ]
+                )
+            )
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_cursor_link()),
+                    ("previous", None),
+                    ("results", data),
+                ]
+            )
+        )
@@ -1,10 +1,17 @@
+import re
+from functools import partial
+from uuid import uuid4
+
 import pygal
 from django.conf import settings
 from django.utils import translation
 from django.utils.translation import get_language
 from django.utils.translation import gettext as _
+from mapentity.renderers import GeoJSONRenderer as BaseGeoJSONRenderer
 from pygal.style import LightSolarizedStyle
+from rest_framework import renderers
 from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder as BaseJSONEncoder
 
 
 class SVGProfileRenderer(BaseRenderer):
@@ -52,3 +59,51 @@ class SVGProfileRenderer(BaseRenderer):
             line_chart.no_data_text = _("Altimetry data not available")
             line_chart.add("", [(int(v[0]), int(v[3])) for v in profile])
             return line_chart.render()
+
+
+class RawJSON:
+    """JSON text (e.g. a geometry serialized by PostGIS) output as is by JSON renderers"""
+
+    def __init__(self, text, extent=None):
+        self.text = text
+        self.extent = extent
+
+
+class RawJSONEncoder(BaseJSONEncoder):
+    """Replace `RawJSON` values by numbered placeholders, collected in `raw_values`"""
+
+    def __init__(self, *args, raw_values, token, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.raw_values = raw_values
+        self.token = token
+
+    def default(self, obj):
+        if isinstance(obj, RawJSON):
+            self.raw_values.append(obj.text.encode("utf-8"))
+            return f"{self.token}{len(self.raw_values) - 1}"
+        return super().default(obj)
+
+
+class RawJSONRendererMixin:
+    """Insert `RawJSON` values in the rendered output without parsing them"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        raw_values = []
+        token = uuid4().hex
+        self.encoder_class = partial(RawJSONEncoder, raw_values=raw_values, token=token)
+        output = super().render(data, accepted_media_type, renderer_context)
+        if not raw_values:
+            return output
+        return re.sub(
+            rf'"{token}(\d+)"'.encode("ascii"),
+            lambda match: raw_values[int(match[1])],
+            output,
+        )
+
+
+class JSONRenderer(RawJSONRendererMixin, renderers.JSONRenderer):
+    pass
+
+
+class GeoJSONRenderer(RawJSONRendererMixin, BaseGeoJSONRenderer):
+    pass
@@ -1,5 +1,6 @@
 import json
 import logging
+import re
 
 from bs4 import BeautifulSoup
 from django.conf import settings
@@ -26,6 +27,7 @@ from geotrek.api.v2.mixins import (
     PDFSerializerMixin,
     PublishedRelatedObjectsSerializerMixin,
 )
+from geotrek.api.v2.renderers import RawJSON
 from geotrek.api.v2.utils import build_url, get_translation_or_dict, is_published
 from geotrek.authent import models as authent_models
 from geotrek.common import models as common_models
@@ -57,6 +59,27 @@ if "geotrek.signage" in settings.INSTALLED_APPS:
 logger = logging.getLogger(__name__)
 
 
+class DatabaseGeoJSONGeometryField(GeometryField):
+    """
+    Output the geometry as serialized by PostGIS if the object has been annotated
+    with it (see `GeotrekGeometricViewset.annotate_geojson`)
+    """
+
+    def get_attribute(self, instance):
+        geojson = getattr(instance, f"{self.source}_geojson", None)
+        box = getattr(instance, f"{self.source}_box", None)
+        if geojson is None or box is None:
+            return super().get_attribute(instance)
+        # BOX(xmin ymin,xmax ymax)
+        extent = tuple(float(value) for value in re.split(r"[ ,]", box[4:-1]))
+        return RawJSON(geojson, extent=extent)
+
+    def to_representation(self, value):
+        if isinstance(value, RawJSON):
+            return value
+        return super().to_representation(value)
+
+
 class BaseGeoJSONSerializer(geo_serializers.GeoFeatureModelSerializer):
     """
     Mixin used to serialize geojson
@@ -201,7 +224,7 @@ if "geotrek.trekking" in settings.INSTALLED_APPS:
             fields = ("id", "name", "practices", "pictogram")
 
     class ServiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom3d_transformed", precision=7
         )
         provider = serializers.SlugRelatedField(read_only=True, slug_field="name")
@@ -365,7 +388,7 @@ class LabelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
 
 class HDViewPointSerializer(TimeStampedSerializer):
-    geometry = geo_serializers.GeometryField(
+    geometry = DatabaseGeoJSONGeometryField(
         read_only=True, source="geom_transformed", precision=7
     )
     picture_tiles_url = serializers.SerializerMethodField()
@@ -500,7 +523,7 @@ if "geotrek.tourism" in settings.INSTALLED_APPS:
     class TouristicModelSerializer(
         PDFSerializerMixin, DynamicFieldsMixin, TimeStampedSerializer
     ):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom_transformed", precision=7
         )
         accessibility = serializers.SerializerMethodField()
@@ -706,7 +729,7 @@ if "geotrek.tourism" in settings.INSTALLED_APPS:
             )
 
     class TouristicEventPlaceSerializer(serializers.ModelSerializer):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom_transformed", precision=7
         )
 
@@ -779,7 +802,7 @@ if "geotrek.core" in settings.INSTALLED_APPS:
 
     class PathSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         url = HyperlinkedIdentityField(view_name="apiv2:path-detail")
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom3d_transformed", precision=7
         )
         length_2d = serializers.FloatField(source="length_2d_display")
@@ -818,7 +841,7 @@ if "geotrek.trekking" in settings.INSTALLED_APPS:
     ):
         url = HyperlinkedIdentityField(view_name="apiv2:trek-detail")
         published = serializers.SerializerMethodField()
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom3d_transformed", precision=7
         )
         length_2d = serializers.FloatField(source="length_2d_display")
@@ -1161,7 +1184,7 @@ if "geotrek.trekking" in settings.INSTALLED_APPS:
         published = serializers.SerializerMethodField()
         create_datetime = serializers.DateTimeField(source="topo_object.date_insert")
         update_datetime = serializers.DateTimeField(source="topo_object.date_update")
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom3d_transformed", precision=7
         )
         attachments = AttachmentSerializer(many=True, source="sorted_attachments")
@@ -1270,7 +1293,7 @@ if "geotrek.sensitivity" in settings.INSTALLED_APPS:
         )
         info_url = serializers.URLField(source="species.url")
         published = serializers.BooleanField()
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom_transformed", precision=7
         )
         species_id = serializers.SerializerMethodField()
@@ -1421,7 +1444,7 @@ if "geotrek.sensitivity" in settings.INSTALLED_APPS:
 if "geotrek.zoning" in settings.INSTALLED_APPS:
 
     class CitySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom", precision=7
         )
 
@@ -1431,7 +1454,7 @@ if "geotrek.zoning" in settings.INSTALLED_APPS:
             read_only_fields = ("id", "code")
 
     class DistrictsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom", precision=7
         )
 
@@ -1521,7 +1544,7 @@ if "geotrek.outdoor" in settings.INSTALLED_APPS:
         published = serializers.SerializerMethodField()
         period = serializers.SerializerMethodField()
         url = HyperlinkedIdentityField(view_name="apiv2:site-detail")
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom_transformed", precision=7
         )
         attachments = AttachmentSerializer(many=True, source="sorted_attachments")
@@ -1663,7 +1686,7 @@ if "geotrek.outdoor" in settings.INSTALLED_APPS:
         advice = serializers.SerializerMethodField()
         description = serializers.SerializerMethodField()
         url = HyperlinkedIdentityField(view_name="apiv2:course-detail")
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom_transformed", precision=7
         )
         children = serializers.SerializerMethodField()
@@ -2014,7 +2037,7 @@ if "geotrek.infrastructure" in settings.INSTALLED_APPS:
             fields = ("id", "label", "pictogram", "structure", "type")
 
     class InfrastructureSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom3d_transformed", precision=7
         )
         accessibility = serializers.SerializerMethodField()
@@ -2093,7 +2116,7 @@ if "geotrek.signage" in settings.INSTALLED_APPS:
             fields = ("id", "label", "structure")
 
     class SignageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
-        geometry = geo_serializers.GeometryField(
+        geometry = DatabaseGeoJSONGeometryField(
             read_only=True, source="geom3d_transformed", precision=7
         )
         attachments = AttachmentSerializer(many=True)
@@ -1,9 +1,8 @@
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
-from django.db.models import F, Prefetch, Q
+from django.db.models import F, Prefetch
 from django.db.models.aggregates import Count
 from django.utils import translation
-from modeltranslation.utils import build_localized_fieldname
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
@@ -83,33 +82,13 @@ class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
 
     def filter_published_lang_retrieve(self, request, queryset):
         """filter trek by publication language (including parents publication language)"""
-        qs = queryset
         language = request.GET.get("language", "all")
-        associated_published_fields = [
-            f.name
-            for f in qs.model._meta.get_fields()
-            if f.name.startswith("published")
-        ]
-
         if language == "all":
             # no language specified. Check for all.
-            q = Q()
-            for lang in settings.MODELTRANSLATION_LANGUAGES:
-                field_name = build_localized_fieldname("published", lang)
-                if field_name in associated_published_fields:
-                    field_name_parent = "trek_parents__parent__{}".format(
-                        build_localized_fieldname("published", lang)
-                    )
-                    q |= Q(**{field_name: True}) | Q(**{field_name_parent: True})
-            qs = qs.filter(q)
-        else:
-            # one language is specified
-            field_name = build_localized_fieldname("published", language)
-            field_name_parent = "trek_parents__parent__{}".format(
-                build_localized_fieldname("published", language)
+            return queryset.filter(
+                visible_langs__overlap=settings.MODELTRANSLATION_LANGUAGES
             )
-            qs = qs.filter(Q(**{field_name: True}) | Q(**{field_name_parent: True}))
-        return qs.distinct()
+        return queryset.filter(visible_langs__contains=[language])
 
     @action(detail=True, url_name="dem")
     @cache_response_detail()
@@ -1,20 +1,38 @@
 from hashlib import md5
+from itertools import islice
 
 from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.contrib.gis.gdal import SpatialReference
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework.backends import DjangoFilterBackend
-from mapentity.renderers import GeoJSONRenderer
 from rest_framework import renderers, viewsets
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
-from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 
 from geotrek.api.v2 import filters as api_filters
 from geotrek.api.v2 import pagination as api_pagination
-from geotrek.api.v2.cache import RetrieveCacheResponseMixin
-from geotrek.api.v2.serializers import override_serializer
+from geotrek.api.v2 import renderers as api_renderers
+from geotrek.api.v2.cache import (
+    API_V2_CACHE,
+    ListCacheResponseMixin,
+    RetrieveCacheResponseMixin,
+    get_cache_version,
+)
+from geotrek.api.v2.serializers import (
+    DatabaseGeoJSONGeometryField,
+    override_serializer,
+)
+from geotrek.common.functions import Box2D, SimplifyPreserveTopology
+from geotrek.common.mixins.views import VectorTilesMixin
+from geotrek.core.models import Path, Topology
+from geotrek.zoning.mixins import ZoningPropertiesMixin, prefetch_zoning
 
 
-class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
+class GeotrekViewSet(
+    ListCacheResponseMixin, RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet
+):
     filter_backends = (
         DjangoFilterBackend,
         api_filters.GeotrekQueryParamsFilter,
@@ -33,15 +51,17 @@ class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
     authentication_classes = [BasicAuthentication, SessionAuthentication]
     renderer_classes = (
         [
-            renderers.JSONRenderer,
+            api_renderers.JSONRenderer,
             renderers.BrowsableAPIRenderer,
         ]
         if settings.DEBUG
         else [
-            renderers.JSONRenderer,
+            api_renderers.JSONRenderer,
         ]
     )
     lookup_value_regex = r"\d+"
+    # Cache list responses too (detail responses are always cached)
+    cache_list = settings.API_V2_CACHE_LISTS
 
     def get_ordered_query_params(self):
         """Get multi value query params sorted by key"""
@@ -56,13 +76,23 @@ class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
         )  # take care about scheme defined in nginx.conf
         return f"{self.request.path}:{self.get_ordered_query_params()}:{self.request.accepted_renderer.format}:{proto_scheme}"
 
+    def get_cache_models(self):
+        """Models whose changes invalidate the cached responses of this viewset"""
+        queryset = self.queryset if self.queryset is not None else self.get_queryset()
+        model = queryset.model
+        if issubclass(model, Topology):
+            # Topologies geometries follow their paths
+            return [model, Path]
+        return [model]
+
+    def get_cache_version(self):
+        return ":".join(
+            str(get_cache_version(model)) for model in self.get_cache_models()
+        )
+
     def get_object_cache_key(self, pk):
-        """return specific object cache key based on object date_update column"""
-        # don't directly use get_object or get_queryset to avoid select / prefetch and annotation sql queries
-        # insure object exists and doesn't raise exception
-        instance = get_object_or_404(self.get_queryset().model, pk=pk)
-        date_update = instance.date_update
-        return f"{self.get_base_cache_string()}:{date_update.isoformat()}"
+        """return specific object cache key based on models versions"""
+        return f"{self.get_base_cache_string()}:{pk}:{self.get_cache_version()}"
 
     def object_cache_key_func(self, **kwargs):
         """cache key md5 for retrieve viewset action"""
@@ -70,11 +100,26 @@ class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
             self.get_object_cache_key(kwargs.get("kwargs").get("pk")).encode("utf-8")
         ).hexdigest()
 
+    def get_list_cache_key(self):
+        """return list cache key based on models versions"""
+        return f"{self.get_base_cache_string()}:{self.get_cache_version()}"
+
+    def list_cache_key_func(self, **kwargs):
+        """cache key md5 for list viewset action"""
+        return md5(self.get_list_cache_key().encode("utf-8")).hexdigest()
+
     def get_serializer_context(self):
         return {"request": self.request, "kwargs": self.kwargs}
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and issubclass(queryset.model, ZoningPropertiesMixin):
+            # Fetch zones of the whole page at once
+            prefetch_zoning(page)
+        return page
 
-class GeotrekGeometricViewset(GeotrekViewSet):
+
+class GeotrekGeometricViewset(VectorTilesMixin, GeotrekViewSet):
     filter_backends = (
         *GeotrekViewSet.filter_backends,
         api_filters.GeotrekQueryParamsDimensionFilter,
@@ -84,9 +129,111 @@ class GeotrekGeometricViewset(GeotrekViewSet):
     distance_filter_field = "geom"
     bbox_filter_field = "geom"
     bbox_filter_include_overlapping = True
-    renderer_classes = [*GeotrekViewSet.renderer_classes, GeoJSONRenderer]
+    renderer_classes = [*GeotrekViewSet.renderer_classes, api_renderers.GeoJSONRenderer]
+    # Number of objects fetched and serialized at once in streamed lists
+    stream_chunk_size = 500
+    # Geometries are not simplified for larger `zoom` values
+    max_simplify_zoom = 30
+    tile_cache_alias = API_V2_CACHE
+
+    def get_tile_cache_version(self, queryset):
+        return self.get_cache_version()
 
     def get_serializer_class(self):
         base_serializer_class = super().get_serializer_class()
         format_output = self.request.query_params.get("format", "json")
         return override_serializer(format_output, base_serializer_class)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if settings.API_V2_GEOJSON_IN_DB:
+            queryset = self.annotate_geojson(queryset)
+        return queryset
+
+    def get_simplify_tolerance(self):
+        """Size of a pixel of 256px tiles at the requested `zoom` level, in API_SRID units"""
+        try:
+            zoom = int(self.request.query_params.get("zoom", ""))
+        except ValueError:
+            return None
+        if not 0 <= zoom <= self.max_simplify_zoom:
+            return None
+        if SpatialReference(settings.API_SRID).geographic:
+            extent = 360
+        else:
+            extent = 40075016.686  # Equator length in meters
+        return extent / (256 * 2**zoom)
+
+    def annotate_geojson(self, queryset):
+        """
+        Let PostGIS serialize the geometries output by `DatabaseGeoJSONGeometryField`,
+        simplified according to the requested zoom level if any
+        """
+        field = self.get_serializer_class()._declared_fields.get("geometry")
+        if (
+            not isinstance(field, DatabaseGeoJSONGeometryField)
+            or field.source not in queryset.query.annotations
+        ):
+            return queryset
+        geom = F(field.source)
+        tolerance = self.get_simplify_tolerance()
+        if tolerance is not None:
+            geom = SimplifyPreserveTopology(geom, tolerance)
+        return queryset.annotate(
+            **{
+                f"{field.source}_geojson": AsGeoJSON(
+                    geom, precision=settings.API_V2_GEOJSON_PRECISION
+                ),
+                f"{field.source}_box": Box2D(F(field.source)),
+            }
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.can_stream_list():
+            return self.stream_list()
+        return super().list(request, *args, **kwargs)
+
+    def can_stream_list(self):
+        """Lists without pagination are streamed, unless they are rendered for humans"""
+        renderer = self.request.accepted_renderer
+        return (
+            "no_page" in self.request.query_params
+            and isinstance(renderer, renderers.JSONRenderer)
+            and renderer.get_indent(
+                self.request.accepted_media_type, self.get_renderer_context()
+            )
+            is None
+        )
+
+    def stream_list(self):
+        """
+        Fetch, serialize and render objects chunk by chunk. Output is the same
+        as the one of the rendered list, without holding it in memory.
+        """
+        renderer = self.request.accepted_renderer
+        media_type = self.request.accepted_media_type
+        renderer_context = self.get_renderer_context()
+        queryset = self.filter_queryset(self.get_queryset())
+        # What surrounds items (e.g. a FeatureCollection) is rendered from an empty list
+        empty = self.get_serializer([], many=True).data
+        head, tail = renderer.render(empty, media_type, renderer_context).rsplit(
+            b"[]", 1
+        )
+
+        def render_chunks():
+            yield head + b"["
+            objects = queryset.iterator(chunk_size=self.stream_chunk_size)
+            separator = b""
+            while chunk := list(islice(objects, self.stream_chunk_size)):
+                if issubclass(queryset.model, ZoningPropertiesMixin):
+                    prefetch_zoning(chunk)
+                data = self.get_serializer(chunk, many=True).data
+                items = data["features"] if isinstance(data, dict) else data
+                for item in items:
+                    yield separator + renderer.render(
+                        item, media_type, renderer_context
+                    )
+                    separator = b","
+            yield b"]" + tail
+
+        return StreamingHttpResponse(render_chunks(), content_type=renderer.media_type)
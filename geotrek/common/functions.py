@@ -75,3 +75,17 @@ class IsSimple(GeoFunc):
 
 class GeometryN(GeomOutputGeoFunc):
     """ST_GeometryN postgis function"""
+
+
+class Box2D(GeoFunc):
+    """Box2D postgis function, as text: BOX(xmin ymin,xmax ymax)"""
+
+    output_field = CharField()
+    function = "Box2D"
+    template = "%(function)s(%(expressions)s)::text"
+
+
+class AsMVTGeom(GeomOutputGeoFunc):
+    """ST_AsMVTGeom postgis function"""
+
+    geom_param_pos = (0, 1)
@@ -1,19 +1,81 @@
+import fcntl
 import logging
+import os
 import re
+import zlib
+from contextlib import contextmanager, nullcontext
 
 from django.conf import settings
+from django.contrib.gis.geos import Polygon
 from landez import TilesManager
+from landez.proj import GoogleProjection
 from landez.sources import DownloadError
 
 logger = logging.getLogger(__name__)
 
 
+class FileLocks:
+    """
+    Inter-process locks used by parallel sync workers, so that files shared by
+    several archives (tiles, thumbnails, elevation charts) are produced only once.
+    Keys are spread over a fixed number of lock files in `directory`.
+    Locks must not be nested.
+    """
+
+    def __init__(self, directory, size=64):
+        self.directory = directory
+        self.size = size
+
+    @contextmanager
+    def __call__(self, key):
+        index = zlib.crc32(str(key).encode()) % self.size
+        with open(os.path.join(self.directory, f"{index}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SyncTilesManager(TilesManager):
+    """
+    TilesManager remembering the tiles which could not be downloaded.
+    Shared by the ZipTilesBuilder instances of a sync, so that tiles common to
+    several archives are requested only once (downloaded ones are read from the
+    disk cache afterwards).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.unavailable = set()
+
+    def tile(self, z_x_y):
+        if z_x_y in self.unavailable:
+            msg = f"Tile {z_x_y} is unavailable"
+            raise DownloadError(msg)
+        try:
+            return super().tile(z_x_y)
+        except DownloadError:
+            self.unavailable.add(z_x_y)
+            raise
+
+
 class ZipTilesBuilder:
-    def __init__(self, zipfile, prefix="", **builder_args):
+    def __init__(
+        self, zipfile, prefix="", tiles_manager=None, lock=None, **builder_args
+    ):
         self.zipfile = zipfile
         self.prefix = prefix
-        builder_args["tile_format"] = self.format_from_url(builder_args["tiles_url"])
-        self.tm = TilesManager(**builder_args)
+        self.lock = lock or (lambda key: nullcontext())
+        if tiles_manager is None:
+            tiles_manager = self.build_tiles_manager(**builder_args)
+        self.tm = tiles_manager
+        self.tiles = set()
+
+    @classmethod
+    def build_tiles_manager(cls, **builder_args):
+        builder_args["tile_format"] = cls.format_from_url(builder_args["tiles_url"])
+        tm = SyncTilesManager(**builder_args)
 
         if (
             not isinstance(settings.MOBILE_TILES_URL, str)
@@ -22,12 +84,12 @@ class ZipTilesBuilder:
             for url in settings.MOBILE_TILES_URL[1:]:
                 args = builder_args
                 args["tiles_url"] = url
-                args["tile_format"] = self.format_from_url(args["tiles_url"])
-                self.tm.add_layer(TilesManager(**args), opacity=1)
-
-        self.tiles = set()
+                args["tile_format"] = cls.format_from_url(args["tiles_url"])
+                tm.add_layer(TilesManager(**args), opacity=1)
+        return tm
 
-    def format_from_url(self, url):
+    @staticmethod
+    def format_from_url(url):
         """
         Try to guess the tile mime type from the tiles URL.
         Should work with basic stuff like `http://osm.org/{z}/{x}/{y}.png`
@@ -41,15 +103,35 @@ class ZipTilesBuilder:
     def add_coverage(self, bbox, zoomlevels):
         self.tiles |= set(self.tm.tileslist(bbox, zoomlevels))
 
+    def add_geometry_coverage(self, geom, radius, zoomlevels):
+        """
+        Add the tiles intersecting the geometry (in WGS84) buffered by `radius`
+        (in degrees). Unlike `add_coverage` on each vertex, the whole geometry
+        (every part of a multi-geometry) is covered in a single pass.
+        """
+        area = geom.buffer(radius)
+        if area.empty:
+            return
+        prepared = area.prepared
+        proj = GoogleProjection(self.tm.tile_size, zoomlevels)
+        for tile in self.tm.tileslist(area.extent, zoomlevels):
+            z, x, y = tile
+            if self.tm.tile_scheme == "tms":
+                y = 2**z - 1 - y
+            if prepared.intersects(Polygon.from_bbox(proj.tile_bbox((z, x, y)))):
+                self.tiles.add(tile)
+
     def run(self):
-        for tile in self.tiles:
+        # Sorted so that archives are the same from one sync to another
+        for tile in sorted(self.tiles):
             name = "{prefix}{0}/{1}/{2}{ext}".format(
                 *tile,
                 prefix=self.prefix,
                 ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension,
             )
             try:
-                data = self.tm.tile(tile)
+                with self.lock(("tile", *tile)):
+                    data = self.tm.tile(tile)
             except DownloadError:
                 logger.warning("Failed to download tile %s", name)
             else:
@@ -1,12 +1,18 @@
 import os
+from hashlib import md5
 from io import BytesIO
 
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.gis.db.models.functions import Transform
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
 from django.db.models import Q
 from django.http import HttpResponse, HttpResponseNotFound, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.utils.functional import classproperty
+from django.utils.translation import get_language
 from django.utils.translation import gettext_lazy as _
 from django.views import static
 from mapentity import views as mapentity_views
@@ -14,12 +20,16 @@ from mapentity.helpers import suffix_for, user_has_perm
 from pdfimpose.schema.saddle import impose
 from pymupdf import Document
 from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from geotrek.common.functions import AsMVTGeom
 from geotrek.common.models import Attachment, FileType
-from geotrek.common.utils import logger
+from geotrek.common.renderers import MVTRenderer
+from geotrek.common.utils import logger, tile_bounds
 from geotrek.common.utils.portals import smart_get_template_by_portal
 
 
@@ -350,3 +360,92 @@ class ReferencesMixin(APIView):
         if self.pictogram_filename:
             data["pictogram"] = {"url": self.get_pictogram_url(request)}
         return Response(data)
+
+
+class VectorTilesMixin:
+    """
+    Serve the objects of a viewset as Mapbox Vector Tiles (``tiles/{z}/{x}/{y}.mvt``)
+    built by PostGIS, with the same permissions and filters as the list.
+    Tiles are cached until the objects change (see ``get_tile_cache_version``).
+    """
+
+    tile_geometry_field = "geom"
+    tile_fields = ("id",)
+    tile_extent = 4096
+    tile_buffer = 64
+    tile_cache_alias = "fat"
+    tile_cache_timeout = 60 * 60 * 24 * 30
+    # Zoom from which tiles are small enough to be transformed into the SRID
+    # of geometries, so that their spatial index is used
+    tile_index_min_zoom = 6
+    tile_index_segments = 16
+
+    def get_tile_cache_version(self, queryset):
+        latest_updated = queryset.model.latest_updated()
+        return latest_updated.isoformat() if latest_updated else None
+
+    def get_tile_cache_key(self, queryset):
+        key = f"{self.request.get_full_path()}:{get_language()}:{self.get_tile_cache_version(queryset)}"
+        if hasattr(self, "view_cache_key"):
+            # Also depends on what filters the objects, e.g. the user for reports
+            key = f"{key}:{self.view_cache_key()}"
+        return f"tile:{md5(key.encode('utf-8')).hexdigest()}"
+
+    def get_tile(self, queryset, z, x, y):
+        """Returns the tile of the queryset objects, in Mapbox Vector Tile format"""
+        bounds = tile_bounds(z, x, y)
+        if z >= self.tile_index_min_zoom:
+            queryset = queryset.filter(
+                **{
+                    f"{self.tile_geometry_field}__intersects": tile_bounds(
+                        z, x, y, self.tile_index_segments
+                    )
+                }
+            )
+        else:
+            # Large tiles cannot be transformed into the SRID of geometries
+            # (e.g. the whole world): compare in web mercator instead
+            queryset = queryset.alias(
+                tile_geom_3857=Transform(self.tile_geometry_field, 3857)
+            ).filter(tile_geom_3857__intersects=bounds)
+        queryset = (
+            queryset.annotate(
+                tile_geom=AsMVTGeom(
+                    Transform(self.tile_geometry_field, 3857),
+                    bounds,
+                    self.tile_extent,
+                    self.tile_buffer,
+                )
+            )
+            .order_by()
+            .values(*self.tile_fields, "tile_geom")
+        )
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT ST_AsMVT(tile, %s, %s, 'tile_geom', 'id') FROM ({sql}) AS tile",
+                [queryset.model._meta.model_name, self.tile_extent, *params],
+            )
+            return bytes(cursor.fetchone()[0] or b"")
+
+    @action(
+        detail=False,
+        url_path=r"tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)",
+        renderer_classes=[MVTRenderer],
+    )
+    def tile(self, request, z, x, y, *args, **kwargs):
+        z, x, y = int(z), int(x), int(y)
+        if z > 30 or x >= 2**z or y >= 2**z:
+            raise NotFound
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            queryset.model._meta.get_field(self.tile_geometry_field)
+        except FieldDoesNotExist:
+            raise NotFound
+        cache = caches[self.tile_cache_alias]
+        cache_key = self.get_tile_cache_key(queryset)
+        content = cache.get(cache_key)
+        if content is None:
+            content = self.get_tile(queryset, z, x, y)
+            cache.set(cache_key, content, self.tile_cache_timeout)
+        return Response(content)
@@ -1,3 +1,4 @@
+import ftplib
 import importlib
 import json
 import logging
@@ -5,15 +6,20 @@ import mimetypes
 import os
 import re
 import textwrap
+import threading
 import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from ftplib import FTP
 from functools import reduce
+from hashlib import sha1
 from io import BytesIO
+from itertools import islice
 from os.path import dirname
 from pathlib import PurePath
-from time import sleep
+from time import sleep, time
 from urllib.parse import urlparse
 
 import magic
@@ -31,10 +37,12 @@ from django.contrib.gis.geos import (
     fromstr,
 )
 from django.contrib.gis.geos.collections import MultiPolygon
-from django.core.exceptions import FieldError, ImproperlyConfigured
+from django.core.cache import caches
+from django.core.exceptions import FieldError, ImproperlyConfigured, ValidationError
 from django.core.files.base import ContentFile
 from django.db import connection, models
 from django.db.models.fields import NOT_PROVIDED
+from django.db.models.signals import pre_save
 from django.db.utils import InternalError
 from django.template.loader import render_to_string
 from django.utils import translation
@@ -49,7 +57,12 @@ from requests.exceptions import ChunkedEncodingError
 from geotrek.authent.models import default_structure
 from geotrek.common.mixins.models import NoDeleteMixin
 from geotrek.common.models import Attachment, FileType, License, Provider, RecordSource
-from geotrek.common.utils.parsers import add_http_prefix, force_geom_to_2d
+from geotrek.common.signals import objects_changed
+from geotrek.common.utils.parsers import (
+    ReadAheadIterator,
+    add_http_prefix,
+    force_geom_to_2d,
+)
 from geotrek.common.utils.translation import get_translated_fields
 from geotrek.settings.base import api_bbox
 
@@ -94,6 +107,8 @@ class Parser:
     delete: Delete old objects that are now missing from flux (based on 'get_to_delete_kwargs' including 'provider')
     update_only: Do not delete previous objects, and should query remote API with most recent 'date_update' timestamp
     flexible_fields: If set to True, all fields in the API response are flexible, meaning no error is thrown if a mapped field is missing. The default is False.
+    batch_size: If set, rows are parsed by chunks of this size: existing objects are fetched with one query per chunk, and related objects lookups are memoised for the whole import
+    bulk_update: With batch_size, write the updates of a chunk with `bulk_update`, which sends no post_save signal: set it only if saving the model has no side effect besides cache invalidation
     """
 
     label = None
@@ -121,6 +136,8 @@ class Parser:
     field_options = {}
     default_fields_values = {}
     default_language = None
+    batch_size = None
+    bulk_update = False
     headers = {"User-Agent": "Geotrek-admin"}
     intersection_geom = None
     _ref_geom = None
@@ -137,6 +154,10 @@ class Parser:
         self.structure = (user and user.profile.structure) or default_structure()
         self.encoding = encoding
         self.translated_fields = get_translated_fields(self.model)
+        # Batch mode (see `parse_rows`)
+        self.related_objects = {}
+        self.prefetched_objects = None
+        self.pending_updates = None
 
         if not (
             isinstance(settings.PARSER_NUMBER_OF_TRIES, int)
@@ -408,6 +429,9 @@ class Parser:
                         f"Provider '{self.provider}' did not exist in Geotrek-admin and was automatically created"
                     )
             self.obj.save()
+        elif self.pending_updates is not None:
+            if update_fields:
+                self.pending_updates.append((self.line, self.obj, list(update_fields)))
         else:
             self.obj.save(update_fields=update_fields)
         update_fields += self.parse_fields(row, self.m2m_fields)
@@ -443,6 +467,134 @@ class Parser:
         self.eid_val = eid_val
         return {self.eid: eid_val}
 
+    def get_objects_queryset(self):
+        objects = self.model.objects.all()
+        if hasattr(self.model, "provider") and self.provider is not None:
+            objects = objects.filter(provider__name__exact=self.provider)
+        return objects
+
+    def get_eid_key(self, eid_val):
+        """
+        Key of an external id in prefetched objects, converted as the database
+        would compare it (e.g. "12" and 12 for an integer field), or None.
+        """
+        field = self.model._meta.get_field(self.eid)
+        try:
+            return field.get_prep_value(field.to_python(eid_val))
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def get_objects(self, eid_kwargs):
+        """Existing objects with the external id of the current row"""
+        if self.prefetched_objects is not None:
+            key = self.get_eid_key(eid_kwargs[self.eid])
+            if key in self.prefetched_objects:
+                return list(self.prefetched_objects[key])
+        return self.get_objects_queryset().filter(**eid_kwargs)
+
+    def add_prefetched_object(self, obj):
+        """Make an object created in the current chunk visible to the next rows"""
+        if self.prefetched_objects is not None:
+            key = self.get_eid_key(getattr(obj, self.eid))
+            if key is not None:
+                self.prefetched_objects.setdefault(key, []).append(obj)
+
+    def prefetch_objects(self, rows):
+        """
+        Fetch the existing objects of a chunk of rows with a single query.
+        Rows without existing objects still query them (see get_objects).
+        """
+        self.prefetched_objects = None
+        if self.eid is None or "__" in self.eid:
+            return
+        # Warnings will be raised when the rows are actually parsed
+        warnings, line, eid_val = (
+            self.warnings,
+            self.line,
+            getattr(self, "eid_val", None),
+        )
+        self.warnings = {}
+        eid_keys = set()
+        try:
+            for row in rows:
+                try:
+                    eid_keys.add(self.get_eid_key(self.get_eid_kwargs(row)[self.eid]))
+                except Exception:
+                    continue
+        finally:
+            self.warnings, self.line, self.eid_val = warnings, line, eid_val
+        eid_keys.discard(None)
+        m2m_names = {f.name for f in self.model._meta.many_to_many}
+        objects = (
+            self.get_objects_queryset()
+            .filter(**{f"{self.eid}__in": eid_keys})
+            .prefetch_related(
+                *(
+                    (self.m2m_fields.keys() | self.m2m_constant_fields.keys())
+                    & m2m_names
+                )
+            )
+        )
+        self.prefetched_objects = {}
+        for obj in objects:
+            self.add_prefetched_object(obj)
+
+    def can_bulk_update(self):
+        """`bulk_update` skips `save()` and signals: post_save receivers cannot be
+        checked, so the parser must allow it (see `bulk_update`), and caches are
+        invalidated with `objects_changed` once the chunk is written"""
+        return (
+            self.bulk_update
+            and self.model.save is models.Model.save
+            and not pre_save.has_listeners(self.model)
+        )
+
+    def flush_updates(self):
+        """Write the updates of the current chunk with `bulk_update`"""
+        line = self.line
+        updates_by_fields = defaultdict(list)
+        for update_line, obj, update_fields in self.pending_updates:
+            for field in self.model._meta.concrete_fields:
+                if getattr(field, "auto_now", False):
+                    field.pre_save(obj, add=False)
+                    update_fields.append(field.name)
+            updates_by_fields[tuple(sorted(set(update_fields)))].append(
+                (update_line, obj)
+            )
+        self.pending_updates = []
+        for update_fields, updates in updates_by_fields.items():
+            try:
+                self.model.objects.bulk_update(
+                    [obj for update_line, obj in updates], update_fields
+                )
+                objects_changed.send(sender=self.model)
+            except Exception:
+                # Save objects one by one to report errors on their own line
+                for update_line, obj in updates:
+                    self.line = update_line
+                    try:
+                        obj.save(update_fields=update_fields)
+                    except Exception as e:
+                        self.add_warning(str(e))
+        self.line = line
+
+    def parse_rows(self, rows):
+        """Parse a chunk of rows (batch mode)"""
+        self.prefetch_objects(rows)
+        if self.can_bulk_update():
+            self.pending_updates = []
+        try:
+            for row in rows:
+                try:
+                    self.parse_row(row)
+                except Exception as e:
+                    self.add_warning(str(e))
+            if self.pending_updates:
+                self.flush_updates()
+        finally:
+            self.prefetched_objects = None
+            self.pending_updates = None
+
     def parse_row(self, row):
         self.eid_val = None
         self.line += 1
@@ -455,9 +607,7 @@ class Parser:
             except RowImportError as warnings:
                 self.add_warning(str(warnings))
                 return
-            objects = self.model.objects.filter(**eid_kwargs)
-            if hasattr(self.model, "provider") and self.provider is not None:
-                objects = objects.filter(provider__name__exact=self.provider)
+            objects = self.get_objects(eid_kwargs)
         if len(objects) == 0 and self.update_only:
             if self.warn_on_missing_objects:
                 self.add_warning(
@@ -505,6 +655,8 @@ class Parser:
             except BypassRow as warnings:
                 self.add_warning(str(warnings))
                 return
+            if operation == "created" and self.obj.pk:
+                self.add_prefetched_object(self.obj)
         self.nb_success += 1  # FIXME
         if self.progress_cb:
             self.progress_cb(float(self.line) / self.nb, self.line, self.eid_val)
@@ -562,6 +714,37 @@ class Parser:
                 val = mapping[val]
         return val
 
+    def get_related_object(self, model, fields, create=False):
+        """
+        Returns an (object, created) tuple, like `get_or_create` if `create`
+        is set. In batch mode, lookups are memoised for the whole import.
+        """
+        key = None
+        if self.batch_size:
+            key = (model, create, tuple(sorted(fields.items())))
+            try:
+                obj = self.related_objects[key]
+            except KeyError:
+                pass
+            except TypeError:  # Unhashable value (e.g. object without pk)
+                key = None
+            else:
+                if obj is None:
+                    raise model.DoesNotExist
+                return obj, False
+        if create:
+            obj, created = model.objects.get_or_create(**fields)
+        else:
+            try:
+                obj, created = model.objects.get(**fields), False
+            except model.DoesNotExist:
+                if key is not None:
+                    self.related_objects[key] = None
+                raise
+        if key is not None:
+            self.related_objects[key] = obj
+        return obj, created
+
     def filter_fk(
         self,
         src,
@@ -581,7 +764,7 @@ class Parser:
         if fk:
             fields[fk] = getattr(self.obj, fk)
         if create:
-            val, created = model.objects.get_or_create(**fields)
+            val, created = self.get_related_object(model, fields, create=True)
             if created:
                 self.add_warning(
                     _(
@@ -590,7 +773,7 @@ class Parser:
                 )
             return val
         try:
-            return model.objects.get(**fields)
+            return self.get_related_object(model, fields)[0]
         except model.DoesNotExist:
             self.add_warning(
                 _(
@@ -626,7 +809,7 @@ class Parser:
             if fk:
                 fields[fk] = getattr(self.obj, fk)
             if create:
-                subval, created = model.objects.get_or_create(**fields)
+                subval, created = self.get_related_object(model, fields, create=True)
                 if created:
                     self.add_warning(
                         _(
@@ -636,7 +819,7 @@ class Parser:
                 dst.append(subval)
                 continue
             try:
-                dst.append(model.objects.get(**fields))
+                dst.append(self.get_related_object(model, fields)[0])
             except model.DoesNotExist:
                 self.add_warning(
                     _(
@@ -714,16 +897,43 @@ class Parser:
             lang = settings.MODELTRANSLATION_DEFAULT_LANGUAGE
         with translation.override(lang, deactivate=True):
             self.start()
-            for i, row in enumerate(self.next_row()):
-                if limit and i >= limit:
-                    break
+            rows = self.next_row()
+            if limit:
+                rows = islice(rows, limit)
+            chunk = []
+            for row in self.read_ahead(rows):
+                if self.batch_size:
+                    chunk.append(row)
+                    if len(chunk) >= self.batch_size:
+                        self.parse_rows(chunk)
+                        chunk = []
+                    continue
                 try:
                     self.parse_row(row)
                 except Exception as e:
                     self.add_warning(str(e))
+            if chunk:
+                self.parse_rows(chunk)
             self.end()
 
-    def request_or_retry(self, url, verb="get", **kwargs):
+    def read_ahead(self, rows):
+        """Hook to prepare the next rows while the current one is parsed"""
+        return rows
+
+    def read_pages(self, pages):
+        """Fetch the next pages in a background thread while the current one is parsed"""
+        size = settings.PARSER_READ_AHEAD_PAGES
+        if not size:
+            yield from pages
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            reader = ReadAheadIterator(pages, executor, size=size)
+            try:
+                yield from reader
+            finally:
+                reader.close()
+
+    def request_or_retry(self, url, verb="get", session=None, **kwargs):
         def prepare_retry(error_msg):
             logger.info("Failed to fetch %s. %s. Retrying...", url, error_msg)
             sleep(settings.PARSER_RETRY_SLEEP_TIME)
@@ -734,16 +944,22 @@ class Parser:
                 "error_msg": e,
             }
 
-        action = getattr(requests, verb)
+        action = getattr(requests if session is None else session, verb)
+        kwargs.setdefault("headers", self.headers)
+        # "Not Modified" is the expected answer to a conditional request
+        conditional = any(
+            header in kwargs["headers"]
+            for header in ("If-None-Match", "If-Modified-Since")
+        )
         response = None
         try_get = 0
         while try_get < settings.PARSER_NUMBER_OF_TRIES:
             try_get += 1
             try:
-                response = action(
-                    url, headers=self.headers, allow_redirects=True, **kwargs
-                )
-                if response.status_code == 200:
+                response = action(url, allow_redirects=True, **kwargs)
+                if response.status_code == 200 or (
+                    conditional and response.status_code == 304
+                ):
                     return response
                 elif response.status_code in settings.PARSER_RETRY_HTTP_STATUS:
                     prepare_retry(f"Status code: {response.status_code}")
@@ -949,6 +1165,10 @@ class AttachmentParserMixin:
         "attachments": _("Attachments"),
     }
     default_license_label = None
+    # Download the attachments of the next rows while the current one is parsed
+    read_ahead_attachments = True
+    fetched_attachments = None
+    ftp_connections = None
 
     def start(self):
         super().start()
@@ -994,13 +1214,98 @@ class AttachmentParserMixin:
             if subval.strip()
         ]
 
+    def end(self):
+        super().end()
+        for ftp in (self.ftp_connections or {}).values():
+            try:
+                ftp.quit()
+            except ftplib.all_errors:
+                ftp.close()
+        self.ftp_connections = None
+
+    def get_attachment_cache_key(self, url):
+        return f"attachment:{sha1(url.encode()).hexdigest()}"
+
+    def get_cached_attachment(self, url):
+        """Remote state of an attachment (size, ETag and Last-Modified) when it was last fetched"""
+        return caches["parsers"].get(self.get_attachment_cache_key(url))
+
+    def cache_attachment(self, url, size, etag=None, last_modified=None):
+        caches["parsers"].set(
+            self.get_attachment_cache_key(url),
+            {
+                "size": size,
+                "etag": etag,
+                "last_modified": last_modified,
+                "date": time(),
+            },
+        )
+
+    def is_cache_fresh(self, cached):
+        return (
+            cached is not None
+            and time() - cached["date"] < settings.PARSER_ATTACHMENTS_CACHE_TIMEOUT
+        )
+
+    def get_attachment_size(self, attachment):
+        try:
+            return attachment.attachment_file.size
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def get_ftp_connection(self, parsed_url):
+        """Connections are kept open until the end of the import"""
+        if self.ftp_connections is None:
+            self.ftp_connections = {}
+        key = (parsed_url.hostname, parsed_url.username)
+        ftp = self.ftp_connections.get(key)
+        if ftp is not None:
+            try:
+                ftp.voidcmd("NOOP")
+                return ftp
+            except ftplib.all_errors:
+                ftp.close()
+        ftp = FTP(parsed_url.hostname)
+        ftp.login(user=parsed_url.username, passwd=parsed_url.password)
+        self.ftp_connections[key] = ftp
+        return ftp
+
+    def get_fetched_attachment(self, url):
+        """Response of an attachment downloaded in advance (see `read_ahead`), if any"""
+        if not self.fetched_attachments or url not in self.fetched_attachments:
+            return None
+        try:
+            return self.fetched_attachments[url].result()
+        except (requests.exceptions.ConnectionError, DownloadImportError) as e:
+            msg = f"Failed to load attachment: {e}"
+            raise ValueImportError(msg)
+
     def has_size_changed(self, url, attachment):
+        cached = self.get_cached_attachment(url)
+        if self.is_cache_fresh(cached):
+            return cached["size"] != self.get_attachment_size(attachment)
+
+        response = self.get_fetched_attachment(url)
+        if response is not None:
+            if response.status_code == 304 and cached is not None:
+                self.cache_attachment(
+                    url, cached["size"], cached["etag"], cached["last_modified"]
+                )
+                return cached["size"] != self.get_attachment_size(attachment)
+            if response.status_code == 200:
+                self.cache_attachment(
+                    url,
+                    len(response.content),
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                )
+            return len(response.content) != self.get_attachment_size(attachment)
+
         parsed_url = urlparse(url)
         if parsed_url.scheme == "ftp":
             directory = dirname(parsed_url.path)
 
-            ftp = FTP(parsed_url.hostname)
-            ftp.login(user=parsed_url.username, passwd=parsed_url.password)
+            ftp = self.get_ftp_connection(parsed_url)
             ftp.cwd(directory)
             size = ftp.size(parsed_url.path.split("/")[-1:][0])
             return size != attachment.attachment_file.size
@@ -1011,6 +1316,12 @@ class AttachmentParserMixin:
             except (requests.exceptions.ConnectionError, DownloadImportError) as e:
                 msg = f"Failed to load attachment: {e}"
                 raise ValueImportError(msg)
+            etag = response.headers.get("etag")
+            if cached is not None and etag and etag == cached["etag"]:
+                self.cache_attachment(
+                    url, cached["size"], cached["etag"], cached["last_modified"]
+                )
+                return cached["size"] != self.get_attachment_size(attachment)
             size = response.headers.get("content-length")
             try:
                 return size is not None and int(size) != attachment.attachment_file.size
@@ -1023,12 +1334,124 @@ class AttachmentParserMixin:
         parsed_url = urlparse(url)
         is_ftp = parsed_url.scheme == "ftp"
         if is_ftp or self.download_attachments:
+            response = None
             try:
-                response = self.request_or_retry(url)
-            except Exception as e:
-                self.add_warning(_("Failed to load attachment: %(e)s") % {"e": e})
+                response = self.get_fetched_attachment(url)
+            except ValueImportError as e:
+                self.add_warning(str(e))
                 return None
-            return response.read() if is_ftp else response.content
+            if response is None or response.status_code != 200:
+                try:
+                    response = self.request_or_retry(url)
+                except Exception as e:
+                    self.add_warning(_("Failed to load attachment: %(e)s") % {"e": e})
+                    return None
+            if is_ftp:
+                return response.read()
+            if response.content is not None:
+                self.cache_attachment(
+                    url,
+                    len(response.content),
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                )
+            return response.content
+
+    def fetch_attachment(self, url, headers):
+        """Download an attachment in a worker thread (see `read_ahead`)"""
+        return self.request_or_retry(
+            url, session=self.sessions.session, headers={**self.headers, **headers}
+        )
+
+    def get_attachments_urls(self, row):
+        """URLs of the attachments of a row which need to be downloaded"""
+        src = self.non_fields["attachments"]
+        # Warnings will be raised when the row is actually parsed
+        warnings = self.warnings
+        self.warnings = {}
+        try:
+            val = self.get_val(row, "attachments", self.normalize_src(src))
+            attachments = self.filter_attachments(src, val) or []
+        except Exception:
+            return []
+        finally:
+            self.warnings = warnings
+        urls = []
+        for attachment_data in attachments:
+            if not attachment_data or not isinstance(attachment_data[0], str):
+                continue
+            url = self.base_url + attachment_data[0]
+            if urlparse(url).scheme in ("http", "https"):
+                urls.append(url)
+        return urls
+
+    def read_ahead(self, rows):
+        """Download the attachments of the next rows in a pool of threads"""
+        rows = super().read_ahead(rows)
+        workers = settings.PARSER_ATTACHMENTS_WORKERS
+        if (
+            workers <= 1
+            or not self.read_ahead_attachments
+            or not self.download_attachments
+            or "attachments" not in self.non_fields
+        ):
+            yield from rows
+            return
+
+        self.sessions = threading.local()
+        sessions = []
+
+        def init_worker():
+            # Each thread keeps its connections open with its own session
+            self.sessions.session = requests.Session()
+            sessions.append(self.sessions.session)
+
+        self.fetched_attachments = {}
+        self.fetched_rows = deque()
+        window = deque()
+        executor = ThreadPoolExecutor(max_workers=workers, initializer=init_worker)
+        try:
+            for row in rows:
+                urls = self.get_attachments_urls(row)
+                for url in urls:
+                    if url in self.fetched_attachments:
+                        continue
+                    cached = self.get_cached_attachment(url)
+                    if self.is_cache_fresh(cached):
+                        continue
+                    headers = {}
+                    if cached is not None and cached["etag"]:
+                        headers["If-None-Match"] = cached["etag"]
+                    if cached is not None and cached["last_modified"]:
+                        headers["If-Modified-Since"] = cached["last_modified"]
+                    self.fetched_attachments[url] = executor.submit(
+                        self.fetch_attachment, url, headers
+                    )
+                self.fetched_rows.append(urls)
+                window.append(row)
+                if len(window) > workers:
+                    yield window.popleft()
+            while window:
+                yield window.popleft()
+        finally:
+            for future in self.fetched_attachments.values():
+                future.cancel()
+            executor.shutdown()
+            for session in sessions:
+                session.close()
+            self.fetched_attachments = None
+
+    def parse_row(self, row):
+        try:
+            super().parse_row(row)
+        finally:
+            if self.fetched_attachments is not None and self.fetched_rows:
+                # Free the downloads of this row, unless a next row needs them too
+                urls = self.fetched_rows.popleft()
+                needed = set().union(*self.fetched_rows)
+                for url in urls:
+                    if url not in needed:
+                        self.fetched_attachments.pop(url, None)
 
     def check_attachment_updated(self, attachments_to_delete, updated, **kwargs):
         found = False
@@ -1254,19 +1677,13 @@ class TourInSoftParser(AttachmentParserMixin, Parser):
             return len(self.root["value"])
         return int(self.root["d"]["__count"])
 
-    def parse_data(self, params):
-        response = self.request_or_retry(self.url, params=params)
-        self.root = response.json()
-        self.nb = self.get_nb()
-        for row in self.items:
-            yield {self.normalize_field_name(src): val for src, val in row.items()}
-
-    def next_row(self):
+    def get_pages(self):
         if self.version_tourinsoft == 3:
             params = {
                 "format": "json",
             }
-            yield from self.parse_data(params)
+            response = self.request_or_retry(self.url, params=params)
+            yield response.json()
 
         elif self.version_tourinsoft == 2:
             skip = 0
@@ -1277,12 +1694,20 @@ class TourInSoftParser(AttachmentParserMixin, Parser):
                 "$skip": 0,
             }
             while True:
-                yield from self.parse_data(params)
+                response = self.request_or_retry(self.url, params=params)
+                page = response.json()
+                yield page
                 skip += 1000
                 params["$skip"] = skip
-                if skip >= self.nb:
+                if skip >= int(page["d"]["__count"]):
                     return
 
+    def next_row(self):
+        for self.root in self.read_pages(self.get_pages()):
+            self.nb = self.get_nb()
+            for row in self.items:
+                yield {self.normalize_field_name(src): val for src, val in row.items()}
+
     def filter_attachments(self, src, val):
         if not val:
             return []
@@ -1592,6 +2017,8 @@ class GeotrekAggregatorParser:
     }
 
     invalid_model_topology = ["Trek", "POI", "Service", "Signage", "Infrastructure"]
+    # Number of threads fetching API pages while the previous parsers run
+    workers = 1
 
     def __init__(self, progress_cb=None, user=None, encoding="utf8"):
         self.progress_cb = progress_cb
@@ -1640,41 +2067,53 @@ class GeotrekAggregatorParser:
         with open(filename) as f:
             json_aggregator = json.load(f)
 
-        for key, datas in json_aggregator.items():
-            self.report_by_api_v2_by_type[key] = {}
-            models_to_import = datas.get("data_to_import")
-            if not models_to_import:
-                models_to_import = self.mapping_model_parser.keys()
-            parsers_to_parse = []
-            for model in models_to_import:
-                if settings.TREKKING_TOPOLOGY_ENABLED:
-                    if model in self.invalid_model_topology:
-                        warning = (
-                            f"{model}s can't be imported with dynamic segmentation"
-                        )
-                        logger.warning(warning)
-                        key_warning = _("Model %(model)s") % {"model": model}
-                        self.add_warning(key_warning, warning)
-                        self.report_by_api_v2_by_type[key][model] = {
-                            "nb_lines": 0,
-                            "nb_success": 0,
-                            "nb_created": 0,
-                            "nb_updated": 0,
-                            "nb_deleted": None,
-                            "nb_unmodified": 0,
-                            "warnings": self.warnings,
-                        }
-                        continue
-                module_name, class_name = self.mapping_model_parser[model]
-                module = importlib.import_module(module_name)
-                parser = getattr(module, class_name)
-                if "url" not in datas:
-                    warning = f"{key} has no url"
-                    key_warning = _("Geotrek-admin")
+        if self.workers <= 1:
+            for key, datas in json_aggregator.items():
+                parsers_to_parse = self.get_parsers(key, datas)
+                self.run_method_parser(key, parsers_to_parse, "start_meta")
+                self.run_method_parser(key, parsers_to_parse, "parse")
+                self.run_method_parser(key, parsers_to_parse, "end_meta")
+        else:
+            self.parse_concurrently(json_aggregator)
+
+    def parse_concurrently(self, json_aggregator):
+        """
+        Prepare the parsers of every Geotrek-admin first, so that their pages
+        are fetched by a pool of threads while the previous parsers run.
+        Objects are still written to the database one parser at a time.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        readers = []
+        try:
+            parsers_by_key = {}
+            for key, datas in json_aggregator.items():
+                parsers_to_parse = self.get_parsers(key, datas)
+                self.run_method_parser(key, parsers_to_parse, "start_meta")
+                for parser in parsers_to_parse:
+                    readers.append(parser.read_pages_ahead(executor))
+                parsers_by_key[key] = parsers_to_parse
+            for key, parsers_to_parse in parsers_by_key.items():
+                self.run_method_parser(key, parsers_to_parse, "parse")
+                self.run_method_parser(key, parsers_to_parse, "end_meta")
+        finally:
+            for reader in readers:
+                reader.close()
+            executor.shutdown(cancel_futures=True)
+
+    def get_parsers(self, key, datas):
+        self.report_by_api_v2_by_type[key] = {}
+        models_to_import = datas.get("data_to_import")
+        if not models_to_import:
+            models_to_import = self.mapping_model_parser.keys()
+        parsers_to_parse = []
+        for model in models_to_import:
+            if settings.TREKKING_TOPOLOGY_ENABLED:
+                if model in self.invalid_model_topology:
+                    warning = f"{model}s can't be imported with dynamic segmentation"
+                    logger.warning(warning)
+                    key_warning = _("Model %(model)s") % {"model": model}
                     self.add_warning(key_warning, warning)
-                    self.report_by_api_v2_by_type[key][
-                        str(parser.model._meta.model_name).capitalize()
-                    ] = {
+                    self.report_by_api_v2_by_type[key][model] = {
                         "nb_lines": 0,
                         "nb_success": 0,
                         "nb_created": 0,
@@ -1683,21 +2122,37 @@ class GeotrekAggregatorParser:
                         "nb_unmodified": 0,
                         "warnings": self.warnings,
                     }
-                else:
-                    Parser = parser(
-                        progress_cb=self.progress_cb,
-                        provider=key,
-                        url=datas["url"],
-                        portals_filter=datas.get("portals"),
-                        mapping=datas.get("mapping"),
-                        create_categories=datas.get("create"),
-                        all_datas=datas.get("all_datas"),
-                    )
-                    parsers_to_parse.append(Parser)
-
-            self.run_method_parser(key, parsers_to_parse, "start_meta")
-            self.run_method_parser(key, parsers_to_parse, "parse")
-            self.run_method_parser(key, parsers_to_parse, "end_meta")
+                    continue
+            module_name, class_name = self.mapping_model_parser[model]
+            module = importlib.import_module(module_name)
+            parser = getattr(module, class_name)
+            if "url" not in datas:
+                warning = f"{key} has no url"
+                key_warning = _("Geotrek-admin")
+                self.add_warning(key_warning, warning)
+                self.report_by_api_v2_by_type[key][
+                    str(parser.model._meta.model_name).capitalize()
+                ] = {
+                    "nb_lines": 0,
+                    "nb_success": 0,
+                    "nb_created": 0,
+                    "nb_updated": 0,
+                    "nb_deleted": None,
+                    "nb_unmodified": 0,
+                    "warnings": self.warnings,
+                }
+            else:
+                Parser = parser(
+                    progress_cb=self.progress_cb,
+                    provider=key,
+                    url=datas["url"],
+                    portals_filter=datas.get("portals"),
+                    mapping=datas.get("mapping"),
+                    create_categories=datas.get("create"),
+                    all_datas=datas.get("all_datas"),
+                )
+                parsers_to_parse.append(Parser)
+        return parsers_to_parse
 
     def report(self, output_format="txt"):
         context = {"report": self.report_by_api_v2_by_type}
@@ -1745,6 +2200,7 @@ class GeotrekParser(AttachmentParserMixin, Parser):
     create_categories = False
     all_datas = False
     provider = None
+    pages = None
 
     def __init__(
         self,
@@ -1951,11 +2407,7 @@ class GeotrekParser(AttachmentParserMixin, Parser):
             "portals": ",".join(self.portals_filter) if self.portals_filter else "",
         }
 
-    def next_row(self):
-        """Returns next row.
-        Geotrek API is paginated, run until "next" is empty
-        :returns row
-        """
+    def get_pages_params(self):
         updated_after = None
 
         available_fields = [field.name for field in self.model._meta.get_fields()]
@@ -1969,23 +2421,41 @@ class GeotrekParser(AttachmentParserMixin, Parser):
                 .latest("date_update")
                 .date_update.strftime("%Y-%m-%d")
             )
-        self.params_used = {"updated_after": updated_after, **self.get_url_params()}
-        response = self.request_or_retry(self.next_url, params=self.params_used)
-        self.root = response.json()
-        self.nb = int(self.root["count"])
+        return {"updated_after": updated_after, **self.get_url_params()}
+
+    def get_pages(self, url, params):
+        """Geotrek API is paginated, fetch pages until "next" is empty"""
+        response = self.request_or_retry(url, params=params)
+        page = response.json()
+        yield page
+        while page["next"]:
+            response = self.request_or_retry(page["next"])
+            page = response.json()
+            yield page
+
+    def read_pages_ahead(self, executor):
+        """Fetch the pages in `executor` before the parser runs (no database access there)"""
+        self.params_used = self.get_pages_params()
+        self.pages = ReadAheadIterator(
+            self.get_pages(self.next_url, self.params_used),
+            executor,
+            size=settings.PARSER_READ_AHEAD_PAGES or 1,
+        )
+        return self.pages
 
-        for row in self.items:
-            yield row
-        self.next_url = self.root["next"]
+    def next_row(self):
+        """Returns next row.
+        :returns row
+        """
+        if self.pages is None:
+            self.params_used = self.get_pages_params()
+            pages = self.read_pages(self.get_pages(self.next_url, self.params_used))
+        else:
+            pages, self.pages = self.pages, None
 
-        while self.next_url:
-            response = self.request_or_retry(self.next_url)
-            self.root = response.json()
+        for self.root in pages:
             self.nb = int(self.root["count"])
-
-            for row in self.items:
-                yield row
-
+            yield from self.items
             self.next_url = self.root["next"]
 
     def get_sources_extra_fields(self):
@@ -2058,14 +2528,15 @@ class ApidaeBaseParser(Parser):
             return []
         return self.root["objetsTouristiques"]
 
-    def next_row(self):
+    def get_pages(self):
+        skip = self.skip
         while True:
             params = {
                 "apiKey": self.api_key,
                 "projetId": self.project_id,
                 "selectionIds": [self.selection_id],
                 "count": self.size,
-                "first": self.skip,
+                "first": skip,
                 "responseFields": self.responseFields,
             }
             if self.locales:
@@ -2073,12 +2544,17 @@ class ApidaeBaseParser(Parser):
             response = self.request_or_retry(
                 self.url, params={"query": json.dumps(params)}
             )
-            self.root = response.json()
+            page = response.json()
+            yield page
+            skip += self.size
+            if skip >= int(page["numFound"]):
+                return
+
+    def next_row(self):
+        for self.root in self.read_pages(self.get_pages()):
             self.nb = int(self.root["numFound"])
             yield from self.items
             self.skip += self.size
-            if self.skip >= self.nb:
-                return
 
     def normalize_field_name(self, name):
         return name
@@ -2088,6 +2564,8 @@ class OpenStreetMapAttachmentsParserMixin(AttachmentParserMixin):
     base_url_wikimedia = "https://api.wikimedia.org/core/v1/commons/file/"
     non_fields = {"attachments": ("tags.wikimedia_commons", "tags.image")}
     default_license_label = "CC-by-sa 4.0"
+    # `filter_attachments` queries Wikimedia API
+    read_ahead_attachments = False
 
     def filter_attachments(self, src, val):
         attachments = []
@@ -1,6 +1,19 @@
-from rest_framework.renderers import JSONRenderer
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 
 
 class GTAMRenderer(JSONRenderer):
     format = "gtam"
     media_type = "application/json"
+
+
+class MVTRenderer(BaseRenderer):
+    """Output Mapbox Vector Tiles built by the database as is"""
+
+    format = "mvt"
+    media_type = "application/vnd.mapbox-vector-tile"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors are only given by their status code
+        return data if isinstance(data, bytes) else b""
@@ -1,12 +1,17 @@
 from django.contrib.admin.models import DELETION, LogEntry
 from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_delete, post_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from django.utils.timezone import now
 from mapentity.utils import get_internal_user
 
 from geotrek.common.models import AccessibilityAttachment, Attachment, HDViewPoint
 
+# Sent with a model as sender when objects of this model are written without
+# post_save or post_delete signals (e.g. with bulk_update or SQL queries), so
+# that data cached from them can be invalidated
+objects_changed = Signal()
+
 
 def log_cascade_deletion(sender, instance, related_model, cascading_field):
     related_objects = related_model.objects.filter(
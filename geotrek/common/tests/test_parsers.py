@@ -7,16 +7,19 @@ from urllib.parse import urlparse
 import requests
 from django.conf import settings
 from django.contrib.gis.geos import fromstr
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import DatabaseError
 from django.template.exceptions import TemplateDoesNotExist
 from django.test import TestCase
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from requests import Response
 from requests.exceptions import ChunkedEncodingError
 
+from geotrek.authent.models import Structure
 from geotrek.authent.tests.factories import StructureFactory
 from geotrek.common.models import (
     Attachment,
@@ -42,6 +45,7 @@ from geotrek.common.parsers import (
     ValueImportError,
     XmlParser,
 )
+from geotrek.common.signals import objects_changed
 from geotrek.common.tests.factories import ThemeFactory
 from geotrek.common.tests.mixins import GeotrekParserTestMixin
 from geotrek.common.utils.testdata import SVG_FILE, get_dummy_img
@@ -156,6 +160,17 @@ class OrganismWithAttachmentJSONParser(AttachmentParserMixin, OrganismJSONParser
     non_fields = {"attachments": "image"}
 
 
+class OrganismStructureJSONParser(OrganismJSONParser):
+    eid = "organism"
+    fields = {"organism": "name", "structure": "structure"}
+    natural_keys = {"structure": "name"}
+
+
+class OrganismStructureBatchJSONParser(OrganismStructureJSONParser):
+    batch_size = 2
+    bulk_update = True
+
+
 class RowExceptionTestParser(OrganismJSONParser):
     def filter_organism(self, src, val):
         if val == "foo":
@@ -757,6 +772,103 @@ class ParserTests(TestCase):
         )
 
 
+class BatchParserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.structure_1 = StructureFactory.create(name="S1")
+        cls.structure_2 = StructureFactory.create(name="S2")
+
+    def setUp(self):
+        rows = [
+            {"name": "a", "structure": "S1"},
+            {"name": "b", "structure": "unknown"},
+            {"name": "a", "structure": "S2"},
+            {"name": "c", "structure": "S1"},
+            {"name": "d", "structure": "unknown"},
+            {"name": "e", "structure": "S1"},
+        ]
+        self.filename = os.path.join(settings.TMP_DIR, "batch_organisms.json")
+        with open(self.filename, "w") as f:
+            json.dump({"features": rows}, f)
+        self.addCleanup(os.remove, self.filename)
+
+    def run_parser(self, parser_class):
+        Organism.objects.all().delete()
+        Organism.objects.create(organism="a", structure=None)
+        Organism.objects.create(organism="c", structure=self.structure_2)
+        parser = parser_class()
+        with CaptureQueriesContext(connection) as queries:
+            parser.parse(self.filename)
+        organisms = list(
+            Organism.objects.order_by("organism").values_list(
+                "organism", "structure__name"
+            )
+        )
+        return parser, organisms, len(queries)
+
+    def test_same_result_as_row_by_row(self):
+        parser, organisms, nb_queries = self.run_parser(OrganismStructureJSONParser)
+        batch_parser, batch_organisms, batch_nb_queries = self.run_parser(
+            OrganismStructureBatchJSONParser
+        )
+        self.assertEqual(
+            organisms,
+            [
+                ("a", "S2"),
+                ("b", None),
+                ("c", "S1"),
+                ("d", None),
+                ("e", "S1"),
+            ],
+        )
+        self.assertEqual(batch_organisms, organisms)
+        self.assertEqual(batch_parser.warnings, parser.warnings)
+        self.assertEqual(batch_parser.report(), parser.report())
+        self.assertEqual(batch_parser.nb_created, 3)
+        self.assertEqual(batch_parser.nb_updated, 3)
+        self.assertLess(batch_nb_queries, nb_queries)
+
+    def test_prefetched_objects_keys_normalised(self):
+        organism_1 = Organism.objects.create(organism="x")
+        organism_2 = Organism.objects.create(organism="y")
+        parser = OrganismStructureBatchJSONParser()
+        parser.eid = "id"
+        parser.fields = {"id": "id"}
+        parser.prefetch_objects([{"id": str(organism_1.pk)}, {"id": "unknown"}])
+        with self.assertNumQueries(0):
+            self.assertEqual(parser.get_objects({"id": organism_1.pk}), [organism_1])
+        # Objects missing from the chunk are still looked up in database
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(parser.get_objects({"id": str(organism_2.pk)})), [organism_2]
+            )
+
+    def test_bulk_updates_send_objects_changed(self):
+        receiver = mock.Mock()
+        objects_changed.connect(receiver)
+        self.addCleanup(objects_changed.disconnect, receiver)
+        self.run_parser(OrganismStructureBatchJSONParser)
+        receiver.assert_called_with(signal=objects_changed, sender=Organism)
+
+    def test_bulk_updates_are_opt_in(self):
+        parser = OrganismStructureBatchJSONParser()
+        self.assertTrue(parser.can_bulk_update())
+        parser.bulk_update = False
+        self.assertFalse(parser.can_bulk_update())
+
+    def test_related_objects_memoised(self):
+        parser = OrganismStructureBatchJSONParser()
+        parser.parse(self.filename)
+        self.assertEqual(
+            parser.related_objects,
+            {
+                (Structure, False, (("name", "S1"),)): self.structure_1,
+                (Structure, False, (("name", "S2"),)): self.structure_2,
+                (Structure, False, (("name", "unknown"),)): None,
+            },
+        )
+
+
 class ThemeParser(ExcelParser):
     """Parser used in MultilangParserTests, using Theme because it has a translated field"""
 
@@ -1533,6 +1645,94 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment2.license.label, "Creative Commons")
 
 
+@override_settings(
+    PARSER_ATTACHMENTS_WORKERS=2,
+    CACHES={
+        **settings.CACHES,
+        "parsers": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "parsers",
+        },
+    },
+)
+class AttachmentReadAheadTests(TestCase):
+    def setUp(self):
+        FileType.objects.create(type="Photographie")
+        caches["parsers"].clear()
+        self.filename = os.path.join(
+            os.path.dirname(__file__), "data", "one_organism_with_two_images.json"
+        )
+
+    def make_response(self, status_code):
+        response = Response()
+        response.status_code = status_code
+        response._content = b"foo" if status_code == 200 else b""
+        response.headers["ETag"] = '"foo"'
+        return response
+
+    def import_organisms(self):
+        call_command(
+            "import",
+            "geotrek.common.tests.test_parsers.OrganismWithAttachmentJSONParser",
+            self.filename,
+            verbosity=0,
+        )
+
+    @mock.patch("requests.head")
+    @mock.patch("requests.get")
+    @mock.patch("requests.Session.get")
+    def test_download_in_workers(self, mocked_session_get, mocked_get, mocked_head):
+        mocked_session_get.return_value = self.make_response(200)
+        self.import_organisms()
+        self.assertEqual(Attachment.objects.count(), 2)
+        self.assertEqual(mocked_session_get.call_count, 2)
+        mocked_get.assert_not_called()
+        mocked_head.assert_not_called()
+
+    @mock.patch("requests.head")
+    @mock.patch("requests.Session.get")
+    def test_unchanged_attachments_are_not_checked(
+        self, mocked_session_get, mocked_head
+    ):
+        mocked_session_get.return_value = self.make_response(200)
+        self.import_organisms()
+        attachments = set(Attachment.objects.values_list("pk", flat=True))
+        self.import_organisms()
+        self.assertEqual(
+            set(Attachment.objects.values_list("pk", flat=True)), attachments
+        )
+        self.assertEqual(mocked_session_get.call_count, 2)
+        mocked_head.assert_not_called()
+
+    @mock.patch("requests.Session.get")
+    def test_unchanged_downloaded_attachments_are_cached(self, mocked_session_get):
+        mocked_session_get.return_value = self.make_response(200)
+        self.import_organisms()
+        caches["parsers"].clear()
+        self.import_organisms()
+        self.assertEqual(mocked_session_get.call_count, 4)
+        # Attachments downloaded in advance but unchanged are not fetched again
+        self.import_organisms()
+        self.assertEqual(mocked_session_get.call_count, 4)
+
+    @mock.patch("requests.Session.get")
+    def test_not_modified_attachments_are_not_downloaded(self, mocked_session_get):
+        mocked_session_get.return_value = self.make_response(200)
+        self.import_organisms()
+        attachments = set(Attachment.objects.values_list("pk", flat=True))
+        mocked_session_get.reset_mock()
+        mocked_session_get.return_value = self.make_response(304)
+        with override_settings(PARSER_ATTACHMENTS_CACHE_TIMEOUT=0):
+            self.import_organisms()
+        self.assertEqual(
+            set(Attachment.objects.values_list("pk", flat=True)), attachments
+        )
+        self.assertEqual(mocked_session_get.call_count, 2)
+        self.assertEqual(
+            mocked_session_get.call_args.kwargs["headers"]["If-None-Match"], '"foo"'
+        )
+
+
 class TestXmlParser(XmlParser):
     results_path = "Result/el"
     model = Organism
@@ -1651,6 +1851,37 @@ class TourInSoftParserTests(TestCase):
         nb = parser.get_nb()
         self.assertEqual(nb, 3)
 
+    @override_settings(PARSER_READ_AHEAD_PAGES=2)
+    @mock.patch("requests.get")
+    def test_next_row_read_ahead(self, mocked_get):
+        class TestTourParser(TourInSoftParser):
+            url = "http://test.com"
+
+            def __init__(self):
+                self.model = Trek
+                super().__init__()
+
+        def mocked_requests_get(url, params, **kwargs):
+            skip = params["$skip"]
+            response = mock.Mock(status_code=200)
+            response.json.return_value = {
+                "d": {
+                    "__count": "2500",
+                    "results": [{"id": skip + i} for i in range(3)],
+                }
+            }
+            return response
+
+        mocked_get.side_effect = mocked_requests_get
+        parser = TestTourParser()
+        rows = list(parser.next_row())
+        self.assertEqual(
+            [row["ID"] for row in rows],
+            [0, 1, 2, 1000, 1001, 1002, 2000, 2001, 2002],
+        )
+        self.assertEqual(parser.nb, 2500)
+        self.assertEqual(mocked_get.call_count, 3)
+
 
 class TourismSystemParserTest(TestCase):
     @mock.patch("geotrek.common.parsers.HTTPBasicAuth")
@@ -1739,6 +1970,10 @@ class GeotrekAggregatorTestParser(GeotrekAggregatorParser):
     pass
 
 
+class GeotrekAggregatorWorkersTestParser(GeotrekAggregatorParser):
+    workers = 2
+
+
 class GeotrekParserTest(GeotrekParserTestMixin, TestCase):
     def setUp(self, *args, **kwargs):
         self.filetype = FileType.objects.create(type="Photographie")
@@ -1989,6 +2224,36 @@ class GeotrekAggregatorParserTest(GeotrekParserTestMixin, TestCase):
         # "POI", "InformationDesk", "TouristicContent"
         self.assertEqual(8, mocked_import_module.call_count)
 
+    @skipIf(
+        settings.TREKKING_TOPOLOGY_ENABLED, "Test without dynamic segmentation only"
+    )
+    @mock.patch("geotrek.common.parsers.importlib.import_module")
+    def test_geotrek_aggregator_parser_workers(self, mocked_import_module):
+        filename = os.path.join(
+            os.path.dirname(__file__),
+            "data",
+            "geotrek_parser_v2",
+            "config_aggregator_multiple_admin.json",
+        )
+        call_command(
+            "import",
+            "geotrek.common.tests.test_parsers.GeotrekAggregatorWorkersTestParser",
+            filename=filename,
+            verbosity=2,
+            stdout=StringIO(),
+        )
+        module = mocked_import_module.return_value
+        poi_parser = module.GeotrekPOIParser.return_value
+        self.assertEqual(poi_parser.read_pages_ahead.call_count, 3)
+        self.assertEqual(poi_parser.parse.call_count, 3)
+        self.assertEqual(poi_parser.end_meta.call_count, 3)
+        # Pages of every parser are fetched before the first one runs
+        calls = [name for name, args, kwargs in module.mock_calls]
+        self.assertLess(
+            max(i for i, name in enumerate(calls) if name.endswith("read_pages_ahead")),
+            min(i for i, name in enumerate(calls) if name.endswith(".parse")),
+        )
+
     @skipIf(
         settings.TREKKING_TOPOLOGY_ENABLED, "Test without dynamic segmentation only"
     )
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copy as copyfile
 
 from django.conf import settings
@@ -12,6 +13,7 @@ from ..utils.file_infos import get_encoding_file
 from ..utils.import_celery import create_tmp_destination, subclasses
 from ..utils.parsers import (
     GeomValueError,
+    ReadAheadIterator,
     add_http_prefix,
     force_geom_to_2d,
     get_geom_from_gpx,
@@ -115,6 +117,41 @@ class UtilsParsersTest(SimpleTestCase):
         self.assertEqual("http://test.com", add_http_prefix("http://test.com"))
 
 
+class ReadAheadIteratorTest(SimpleTestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_items_are_read_in_order(self):
+        iterator = ReadAheadIterator(iter(range(10)), self.executor, size=2)
+        self.assertEqual(list(iterator), list(range(10)))
+
+    def test_errors_are_raised_again(self):
+        def items():
+            yield 1
+            msg = "Page not found"
+            raise ValueError(msg)
+
+        iterator = iter(ReadAheadIterator(items(), self.executor))
+        self.assertEqual(next(iterator), 1)
+        with self.assertRaisesRegex(ValueError, "Page not found"):
+            next(iterator)
+
+    def test_close_stops_reading(self):
+        read = []
+
+        def items():
+            for i in range(100):
+                read.append(i)
+                yield i
+
+        iterator = ReadAheadIterator(items(), self.executor, size=1)
+        self.assertEqual(next(iter(iterator)), 0)
+        iterator.close()
+        self.executor.shutdown()
+        self.assertLess(len(read), 5)
+
+
 class GpxToGeomTests(SimpleTestCase):
     @staticmethod
     def _get_gpx_from(filename):
@@ -3,8 +3,11 @@ import logging
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Intersection, LineLocatePoint
 from django.contrib.gis.gdal import SpatialReference
+from django.contrib.gis.geos import Polygon
 from django.contrib.gis.measure import Distance
+from django.contrib.postgres.expressions import ArraySubquery
 from django.db import connection
+from django.db.models import OuterRef
 from django.db.models.base import ModelBase
 from django.db.models.expressions import Func
 from django.utils.translation import pgettext
@@ -122,6 +125,45 @@ def intersecting(qs, obj, distance=None, ordering=True, field="geom", defer=None
     return qs
 
 
+def intersecting_pks(qs, objs, distance=None, field="geom"):
+    """
+    Batch version of ``intersecting()``: returns the primary keys of the instances
+    near each object, as a {object pk: [pks]} dict. Objects sharing the same model
+    and distance are resolved with a single spatial join.
+    """
+    if isinstance(qs, ModelBase):
+        qs = qs.objects
+        if hasattr(qs, "existing"):
+            qs = qs.existing()
+    results = {}
+    groups = {}
+    for obj in objs:
+        results[obj.pk] = []
+        if not obj.geom:
+            continue
+        obj_distance = obj.distance(qs.model) if distance is None else distance
+        groups.setdefault((obj.__class__, obj_distance), []).append(obj.pk)
+
+    for (model, obj_distance), pks in groups.items():
+        if obj_distance:
+            near = qs.filter(
+                **{f"{field}__dwithin": (OuterRef("geom"), Distance(m=obj_distance))}
+            )
+        else:
+            near = qs.filter(**{f"{field}__intersects": OuterRef("geom")})
+        if model == qs.model:
+            # Prevent self intersection
+            near = near.exclude(pk=OuterRef("pk"))
+        near = near.order_by("pk").values("pk")
+        rows = (
+            model._base_manager.filter(pk__in=pks)
+            .annotate(near_pks=ArraySubquery(near))
+            .values_list("pk", "near_pks")
+        )
+        results.update(rows)
+    return results
+
+
 def format_coordinates(geom):
     if settings.DISPLAY_SRID in [4326, 3857]:  # WGS84 formatting
         location = geom.centroid.transform(4326, clone=True)
@@ -184,3 +226,25 @@ def simplify_coords(coords):
 
 def leaflet_bounds(bbox):
     return [[bbox[1], bbox[0]], [bbox[3], bbox[2]]]
+
+
+def tile_bounds(z, x, y, segments=1):
+    """
+    Returns the bounds of a XYZ (web mercator) tile, as a polygon in EPSG:3857.
+    Each side is split in `segments` segments, so that the polygon is not
+    distorted once transformed into another SRID.
+    """
+    origin = 20037508.342789244
+    size = 2 * origin / 2**z
+    xmin, ymax = -origin + x * size, origin - y * size
+    if segments == 1:
+        bounds = Polygon.from_bbox((xmin, ymax - size, xmin + size, ymax))
+    else:
+        step = size / segments
+        ring = [(xmin + i * step, ymax - size) for i in range(segments)]
+        ring += [(xmin + size, ymax - size + i * step) for i in range(segments)]
+        ring += [(xmin + size - i * step, ymax) for i in range(segments)]
+        ring += [(xmin, ymax - i * step) for i in range(segments)]
+        bounds = Polygon(ring + ring[:1])
+    bounds.srid = 3857
+    return bounds
@@ -1,5 +1,7 @@
 import codecs
 import os
+import queue
+import threading
 from datetime import datetime
 from tempfile import NamedTemporaryFile
 
@@ -15,6 +17,57 @@ class GeomValueError(Exception):
     pass
 
 
+class ReadAheadIterator:
+    """
+    Iterates over `iterable` while it is read in `executor`, up to `size` items ahead.
+    Exceptions raised while reading are raised again by the iterator.
+    `close()` must be called if the iterator is not consumed entirely.
+    """
+
+    _end = object()
+
+    def __init__(self, iterable, executor, size=1):
+        self.queue = queue.Queue(maxsize=size)
+        self.closed = threading.Event()
+        executor.submit(self.read, iterable)
+
+    def put(self, item, error=None):
+        while not self.closed.is_set():
+            try:
+                self.queue.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(self, iterable):
+        try:
+            for item in iterable:
+                if not self.put(item):
+                    return
+                if self.closed.is_set():
+                    return
+        except Exception as e:
+            self.put(None, e)
+        else:
+            self.put(self._end)
+
+    def __iter__(self):
+        try:
+            while True:
+                item, error = self.queue.get()
+                if error is not None:
+                    raise error
+                if item is self._end:
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        self.closed.set()
+
+
 def add_http_prefix(url):
     if url.startswith("http"):
         return url
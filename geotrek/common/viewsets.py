@@ -1,12 +1,14 @@
+from django.conf import settings
 from mapentity.views import MapEntityViewSet
 from rest_framework import permissions
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from geotrek.common.mixins.views import VectorTilesMixin
 from geotrek.common.renderers import GTAMRenderer
 
 
-class GeotrekMapentityViewSet(MapEntityViewSet):
+class GeotrekMapentityViewSet(VectorTilesMixin, MapEntityViewSet):
     """Custom MapentityViewSet for geotrek."""
 
     permission_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -18,6 +20,7 @@ class GeotrekMapentityViewSet(MapEntityViewSet):
     mapentity_list_class = []
     gtam_serializer_class = None
     renderer_classes = MapEntityViewSet.renderer_classes + [GTAMRenderer]
+    tile_cache_alias = settings.MAPENTITY_CONFIG["GEOJSON_LAYERS_CACHE_BACKEND"]
 
     def get_columns(self):
         return self.mapentity_list_class.columns
@@ -24,4 +24,4 @@ class Command(BaseCommand):
         if flush:
             PgRoutingNode.objects.all().delete()
             Path.objects.all().update(source_pgr=None, target_pgr=None)
-        PathRouter()  # PathRouter's init method builds the network topology
+        PathRouter().set_path_network_topology()
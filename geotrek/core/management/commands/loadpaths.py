@@ -1,12 +1,17 @@
+import csv
+from io import StringIO
+
 from django.conf import settings
 from django.contrib.gis.gdal import DataSource, GDALException
 from django.contrib.gis.geos.collections import LineString, Polygon
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.utils import IntegrityError, InternalError
 
 from geotrek.authent.models import Structure
 from geotrek.core.models import Path
+from geotrek.core.path_router import PathRouter
+from geotrek.core.tasks import update_pending_topologies
 
 
 class Command(BaseCommand):
@@ -75,6 +80,15 @@ class Command(BaseCommand):
             help="Do not change the database, dry run. Show the number of fail"
             " and objects potentially created",
         )
+        parser.add_argument(
+            "--bulk",
+            "-b",
+            action="store_true",
+            dest="bulk",
+            default=False,
+            help="Copy all paths at once in a staging table, then compute elevation"
+            " and pgRouting's network topology once at the end",
+        )
 
     def handle(self, *args, **options):
         verbosity = options.get("verbosity")
@@ -87,6 +101,7 @@ class Command(BaseCommand):
         comments_columns = options.get("comment")
         fail = options.get("fail")
         dry = options.get("dry")
+        bulk = options.get("bulk")
 
         if dry:
             fail = True
@@ -122,6 +137,7 @@ class Command(BaseCommand):
         self.bbox.srid = settings.SRID
 
         sid = transaction.savepoint()
+        staged = []
 
         for layer in ds:
             for feat in layer:
@@ -139,6 +155,9 @@ class Command(BaseCommand):
                 self.check_srid(srid, geom)
                 geom.dim = 2
                 if self.should_import(feat, geom):
+                    if bulk:
+                        staged.append((name, "</br>".join(comment_final_tab), geom))
+                        continue
                     try:
                         with transaction.atomic():
                             comment_final = "</br>".join(comment_final_tab)
@@ -163,8 +182,15 @@ class Command(BaseCommand):
                             )
                         else:
                             raise
+        if bulk:
+            counter, counter_fail = self.create_paths_in_bulk(
+                staged, structure, fail, dry, verbosity
+            )
         if not dry:
             transaction.savepoint_commit(sid)
+            if bulk and settings.TOPOLOGY_GEOMETRY_DEFERRED_UPDATE:
+                # Paths split by the imported ones were updated without Path.save()
+                transaction.on_commit(update_pending_topologies.delay)
             if verbosity >= 2:
                 self.stdout.write(
                     self.style.NOTICE(
@@ -179,6 +205,115 @@ class Command(BaseCommand):
                 )
             )
 
+    def create_paths_in_bulk(self, staged, structure, fail, dry, verbosity):
+        """
+        Copy all paths in a staging table, then insert them one by one so that
+        snapping and splitting triggers give the same network as without
+        --bulk. Elevation and pgRouting's network topology triggers are
+        disabled while inserting, and computed once for every new or split
+        path at the end.
+        """
+        counter = 0
+        counter_fail = 0
+        template = Path(structure=structure)
+        fields = [
+            field
+            for field in Path._meta.concrete_fields
+            if not field.primary_key
+            and not field.generated
+            and field.attname
+            not in ("name", "comments", "geom", "uuid", "date_insert", "date_update")
+        ]
+        columns = [field.column for field in fields] + ["name", "comments", "geom"]
+        values = [
+            field.get_db_prep_save(getattr(template, field.attname), connection)
+            for field in fields
+        ]
+        insert = (
+            f"INSERT INTO core_path ({', '.join(connection.ops.quote_name(c) for c in columns)}) "
+            f"SELECT {', '.join(['%s'] * len(values))}, name, comments, geom "
+            "FROM loadpaths_staging WHERE id = %s RETURNING id"
+        )
+
+        srid = Path._meta.get_field("geom").srid
+        data = StringIO()
+        writer = csv.writer(data)
+        for name, comment, geom in staged:
+            if geom.srid != srid:
+                geom = geom.transform(srid, clone=True)
+            writer.writerow([name, comment, geom.hexewkb.decode()])
+        data.seek(0)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT statement_timestamp()")
+            started = cursor.fetchone()[0]
+            cursor.execute(f"""CREATE TEMPORARY TABLE loadpaths_staging (
+                                   id serial PRIMARY KEY,
+                                   name text,
+                                   comments text,
+                                   geom geometry(LineString, {srid}))""")
+            cursor.copy_expert(
+                "COPY loadpaths_staging (name, comments, geom) FROM STDIN WITH (FORMAT csv)",
+                data,
+            )
+            cursor.execute(
+                "ALTER TABLE core_path DISABLE TRIGGER core_path_10_elevation_iu_tgr"
+            )
+            cursor.execute(
+                "ALTER TABLE core_path DISABLE TRIGGER core_path_pgrouting_topology_iud_tgr"
+            )
+
+            for staged_id, (name, comment, geom) in enumerate(staged, start=1):
+                try:
+                    with transaction.atomic():
+                        cursor.execute(insert, values + [staged_id])
+                        pk = cursor.fetchone()[0]
+                    counter += 1
+                    if verbosity > 0:
+                        self.stdout.write(f"Create path with pk : {pk}")
+                    if verbosity > 1:
+                        self.stdout.write(f"The comment {comment} was added on {name}")
+                except (IntegrityError, InternalError):
+                    if fail:
+                        counter_fail += 1
+                        self.stdout.write(f"Integrity Error on path : {name}, {geom}")
+                    else:
+                        raise
+
+            cursor.execute(
+                "ALTER TABLE core_path ENABLE TRIGGER core_path_10_elevation_iu_tgr"
+            )
+            cursor.execute(
+                "ALTER TABLE core_path ENABLE TRIGGER core_path_pgrouting_topology_iud_tgr"
+            )
+            cursor.execute("DROP TABLE loadpaths_staging")
+
+            # Drape all new or split paths at once (see elevation_path_iu)
+            cursor.execute(
+                """UPDATE core_path p
+                   SET geom_3d = (e.infos).draped,
+                       length = ROUND(CAST(ST_LENGTHSPHEROID(ST_TRANSFORM((e.infos).draped, 4326), 'SPHEROID["GRS_1980",6378137,298.257222101]') as numeric), 2),
+                       slope = (e.infos).slope,
+                       min_elevation = (e.infos).min_elevation,
+                       max_elevation = (e.infos).max_elevation,
+                       ascent = (e.infos).positive_gain,
+                       descent = (e.infos).negative_gain,
+                       source = NULL,
+                       target = NULL
+                   FROM (SELECT id, ft_elevation_infos(geom, %s) AS infos
+                         FROM core_path
+                         WHERE date_update >= %s) e
+                   WHERE p.id = e.id""",
+                [settings.ALTIMETRIC_PROFILE_STEP, started],
+            )
+            # Build nodes of all new or split paths at once, and delete the
+            # nodes which no path references anymore (e.g. of split paths)
+            PathRouter().set_path_network_topology()
+
+            if dry:
+                transaction.set_rollback(True)
+        return counter, counter_fail
+
     def check_srid(self, srid, geom):
         if not geom.srid:
             geom.srid = srid
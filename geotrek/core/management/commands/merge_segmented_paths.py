@@ -1,146 +1,248 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from time import sleep
+from math import floor, hypot
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import connection, transaction
+from django.db import DatabaseError, connection, connections, transaction
 
 from geotrek.core.models import Path
+from geotrek.core.tasks import update_pending_topologies
 
 
 class Command(BaseCommand):
     help = "Find and merge Paths that are splitted in several segments\n"
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="Only report planned merges, do not merge paths",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of parallel workers used to merge chains of paths",
+        )
         parser.add_argument(
             "--sleeptime",
             "-d",
-            action="store",
             dest="sleeptime",
-            default=0.25,
-            help="Time to wait between merges (SQL triggers take time)",
+            default=None,
+            help="Deprecated and ignored: paths are no longer merged with a pause between merges",
         )
 
-    def extract_neighbourgs_graph(self, number_of_neighbourgs, extremities=[]):
-        # Get all neighbours for each path
-        neighbours = dict()
+    def extract_endpoints(self):
+        """Return start and end points (and draft status) of every path"""
         with connection.cursor() as cursor:
-            cursor.execute("""select id1, array_agg(id2) from
-                        (select p1.id as id1, p2.id as id2
-                        from core_path p1, core_path p2
-                        where st_touches(p1.geom, p2.geom) and (p1.id != p2.id)
-                        group by p1.id, p2.id
-                        order by p1.id) a
-                        group by id1;""")
-
-            for path_id, path_neighbours_ids in cursor.fetchall():
-                if (
-                    path_id not in extremities
-                    and len(path_neighbours_ids) == number_of_neighbourgs
-                ):
-                    neighbours[path_id] = path_neighbours_ids
-        return neighbours
-
-    def try_merge(self, a, b):
-        if {a, b} in self.discarded:
-            self.stdout.write(f"├ Already discarded {a} and {b}")
-            return False
-        success = 2
-        try:
-            patha = Path.include_invisible.get(pk=a)
-            pathb = Path.include_invisible.get(pk=b)
-            with transaction.atomic():
-                success = patha.merge_path(pathb)
-        except Exception:
-            self.stdout.write(f"├ Cannot merge {a} and {b}")
-            self.discarded.append({a, b})
-            return False
-        if success == 2 or success == 0:
-            self.stdout.write(f"├ Cannot merge {a} and {b}")
-            self.discarded.append({a, b})
-            return False
-        else:
-            self.stdout.write(f"├ Merged {b} into {a}")
-            sleep(self.sleeptime)
-            return True
-
-    def merge_paths_with_one_neighbour(self):
-        self.stdout.write("┌ STEP 1")
-        neighbours_graph = self.extract_neighbourgs_graph(1)
-        successes = 0
-        fails = 0
-        while len(neighbours_graph) > fails:
-            fails = 0
-            for path, neighbours in neighbours_graph.items():
-                success = self.try_merge(path, neighbours[0])
-                if success:
-                    successes += 1
-                else:
-                    fails += 1
-            neighbours_graph = self.extract_neighbourgs_graph(1)
-        return successes
-
-    def merge_paths_with_two_neighbours(self):
-        self.stdout.write("┌ STEP 2")
-        successes = 0
-        neighbours_graph = self.extract_neighbourgs_graph(2)
-        mergeables = list(neighbours_graph.keys())
-        fails = 0
-        while len(mergeables) > fails:
-            fails = 0
-            for a, neighbours in neighbours_graph.items():
-                b = neighbours[0]
-                success = self.try_merge(a, b)
-                if success:
-                    successes += 1
-                else:
-                    fails += 1
-            neighbours_graph = self.extract_neighbourgs_graph(2)
-            mergeables = neighbours_graph.keys()
-        return successes
+            cursor.execute("""select id, draft,
+                        st_x(st_startpoint(geom)), st_y(st_startpoint(geom)),
+                        st_x(st_endpoint(geom)), st_y(st_endpoint(geom))
+                        from core_path
+                        where geom is not null
+                        order by id;""")
+            return {
+                path_id: (draft, (x1, y1), (x2, y2))
+                for path_id, draft, x1, y1, x2, y2 in cursor.fetchall()
+            }
+
+    def extract_nodes(self, endpoints):
+        """
+        Group path extremities into nodes (extremities closer than
+        PATH_MERGE_SNAPPING_DISTANCE share the same node) and find nodes where
+        exactly two paths can be merged (see ``ft_merge_path``).
+        Return extremities nodes of each path and the set of mergeable nodes.
+        """
+        merge_distance = settings.PATH_MERGE_SNAPPING_DISTANCE
+        snap_distance = settings.PATH_SNAPPING_DISTANCE
+        cell_size = max(merge_distance, snap_distance)
+
+        def cell(point):
+            if not cell_size:
+                return point
+            return floor(point[0] / cell_size), floor(point[1] / cell_size)
+
+        def neighbour_cells(point):
+            if not cell_size:
+                return [point]
+            x, y = cell(point)
+            return [(x + i, y + j) for i in (-1, 0, 1) for j in (-1, 0, 1)]
+
+        nodes = []
+        nodes_grid = defaultdict(list)
+        extremities_grid = defaultdict(list)
+        incidences = defaultdict(list)
+        path_nodes = {}
+
+        def locate(point):
+            for cell_key in neighbour_cells(point):
+                for node in nodes_grid[cell_key]:
+                    if hypot(*(a - b for a, b in zip(nodes[node], point))) <= (
+                        merge_distance
+                    ):
+                        return node
+            nodes.append(point)
+            nodes_grid[cell(point)].append(len(nodes) - 1)
+            return len(nodes) - 1
+
+        for path_id, (draft, start, end) in endpoints.items():
+            start_node, end_node = locate(start), locate(end)
+            path_nodes[path_id] = (start_node, end_node)
+            incidences[start_node].append(path_id)
+            incidences[end_node].append(path_id)
+            for point in (start, end):
+                extremities_grid[cell(point)].append((point, path_id, draft))
+
+        mergeables = set()
+        for node, path_ids in incidences.items():
+            if len(path_ids) != 2 or path_ids[0] == path_ids[1]:
+                continue
+            snapped = any(
+                not draft
+                and path_id not in path_ids
+                and hypot(*(a - b for a, b in zip(nodes[node], point))) <= snap_distance
+                for cell_key in neighbour_cells(nodes[node])
+                for point, path_id, draft in extremities_grid[cell_key]
+            )
+            if not snapped:
+                mergeables.add(node)
+        return path_nodes, incidences, mergeables
+
+    def plan_chains(self, endpoints):
+        """
+        Decompose the network into chains of paths joined by mergeable nodes.
+        Each chain is a list of (path id, reversed) ordered and oriented end to
+        end, so that the path to keep (the oldest one) is not reversed.
+        """
+        path_nodes, incidences, mergeables = self.extract_nodes(endpoints)
+        visited = set()
+
+        def walk(path_id, node):
+            # Follow mergeable nodes away from path_id
+            segments = []
+            while node in mergeables:
+                other = next(pk for pk in incidences[node] if pk != path_id)
+                if other in visited:
+                    break
+                visited.add(other)
+                start_node, end_node = path_nodes[other]
+                is_reversed = end_node == node and start_node != node
+                segments.append((other, is_reversed))
+                path_id, node = other, start_node if is_reversed else end_node
+            return segments
+
+        chains = []
+        for path_id in path_nodes:
+            if path_id in visited:
+                continue
+            visited.add(path_id)
+            start_node, end_node = path_nodes[path_id]
+            forward = walk(path_id, end_node)
+            backward = walk(path_id, start_node)
+            chain = [(pk, not is_reversed) for pk, is_reversed in reversed(backward)]
+            chain += [(path_id, False)] + forward
+            if len(chain) < 2:
+                continue
+            if dict(chain)[min(dict(chain))]:
+                chain = [(pk, not is_reversed) for pk, is_reversed in reversed(chain)]
+            chains.append(chain)
+        return sorted(chains, key=lambda chain: min(dict(chain)))
+
+    def merge_chain(self, chain):
+        kept = min(dict(chain))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT ft_merge_path_chain(%s, %s, %s);",
+                [
+                    kept,
+                    [pk for pk, is_reversed in chain],
+                    [is_reversed for pk, is_reversed in chain],
+                ],
+            )
+            return cursor.fetchone()[0]
 
-    def merge_paths_with_three_neighbours(self):
-        self.stdout.write("┌ STEP 3")
+    def merge_chain_in_thread(self, chain):
+        try:
+            return self.merge_chain(chain)
+        finally:
+            # Each thread uses its own database connection
+            connections.close_all()
+
+    def describe(self, chain):
+        kept = min(dict(chain))
+        others = ", ".join(str(pk) for pk, is_reversed in chain if pk != kept)
+        return f"{others} into {kept}"
+
+    def report(self, chain, merged):
+        if merged:
+            self.stdout.write(f"├ Merged {self.describe(chain)}")
+            return merged
+        self.stdout.write(f"├ Cannot merge {self.describe(chain)}")
+        return 0
+
+    def merge_chains(self, chains, workers):
+        """
+        Merge chains (in parallel if several workers are used). Chains are
+        disjoint, but those which fail (e.g. deadlocks between workers) are
+        tried again one by one at the end.
+        """
         successes = 0
-        neighbours_graph = self.extract_neighbourgs_graph(3)
-        mergeables = list(neighbours_graph.keys())
-        extremities = []
-        while len(mergeables) > len(extremities):
-            for a, neighbours in neighbours_graph.items():
-                failed_neighbours = 0
-                for n in neighbours:
-                    success = self.try_merge(a, n)
-                    if success:
-                        successes += 1
+        failed_chains = []
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    (chain, executor.submit(self.merge_chain_in_thread, chain))
+                    for chain in chains
+                ]
+                for chain, future in futures:
+                    if future.exception() is not None:
+                        failed_chains.append(chain)
                     else:
-                        failed_neighbours += 1
-                    if failed_neighbours == 3:
-                        extremities.append(a)
-            neighbours_graph = self.extract_neighbourgs_graph(
-                3, extremities=extremities
-            )
-            mergeables = list(neighbours_graph.keys())
+                        successes += self.report(chain, future.result())
+        else:
+            failed_chains = chains
+
+        for chain in failed_chains:
+            try:
+                merged = self.merge_chain(chain)
+            except DatabaseError:
+                merged = 0
+            successes += self.report(chain, merged)
         return successes
 
     def handle(self, *args, **options):
-        self.sleeptime = options.get("sleeptime")
-        total_successes = 0
-        self.discarded = []
+        if options["sleeptime"] is not None:
+            self.stderr.write(
+                self.style.WARNING("--sleeptime option is deprecated and ignored")
+            )
         paths_before = Path.include_invisible.count()
 
         self.stdout.write("\n")
         self.stdout.write(str(datetime.now()))
 
-        first_step_successes = self.merge_paths_with_one_neighbour()
-        self.stdout.write(f"└ {first_step_successes} merges")
-        total_successes += first_step_successes
-
-        second_step_successes = self.merge_paths_with_two_neighbours()
-        self.stdout.write(f"└ {second_step_successes} merges")
-        total_successes += second_step_successes
-
-        third_step_successes = self.merge_paths_with_three_neighbours()
-        self.stdout.write(f"└ {third_step_successes} merges")
-        total_successes += third_step_successes
+        self.stdout.write("┌ PLAN")
+        chains = self.plan_chains(self.extract_endpoints())
+        planned = sum(len(chain) - 1 for chain in chains)
+        self.stdout.write(f"└ {len(chains)} chains, {planned} merges")
+
+        if options["dry_run"]:
+            self.stdout.write("┌ DRY RUN")
+            for chain in chains:
+                self.stdout.write(f"├ Would merge {self.describe(chain)}")
+            self.stdout.write(
+                f"\n--- PLANNED {planned} MERGES - FROM {paths_before} TO {paths_before - planned} PATHS ---\n"
+            )
+            return
+
+        self.stdout.write("┌ MERGE")
+        total_successes = self.merge_chains(chains, options["workers"])
+        self.stdout.write(f"└ {total_successes} merges")
+        if total_successes and settings.TOPOLOGY_GEOMETRY_DEFERRED_UPDATE:
+            # Merged paths were updated without Path.save()
+            update_pending_topologies.delay()
 
         paths_after = Path.include_invisible.count()
         self.stdout.write(
@@ -1,45 +1,78 @@
+from django.contrib.contenttypes.fields import GenericRelation
 from django.core.management.base import BaseCommand
 from django.db import connection, transaction
 
-from geotrek.core.models import Path
+from geotrek.common.signals import objects_changed
+from geotrek.core.models import Path, Topology
 
 
 class Command(BaseCommand):
     help = """Remove all duplicate path (same geom)."""
     """Do not remove path with topology."""
 
+    def extract_duplicates(self, cursor):
+        """
+        Group paths by geometry (same points in the same order) with a hash
+        aggregate, and return a dict {duplicate path id: kept path id}.
+        Visible paths are kept first, then the oldest ones.
+        """
+        cursor.execute("""SELECT array_agg(id ORDER BY visible DESC, id)
+                          FROM core_path
+                          GROUP BY ST_AsEWKB(geom)
+                          HAVING COUNT(*) > 1""")
+        return {
+            duplicate: ids[0] for (ids,) in cursor.fetchall() for duplicate in ids[1:]
+        }
+
+    def delete_duplicates(self, cursor, duplicates):
+        """Move topologies on kept paths, then delete duplicates at once"""
+        cursor.execute(
+            """UPDATE core_pathaggregation et
+               SET path_id = d.kept
+               FROM unnest(%s::integer[], %s::integer[]) AS d(duplicate, kept)
+               WHERE et.path_id = d.duplicate""",
+            [list(duplicates.keys()), list(duplicates.values())],
+        )
+        ids = list(duplicates.keys())
+        # Objects related by generic relations (attachments) are not deleted by the database
+        paths = Path.include_invisible.filter(pk__in=ids)
+        for field in Path._meta.private_fields:
+            if isinstance(field, GenericRelation):
+                field.bulk_related_objects(paths).delete()
+        cursor.execute("DELETE FROM core_path_networks WHERE path_id = ANY(%s)", [ids])
+        cursor.execute("DELETE FROM core_path_usages WHERE path_id = ANY(%s)", [ids])
+        # Touch latest path once, instead of once per deleted path
+        cursor.execute(
+            "ALTER TABLE core_path DISABLE TRIGGER core_path_latest_updated_d_tgr"
+        )
+        cursor.execute("DELETE FROM core_path WHERE id = ANY(%s)", [ids])
+        cursor.execute(
+            "ALTER TABLE core_path ENABLE TRIGGER core_path_latest_updated_d_tgr"
+        )
+        cursor.execute("""UPDATE core_path SET date_update = NOW()
+                          WHERE id IN (SELECT id FROM core_path ORDER BY date_update DESC LIMIT 1)""")
+        # Paths are deleted without post_delete signals
+        objects_changed.send(sender=Path)
+        objects_changed.send(sender=Topology)
+
     def handle(self, *args, **options):
         verbosity = options["verbosity"]
-        cursor = connection.cursor()
-        query = """with relations as (SELECT t1.id as t1_id,
-                                             t2.id as t2_id
-                                      FROM core_path t1
-                                      JOIN core_path t2 ON t1.id < t2.id AND ST_OrderingEquals(t1.geom, t2.geom)
-                                      ORDER BY t1.id, t2.id)
-                      SELECT * FROM relations WHERE t1_id NOT IN (SELECT t2_id FROM relations) """
-        cursor.execute(query)
-        list_topologies = cursor.fetchall()
-
         path_deleted = []
 
-        with transaction.atomic():
-            try:
-                for path1_pk, path2_pk in list_topologies:
-                    path1 = Path.include_invisible.get(pk=path1_pk)
-                    path2 = Path.include_invisible.get(pk=path2_pk)
-                    if not path1.visible and path2.visible:
-                        path1.aggregations.update(path_id=path2_pk)
-                        path1.delete()
-                        path_deleted.append(path1)
-                    else:
-                        path2.aggregations.update(path_id=path1_pk)
-                        path2.delete()
-                        path_deleted.append(path2)
-                    if verbosity > 1:
-                        self.stdout.write(f"Deleting path {path_deleted[-1]}")
-
-            except Exception as exc:
-                self.stdout.write(self.style.ERROR(f"{exc}"))
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                duplicates = self.extract_duplicates(cursor)
+                if verbosity > 1:
+                    for path in Path.include_invisible.filter(
+                        pk__in=duplicates.keys()
+                    ).only("name"):
+                        self.stdout.write(f"Deleting path {path}")
+                if duplicates:
+                    self.delete_duplicates(cursor, duplicates)
+                path_deleted = list(duplicates)
+
+        except Exception as exc:
+            self.stdout.write(self.style.ERROR(f"{exc}"))
 
         if verbosity > 0:
             self.stdout.write(
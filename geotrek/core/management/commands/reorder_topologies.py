@@ -1,107 +1,157 @@
-from django.conf import settings
-from django.contrib.gis.geos import GEOSGeometry
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from math import hypot
+
 from django.core.management.base import BaseCommand
-from django.db import connection
+from django.db import connection, connections, transaction
 
-from geotrek.core.models import PathAggregation, Topology
+from geotrek.core.models import Topology
 
 
-def reorder_aggregations_of_topology(topology):
+def get_aggregations(topology_ids):
     """
-    Reorder path aggregations for a topology.
-    Returns a tuple (reordered, succeeded):
-    - reordered: True if the topology was reordered, False if it didn't need reordering or reordering was not possible.
-    - succeeded: True if the reordering process completed successfully (even if no change was needed), False if it failed.
+    Returns path aggregations of several topologies, with the extremities of
+    their sublines, in one query: {topology id: [aggregation, ...]}.
+    Each aggregation is a dict with keys id, order, kind ("line", "point" or
+    None if the subline cannot be computed), empty, start, end (coordinates)
+    and start_wkt, end_wkt (lines) or wkt (points).
     """
-    cursor = connection.cursor()
-
-    def get_geom_lines(topo):
-        """Returns all sublines for a topology."""
+    aggregations = {pk: [] for pk in topology_ids}
+    with connection.cursor() as cursor:
         cursor.execute(
             """
-            SELECT et.id, ST_ASTEXT(ST_SmartLineSubstring(t.geom, et.start_position, et.end_position))
-            FROM core_topology e, core_pathaggregation et, core_path t
-            WHERE e.id = %s AND et.topo_object_id = e.id AND et.path_id = t.id
-            AND GeometryType(ST_SmartLineSubstring(t.geom, et.start_position, et.end_position)) != 'POINT'
-            ORDER BY et."order", et.id
+            SELECT et.topo_object_id, et.id, et."order", GeometryType(s.geom), ST_IsEmpty(s.geom),
+                   ST_X(ST_StartPoint(s.geom)), ST_Y(ST_StartPoint(s.geom)),
+                   ST_X(ST_EndPoint(s.geom)), ST_Y(ST_EndPoint(s.geom)),
+                   ST_AsText(ST_StartPoint(s.geom)), ST_AsText(ST_EndPoint(s.geom)), ST_AsText(s.geom)
+            FROM core_pathaggregation et
+            JOIN core_path t ON et.path_id = t.id
+            CROSS JOIN LATERAL ST_SmartLineSubstring(t.geom, et.start_position, et.end_position) AS s(geom)
+            WHERE et.topo_object_id = ANY(%s)
+            ORDER BY et.topo_object_id, et."order", et.id
             """,
-            [topo.pk],
+            [list(topology_ids)],
         )
-        geom_lines_order = cursor.fetchall()
-        return geom_lines_order
+        for row in cursor.fetchall():
+            topology_id, pk, order, geom_type, empty = row[:5]
+            x1, y1, x2, y2, start_wkt, end_wkt, wkt = row[5:]
+            if geom_type is None:
+                kind = None
+            elif geom_type == "POINT":
+                kind = "point"
+            else:
+                kind = "line"
+            aggregations[topology_id].append(
+                {
+                    "id": pk,
+                    "order": order,
+                    "kind": kind,
+                    "empty": empty,
+                    "start": None if x1 is None else (x1, y1),
+                    "end": None if x2 is None else (x2, y2),
+                    "start_wkt": start_wkt,
+                    "end_wkt": end_wkt,
+                    "wkt": wkt,
+                }
+            )
+    return aggregations
 
-    def get_new_order(sublines):
-        """Returns the new order for the sublines of a topology."""
-        # We use ft_Smart_MakeLine to get the order of the lines
-        cursor.execute(
-            f"""SELECT * FROM ft_Smart_MakeLine(ARRAY{[geom[1] for geom in sublines]}::geometry[])"""
-        )
 
-        # We remove first value (algorithme use a 0 by default to go through the lines and will always be here)
-        # Then we need to remove first value and remove 1 to all of them because Path aggregation's orders begin at 0
-        fetched = cursor.fetchall()
-        return fetched[0][1]
+def get_new_order(lines):
+    """
+    Returns the order in which sublines are merged (see ft_Smart_MakeLine),
+    as 1-based indexes preceded by 0, or [] if they cannot be connected.
+    """
+
+    def is_close(a, b):
+        return a is not None and b is not None and hypot(a[0] - b[0], a[1] - b[1]) < 1
+
+    nb_lines = len(lines)
+    current = [0]
+    result = None  # (start, end) of merged line, None while it is empty
+    found = True
+    while found and len(current) < nb_lines + 1:
+        found = False
+        i = 1
+        while i < nb_lines + 1:
+            line = lines[i - 1]
+            if result is None:
+                result = line
+                found = True
+                current.append(i)
+            elif i not in current:
+                if line and is_close(line[0], result[1]):
+                    result = (result[0], line[1])
+                    found = True
+                    current.append(i)
+                    i = 0  # restart iteration
+                elif line and is_close(line[1], result[0]):
+                    result = (line[0], result[1])
+                    found = True
+                    current.append(i)
+                    i = 0  # restart iteration
+
+                if not found and line:
+                    start, end = line[1], line[0]  # reversed line
+                    if is_close(start, result[1]):
+                        result = (result[0], end)
+                        found = True
+                        current.append(i)
+                    elif is_close(end, result[0]):
+                        result = (start, result[1])
+                        found = True
+                        current.append(i)
+            i += 1
+    if not found:
+        current = []
+    return current
 
-    geom_lines = get_geom_lines(topology)
-    new_order = get_new_order(geom_lines)
 
-    if (
-        new_order == []
-        or len(geom_lines) >= 2
-        and geom_lines[1][1] == "LINESTRING EMPTY"
-    ):
-        return False, False  # Not reordered, failed
+def get_new_orders(aggregations):
+    """
+    Computes new orders of path aggregations of a topology.
+    Returns a tuple (new_orders, succeeded):
+    - new_orders: dict {aggregation id: new order}, None if the topology does not need reordering or cannot be reordered.
+    - succeeded: False if the topology cannot be reordered.
+    """
+    geom_lines = [aggr for aggr in aggregations if aggr["kind"] == "line"]
+    lines = [
+        None if aggr["empty"] else (aggr["start"], aggr["end"]) for aggr in geom_lines
+    ]
+    new_order = get_new_order(lines)
+
+    if new_order == [] or len(geom_lines) >= 2 and geom_lines[1]["empty"]:
+        return None, False  # Not reordered, failed
 
     if len(new_order) <= 2:
-        return False, True  # Not reordered, didn't fail
-    order_maked_lines = new_order[1:]
-    orders = [result - 1 for result in order_maked_lines]
+        return None, True  # Not reordered, didn't fail
+
+    # We remove first value (algorithm uses a 0 by default to go through the lines and will always be here)
+    # Then we remove 1 to all of them because Path aggregation's orders begin at 0
+    orders = [result - 1 for result in new_order[1:]]
     new_orders = {}
     for x, geom_line in enumerate(geom_lines):
-        new_orders[geom_line[0]] = orders[x]
-
-    # We generate a dict with id path aggregation as key and new order (without points)
-
-    # We get all the Points that we didn't get for smart make line
-    cursor.execute(
-        """
-        SELECT et.id, ST_ASTEXT(ST_SmartLineSubstring(t.geom, et.start_position, et.end_position))
-        FROM core_topology e, core_pathaggregation et, core_path t
-        WHERE e.id = %s AND et.topo_object_id = e.id AND et.path_id = t.id
-        AND GeometryType(ST_SmartLineSubstring(t.geom, et.start_position, et.end_position)) = 'POINT'
-        ORDER BY et."order", et.id
-        """,
-        [topology.pk],
-    )
-    points = cursor.fetchall()
-    id_order = 0
-
-    dict_points = {}
-    for id_pa_point, geom_point_wkt in points:
-        dict_points[id_pa_point] = GEOSGeometry(geom_point_wkt, srid=settings.SRID)
+        new_orders[geom_line["id"]] = orders[x]
+
+    # Points we didn't get for smart make line
+    dict_points = {
+        aggr["id"]: aggr["wkt"] for aggr in aggregations if aggr["kind"] == "point"
+    }
 
     points_touching = {}
     # Find points aggregations that touches lines
-    while id_order < len(orders) - 1:
-        geometries_points = dict_points.values()
-        order_actual = orders[id_order]
-        order_next = orders[id_order + 1]
-        actual_point_end = GEOSGeometry(
-            geom_lines[order_actual][1], srid=settings.SRID
-        ).boundary[1]  # Get end point of the geometry
-        next_point_start = GEOSGeometry(
-            geom_lines[order_next][1], srid=settings.SRID
-        ).boundary[0]  # Get start point of the geometry
+    for id_order in range(len(orders) - 1):
+        actual_point_end = geom_lines[orders[id_order]]["end_wkt"]
+        next_point_start = geom_lines[orders[id_order + 1]]["start_wkt"]
         if (
             actual_point_end == next_point_start
-            and actual_point_end in geometries_points
+            and actual_point_end in dict_points.values()
         ):
-            for id_pa_point, point_geom in dict_points.items():
-                if point_geom == actual_point_end:
+            for id_pa_point, point_wkt in dict_points.items():
+                if point_wkt == actual_point_end:
                     points_touching[id_pa_point] = id_order + 1
                     dict_points.pop(id_pa_point)
                     break
-        id_order += 1
 
     points_added = 0
     # We add all points between the lines and remove points generated which should not be here (it happens)
@@ -114,19 +164,73 @@ def reorder_aggregations_of_topology(topology):
         }
         new_orders[id_pa_point] = order_point_touching + points_added
         points_added += 1
-    PathAggregation.objects.filter(topo_object=topology).exclude(
-        id__in=new_orders.keys()
-    ).delete()
+    return new_orders, True
+
 
-    updated_aggregations = []
-    topo_aggregations = PathAggregation.objects.filter(topo_object=topology)
-    for aggregation in topo_aggregations:
-        if aggregation.order != new_orders[aggregation.id]:
-            aggregation.order = new_orders[aggregation.id]
-            updated_aggregations.append(aggregation)
-    PathAggregation.objects.bulk_update(updated_aggregations, ["order"])
+def reorder_topologies(topology_ids):
+    """
+    Reorder path aggregations of several topologies, with one query to read
+    them and one to write them (so that the geometry of each topology is
+    computed again only once, when the statement triggers fire).
+    Returns a tuple (reordered, failed) of lists of topology ids.
+    """
+    reordered = []
+    failed = []
+    deleted_aggregations = []
+    updated_aggregations = {}
+    for topology_id, aggregations in get_aggregations(topology_ids).items():
+        new_orders, succeeded = get_new_orders(aggregations)
+        if not succeeded:
+            failed.append(topology_id)
+        if new_orders is None:
+            continue
+        updated = False
+        for aggr in aggregations:
+            if aggr["id"] not in new_orders:
+                deleted_aggregations.append(aggr["id"])
+            elif aggr["order"] != new_orders[aggr["id"]]:
+                updated_aggregations[aggr["id"]] = new_orders[aggr["id"]]
+                updated = True
+        if updated:
+            reordered.append(topology_id)
 
-    return updated_aggregations != [], True  # Reordered or not, didn't fail
+    if deleted_aggregations or updated_aggregations:
+        # Deleted and updated aggregations are distinct rows
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """WITH deleted AS (
+                       DELETE FROM core_pathaggregation WHERE id = ANY(%s::integer[])
+                   )
+                   UPDATE core_pathaggregation et
+                   SET "order" = o.new_order
+                   FROM unnest(%s::integer[], %s::integer[]) AS o(id, new_order)
+                   WHERE et.id = o.id""",
+                [
+                    deleted_aggregations,
+                    list(updated_aggregations.keys()),
+                    list(updated_aggregations.values()),
+                ],
+            )
+    return reordered, failed
+
+
+def reorder_aggregations_of_topology(topology):
+    """
+    Reorder path aggregations for a topology.
+    Returns a tuple (reordered, succeeded):
+    - reordered: True if the topology was reordered, False if it didn't need reordering or reordering was not possible.
+    - succeeded: True if the reordering process completed successfully (even if no change was needed), False if it failed.
+    """
+    reordered, failed = reorder_topologies([topology.pk])
+    return reordered != [], failed == []
+
+
+def _reorder_topologies_in_worker(topology_ids):
+    """Reorder a chunk of topologies in a worker process"""
+    try:
+        return reorder_topologies(topology_ids)
+    finally:
+        connections.close_all()
 
 
 class Command(BaseCommand):
@@ -140,6 +244,18 @@ class Command(BaseCommand):
             type=int,
             help="IDs of topologies to reorder. If not provided, all non-deleted topologies are processed.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes used to reorder topologies in parallel.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of topologies reordered at once.",
+        )
 
     def handle(self, *args, **options):
         topology_ids = options.get("ids")
@@ -147,15 +263,37 @@ class Command(BaseCommand):
             qs = Topology.objects.filter(pk__in=topology_ids)
         else:
             qs = Topology.objects.filter(deleted=False)
+        kinds = dict(qs.order_by("pk").values_list("pk", "kind"))
+        pks = list(kinds)
+
+        chunk_size = options["chunk_size"]
+        chunks = [pks[i : i + chunk_size] for i in range(0, len(pks), chunk_size)]
 
         failed_topologies = []
         num_updated_topologies = 0
-        for topology in qs:
-            (reordered, succeeded) = reorder_aggregations_of_topology(topology)
-            if reordered:
-                num_updated_topologies += 1
-            elif not succeeded:
-                failed_topologies.append(str(f"{topology.kind} id: {topology.pk}"))
+        done = 0
+
+        def report(reordered, failed, chunk):
+            nonlocal num_updated_topologies, done
+            num_updated_topologies += len(reordered)
+            failed_topologies.extend(f"{kinds[pk]} id: {pk}" for pk in failed)
+            done += len(chunk)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{done}/{len(pks)} topologies processed")
+
+        if options["workers"] > 1:
+            # Forked processes must not share the database connection
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=multiprocessing.get_context("fork"),
+            ) as executor:
+                results = executor.map(_reorder_topologies_in_worker, chunks)
+                for chunk, (reordered, failed) in zip(chunks, results):
+                    report(reordered, failed, chunk)
+        else:
+            for chunk in chunks:
+                report(*reorder_topologies(chunk), chunk)
 
         if options["verbosity"]:
             msg = f"{num_updated_topologies} topolog{'y has' if num_updated_topologies == 1 else 'ies have'} been updated"
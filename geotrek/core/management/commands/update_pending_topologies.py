@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from geotrek.core.tasks import update_pending_topologies
+
+
+class Command(BaseCommand):
+    help = "Compute again geometries of topologies flagged when their paths changed (see TOPOLOGY_GEOMETRY_DEFERRED_UPDATE)\n"
+
+    def handle(self, *args, **options):
+        nb_updated = update_pending_topologies()
+        if options["verbosity"]:
+            self.stdout.write(
+                f"{nb_updated} topolog{'y has' if nb_updated == 1 else 'ies have'} been updated"
+            )
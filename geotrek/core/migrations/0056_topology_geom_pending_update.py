@@ -0,0 +1,30 @@
+# Generated by Django 5.2.15 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0055_pre_generate_pgrouting_graph_topology"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topology",
+            name="geom_pending_update",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Geometry will be computed again from its paths",
+                verbose_name="Geometry update pending",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topology",
+            index=models.Index(
+                condition=models.Q(("geom_pending_update", True)),
+                fields=["geom_pending_update"],
+                name="topology_geom_pending_idx",
+            ),
+        ),
+    ]
@@ -10,7 +10,7 @@ from django.contrib.gis.db.models.functions import Distance, Transform
 from django.contrib.gis.geos import GEOSGeometry, LineString, Point, fromstr
 from django.contrib.postgres.indexes import GistIndex
 from django.core.mail import mail_managers
-from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
 from django.db.models import ProtectedError, Value
 from django.db.models.functions import Round
 from django.db.models.query import QuerySet
@@ -343,6 +343,12 @@ class Path(
         super().save(*args, **kwargs)
         self.reload()
 
+        if settings.TOPOLOGY_GEOMETRY_DEFERRED_UPDATE:
+            from geotrek.core.tasks import update_pending_topologies
+
+            # Geometries of related topologies were only flagged by triggers
+            transaction.on_commit(update_pending_topologies.delay)
+
     def delete(self, *args, **kwargs):
         if not settings.TREKKING_TOPOLOGY_ENABLED:
             return super().delete(*args, **kwargs)
@@ -497,6 +503,12 @@ class Topology(
     offset = models.FloatField(default=0.0, verbose_name=_("Offset"))  # in SRID units
     kind = models.CharField(editable=False, verbose_name=_("Kind"), max_length=32)
     geom_need_update = models.BooleanField(default=False, editable=False)
+    geom_pending_update = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name=_("Geometry update pending"),
+        help_text=_("Geometry will be computed again from its paths"),
+    )
     geom = models.GeometryField(
         editable=(not settings.TREKKING_TOPOLOGY_ENABLED),
         srid=settings.SRID,
@@ -530,6 +542,11 @@ class Topology(
         indexes = [
             GistIndex(name="topology_geom_gist_idx", fields=["geom"]),
             GistIndex(name="topology_geom_3d_gist_idx", fields=["geom_3d"]),
+            models.Index(
+                name="topology_geom_pending_idx",
+                fields=["geom_pending_update"],
+                condition=models.Q(geom_pending_update=True),
+            ),
         ]
 
     def __init__(self, *args, **kwargs):
@@ -708,6 +725,7 @@ class Topology(
         if self.pk and settings.TREKKING_TOPOLOGY_ENABLED:
             existing = self.__class__.objects.get(pk=self.pk)
             self.length = existing.length
+            self.geom_pending_update = existing.geom_pending_update
             # In the case of points, the geom can be set by Django. Don't override.
             point_geom_not_set = self.ispoint() and self.geom is None
             geom_already_in_db = not self.ispoint() and existing.geom is not None
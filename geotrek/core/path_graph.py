@@ -0,0 +1,205 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+from django.db import connection
+
+_lock = threading.Lock()
+_cached_graph = None
+
+
+class PathGraph:
+    """
+    In-memory copy of the paths graph (pgRouting network topology).
+
+    Edges are the paths having a source and a target node, stored in
+    CSR (compressed sparse row) arrays so that each node's outgoing arcs
+    are contiguous. Costs are the same as the ones given to pgRouting by
+    ``PathRouter.compute_two_steps_route``.
+    """
+
+    def __init__(self, token, rows):
+        self.token = token
+        if rows:
+            edge_ids, sources, targets, lengths, spheroid_lengths, x1, y1, x2, y2 = (
+                np.array(column) for column in zip(*rows)
+            )
+        else:
+            edge_ids = sources = targets = np.array([], dtype=np.int64)
+            lengths = spheroid_lengths = x1 = y1 = x2 = y2 = np.array([], dtype=float)
+
+        # Map pgRouting node ids (sparse) to contiguous indexes
+        node_ids, node_indexes = np.unique(
+            np.concatenate([sources, targets]), return_inverse=True
+        )
+        nb_edges = len(edge_ids)
+        edge_sources = node_indexes[:nb_edges]
+        edge_targets = node_indexes[nb_edges:]
+
+        node_x = np.zeros(len(node_ids))
+        node_y = np.zeros(len(node_ids))
+        node_x[edge_sources] = x1
+        node_y[edge_sources] = y1
+        node_x[edge_targets] = x2
+        node_y[edge_targets] = y2
+        self.node_x = node_x.tolist()
+        self.node_y = node_y.tolist()
+
+        # Each path can be walked both ways (cost = reverse_cost)
+        arc_from = np.concatenate([edge_sources, edge_targets])
+        arc_to = np.concatenate([edge_targets, edge_sources])
+        arc_edge = np.concatenate([np.arange(nb_edges), np.arange(nb_edges)])
+        order = np.argsort(arc_from, kind="stable")
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arc_from, minlength=len(node_ids)), out=indptr[1:])
+
+        # Plain lists are faster than numpy scalars in the search loop
+        self.indptr = indptr.tolist()
+        self.arc_to = arc_to[order].tolist()
+        self.arc_edge = arc_edge[order].tolist()
+        self.edge_ids = edge_ids.tolist()
+        self.edge_lengths = lengths.tolist()
+        self.edge_sources = edge_sources.tolist()
+        self.edge_targets = edge_targets.tolist()
+        self.edge_index = {
+            edge_id: index for index, edge_id in enumerate(self.edge_ids)
+        }
+        self.edge_spheroid_lengths = spheroid_lengths.tolist()
+
+    @classmethod
+    def get_token(cls):
+        """
+        Returns a value that changes whenever the paths network changes.
+        Every update of core_path (including pgRouting source/target values)
+        refreshes `date_update`, and deleting a path bumps the latest one.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), MAX(date_update) FROM core_path")
+            return cursor.fetchone()
+
+    @classmethod
+    def load(cls, token):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT
+                    id,
+                    source,
+                    target,
+                    COALESCE(length, ST_Length(geom)),
+                    ST_LengthSpheroid(ST_Transform(geom, 4326), 'SPHEROID["GRS_1980",6378137,298.257222101]'),
+                    ST_X(ST_StartPoint(geom)),
+                    ST_Y(ST_StartPoint(geom)),
+                    ST_X(ST_EndPoint(geom)),
+                    ST_Y(ST_EndPoint(geom))
+                FROM core_path
+                WHERE source IS NOT NULL AND target IS NOT NULL
+                ORDER BY id
+            """)
+            return cls(token, cursor.fetchall())
+
+    def _step_arcs(self, step, fraction):
+        """
+        Returns the arcs linking a step (a point on a path) to the extremities
+        of its path, as (node index, cost, fraction of the extremity) tuples.
+        """
+        index = self.edge_index.get(step.get("edge_id"))
+        if index is None:
+            return []
+        length = self.edge_spheroid_lengths[index]
+        return [
+            (self.edge_sources[index], length * fraction, 0.0),
+            (self.edge_targets[index], length * (1 - fraction), 1.0),
+        ]
+
+    def shortest_path(self, from_step, to_step, fraction_start, fraction_end):
+        """
+        Computes the shortest route between two steps located on different paths
+        with an A* search (euclidean heuristic), as pgRouting's pgr_aStar does.
+
+        Returns a list of (path id, fraction start, fraction end) tuples,
+        or an empty list if the steps are not connected.
+        """
+        start_arcs = self._step_arcs(from_step, fraction_start)
+        end_arcs = {
+            node: (cost, node_fraction)
+            for node, cost, node_fraction in self._step_arcs(to_step, fraction_end)
+        }
+        if not start_arcs or not end_arcs:
+            return []
+
+        node_x, node_y = self.node_x, self.node_y
+        goals = [(node_x[node], node_y[node]) for node in end_arcs]
+
+        def heuristic(node):
+            x, y = node_x[node], node_y[node]
+            return min(math.hypot(x - gx, y - gy) for gx, gy in goals)
+
+        # Predecessor of a node: (previous node, edge index), or the fraction
+        # of the start step's extremity when reached from the start step.
+        costs = {}
+        predecessors = {}
+        queue = []
+        for node, cost, node_fraction in start_arcs:
+            if cost < costs.get(node, math.inf):
+                costs[node] = cost
+                predecessors[node] = (None, node_fraction)
+                heapq.heappush(queue, (cost + heuristic(node), cost, node))
+
+        indptr, arc_to, arc_edge = self.indptr, self.arc_to, self.arc_edge
+        lengths = self.edge_lengths
+        best_cost, best_node = math.inf, None
+        visited = set()
+        while queue:
+            estimate, cost, node = heapq.heappop(queue)
+            if estimate >= best_cost:
+                break
+            if node in visited:
+                continue
+            visited.add(node)
+            if node in end_arcs:
+                end_cost = cost + end_arcs[node][0]
+                if end_cost < best_cost:
+                    best_cost, best_node = end_cost, node
+            for arc in range(indptr[node], indptr[node + 1]):
+                next_node = arc_to[arc]
+                next_cost = cost + lengths[arc_edge[arc]]
+                if next_cost < costs.get(next_node, math.inf):
+                    costs[next_node] = next_cost
+                    predecessors[next_node] = (node, arc_edge[arc])
+                    heapq.heappush(
+                        queue, (next_cost + heuristic(next_node), next_cost, next_node)
+                    )
+
+        if best_node is None:
+            return []
+
+        route = [(to_step.get("edge_id"), end_arcs[best_node][1], float(fraction_end))]
+        node = best_node
+        while True:
+            previous_node, edge = predecessors[node]
+            if previous_node is None:
+                # `edge` holds the fraction of the start path's extremity here
+                route.append((from_step.get("edge_id"), float(fraction_start), edge))
+                break
+            node_fraction = 0.0 if self.edge_sources[edge] == previous_node else 1.0
+            route.append((self.edge_ids[edge], node_fraction, 1.0 - node_fraction))
+            node = previous_node
+        route.reverse()
+        return route
+
+
+def get_path_graph():
+    """
+    Returns the in-memory paths graph, loading it again (once per process)
+    if the paths network changed since it was last loaded.
+    """
+    global _cached_graph
+    token = PathGraph.get_token()
+    graph = _cached_graph
+    if graph is not None and graph.token == token:
+        return graph
+    with _lock:
+        if _cached_graph is None or _cached_graph.token != token:
+            _cached_graph = PathGraph.load(token)
+        return _cached_graph
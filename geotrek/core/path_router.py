@@ -10,14 +10,15 @@ from django.contrib.gis.geos import (
 from django.db import connection
 
 from .models import Path
+from .path_graph import get_path_graph
 
 
 class PathRouter:
-    def __init__(self):
-        self.set_path_network_topology()
-
     def set_path_network_topology(self):
-        """Builds or updates the paths graph (pgRouting network topology)"""
+        """
+        Builds the missing parts of the paths graph (pgRouting network topology).
+        The graph is otherwise kept up to date by a trigger when paths are modified.
+        """
         cursor = connection.cursor()
         query = "SELECT create_pgrouting_topology(%s::integer, %s::float)"
         cursor.execute(query, [settings.SRID, settings.PGROUTING_TOLERANCE])
@@ -49,6 +50,8 @@ class PathRouter:
         Returns the whole route's geometries and topology. Both of them is an array
         with each element being a sub-route from one step to another.
         """
+        if settings.PATH_ROUTER_IN_MEMORY_GRAPH:
+            return self.compute_all_steps_routes_in_memory()
         all_steps_geometries = []  # Each elem is a linestring from one step to another
         all_steps_topologies = []  # Each elem is the topology from one step to another
         # Compute the shortest path for each pair of adjacent steps
@@ -64,6 +67,90 @@ class PathRouter:
             all_steps_geometries.append(one_step_geometry)
         return all_steps_geometries, all_steps_topologies
 
+    def compute_all_steps_routes_in_memory(self):
+        """
+        Same as `compute_all_steps_routes`, but the shortest paths are computed
+        with the in-memory paths graph, then the geometries of all sub-routes
+        are fetched with a single query.
+        """
+        graph = get_path_graph()
+        all_steps_routes = []  # Each elem is a list of (path id, fraction start, fraction end)
+        for i in range(len(self.steps_topo) - 1):
+            from_step = self.steps_topo[i]
+            to_step = self.steps_topo[i + 1]
+            if from_step.get("edge_id") == to_step.get("edge_id"):
+                all_steps_routes.append(None)
+                continue
+            route = graph.shortest_path(
+                from_step,
+                to_step,
+                self._fix_fraction(from_step.get("fraction")),
+                self._fix_fraction(to_step.get("fraction")),
+            )
+            if route == []:
+                return [], []
+            all_steps_routes.append(route)
+
+        routes_geometries = self.get_routes_geometries(
+            [route for route in all_steps_routes if route is not None]
+        )
+        all_steps_geometries = []
+        all_steps_topologies = []
+        for i, route in enumerate(all_steps_routes):
+            if route is None:
+                # Both steps are on the same path
+                one_step_geometry, topology = self.get_two_steps_route(
+                    self.steps_topo[i], self.steps_topo[i + 1]
+                )
+            else:
+                line_strings = [
+                    MultiLineString(*[GEOSGeometry(geometry)]).merged
+                    for geometry in routes_geometries[: len(route)]
+                ]
+                routes_geometries = routes_geometries[len(route) :]
+                one_step_geometry = self.merge_line_strings(line_strings)
+                topology = {
+                    "positions": {
+                        str(j): [fraction_start, fraction_end]
+                        for j, (_, fraction_start, fraction_end) in enumerate(route)
+                    },
+                    "paths": [path_id for path_id, _, _ in route],
+                }
+            all_steps_topologies.append(topology)
+            all_steps_geometries.append(one_step_geometry)
+        return all_steps_geometries, all_steps_topologies
+
+    def get_routes_geometries(self, routes):
+        """
+        Returns the geometries of the paths portions of the given routes, in order,
+        built the same way as in `compute_two_steps_route`.
+        """
+        rows = [row for route in routes for row in route]
+        if not rows:
+            return []
+        path_ids, fraction_starts, fraction_ends = (
+            list(column) for column in zip(*rows)
+        )
+        query = """
+            SELECT
+                CASE
+                    WHEN route.fraction_start = 0 AND route.fraction_end = 1
+                        THEN core_path.geom
+                    WHEN route.fraction_start = 1 AND route.fraction_end = 0
+                        THEN ST_Reverse(core_path.geom)
+                    WHEN route.fraction_start < route.fraction_end
+                        THEN ST_SmartLineSubstring(core_path.geom, route.fraction_start, route.fraction_end)
+                    ELSE ST_Reverse(ST_SmartLineSubstring(core_path.geom, route.fraction_end, route.fraction_start))
+                    END AS edge_geom
+            FROM unnest(%s::integer[], %s::float[], %s::float[])
+                WITH ORDINALITY AS route(path_id, fraction_start, fraction_end, index)
+            JOIN core_path ON core_path.id = route.path_id
+            ORDER BY route.index
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(query, [path_ids, fraction_starts, fraction_ends])
+            return [geometry for (geometry,) in cursor.fetchall()]
+
     def get_two_steps_route(self, from_step, to_step):
         """
         Returns the geometry (as a LineString) and the topology of a subroute.
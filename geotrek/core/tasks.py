@@ -0,0 +1,29 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import connection, transaction
+
+from geotrek.common.signals import objects_changed
+from geotrek.core.models import Path, Topology
+
+
+@shared_task(name="geotrek.core.update-pending-topologies")
+def update_pending_topologies():
+    """
+    celery shared task - compute again geometries of topologies flagged
+    when their paths changed (see TOPOLOGY_GEOMETRY_DEFERRED_UPDATE)
+    """
+    nb_updated = 0
+    while True:
+        # One transaction per batch, so that locks are released as soon as possible
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT update_geometry_of_pending_topologies(%s)",
+                [settings.TOPOLOGY_GEOMETRY_DEFERRED_UPDATE_BATCH_SIZE],
+            )
+            nb_batch = cursor.fetchone()[0]
+        if not nb_batch:
+            return nb_updated
+        nb_updated += nb_batch
+        # Responses cached since the paths changed still have the previous geometries
+        objects_changed.send(sender=Path)
+        objects_changed.send(sender=Topology)
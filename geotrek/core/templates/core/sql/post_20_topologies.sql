@@ -144,7 +144,31 @@ BEGIN
                                  descent = elevation.negative_gain
                              WHERE id = topology_id;
     END IF;
-    UPDATE core_topology SET geom_need_update = FALSE WHERE id = topology_id;
+    UPDATE core_topology SET geom_need_update = FALSE, geom_pending_update = FALSE WHERE id = topology_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-------------------------------------------------------------------------------
+-- Update geometry of topologies flagged when their paths changed
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.update_geometry_of_pending_topologies(max_count integer) RETURNS integer AS $$
+DECLARE
+    eid integer;
+    nb_updated integer := 0;
+BEGIN
+    -- Skip topologies locked by another worker, so that batches can run concurrently
+    FOR eid IN SELECT id FROM core_topology
+               WHERE geom_pending_update = TRUE
+               ORDER BY id
+               LIMIT max_count
+               FOR UPDATE SKIP LOCKED
+    LOOP
+        PERFORM update_geometry_of_topology(eid);
+        nb_updated := nb_updated + 1;
+    END LOOP;
+    RETURN nb_updated;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -45,14 +45,27 @@ DECLARE
 BEGIN
     -- Geometry of linear topologies are always updated
     -- Geometry of point topologies are updated if offset = 0
-    FOR eid IN SELECT e.id
-               FROM core_pathaggregation et, core_topology e
-               WHERE et.path_id = NEW.id AND et.topo_object_id = e.id
-               GROUP BY e.id, e."offset"
-               HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0
-    LOOP
-        PERFORM update_geometry_of_topology(eid);
-    END LOOP;
+    IF {{ TOPOLOGY_GEOMETRY_DEFERRED_UPDATE }} THEN
+        -- Only flag topologies, their geometry is computed again later by
+        -- update_geometry_of_pending_topologies()
+        UPDATE core_topology SET geom_pending_update = TRUE
+        WHERE NOT geom_pending_update AND id IN (
+            SELECT e.id
+            FROM core_pathaggregation et, core_topology e
+            WHERE et.path_id = NEW.id AND et.topo_object_id = e.id
+            GROUP BY e.id, e."offset"
+            HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0
+        );
+    ELSE
+        FOR eid IN SELECT e.id
+                   FROM core_pathaggregation et, core_topology e
+                   WHERE et.path_id = NEW.id AND et.topo_object_id = e.id
+                   GROUP BY e.id, e."offset"
+                   HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0
+        LOOP
+            PERFORM update_geometry_of_topology(eid);
+        END LOOP;
+    END IF;
 
     -- Special case of point geometries with offset != 0
     FOR eid, egeom IN SELECT e.id, e.geom
@@ -145,37 +158,54 @@ FOR EACH ROW EXECUTE PROCEDURE path_latest_updated_d();
 
 
 ----------------------------------------------------------------------------
--- Set pgRouting-related values to null after a path has been modified
+-- Update pgRouting network topology when a path is modified
 ----------------------------------------------------------------------------
 
--- After a path's geometry is modified, its source and target nodes are set to NULL
--- so that they are updated next time the pgRouting topology is computed.
-CREATE FUNCTION {{ schema_geotrek }}.set_pgrouting_values_to_null() RETURNS trigger SECURITY DEFINER AS $$
+-- Only the source and target nodes of the inserted/updated/deleted path are
+-- recomputed, so that the whole network topology never has to be rebuilt.
+-- Draft or invisible paths are not part of the network topology: their source
+-- and target nodes are set to NULL.
+-- Nodes which are not linked to any path anymore are removed.
+CREATE FUNCTION {{ schema_geotrek }}.update_pgrouting_topology_of_path() RETURNS trigger SECURITY DEFINER AS $$
 DECLARE
+    path record;
+    source_id bigint;
+    target_id bigint;
+    previous_nodes bigint[] := ARRAY[]::bigint[];
 BEGIN
-    UPDATE core_path SET source = NULL, target = NULL WHERE id = NEW.id;
-    RETURN NULL;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER core_path_pgrouting_values_null_geom_tgr
-AFTER UPDATE OF geom ON core_path
-FOR EACH ROW EXECUTE PROCEDURE set_pgrouting_values_to_null();
-
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        previous_nodes := ARRAY[OLD.source, OLD.target];
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- Read the path again: its geometry may have been modified by other triggers (split)
+        SELECT id, geom, draft, visible, source, target INTO path
+        FROM core_path WHERE id = NEW.id;
+
+        IF FOUND THEN
+            previous_nodes := previous_nodes || ARRAY[path.source, path.target];
+            IF path.draft = false AND path.visible = true THEN
+                source_id := point_to_id(ST_StartPoint(path.geom), {{ PGROUTING_TOLERANCE }}, {{ SRID }});
+                target_id := point_to_id(ST_EndPoint(path.geom), {{ PGROUTING_TOLERANCE }}, {{ SRID }});
+            END IF;
+            IF path.source IS DISTINCT FROM source_id OR path.target IS DISTINCT FROM target_id THEN
+                UPDATE core_path SET source = source_id, target = target_id WHERE id = path.id;
+            END IF;
+        END IF;
+    END IF;
+
+    DELETE FROM core_pgroutingnode n
+    WHERE n.id = ANY(previous_nodes)
+        AND NOT EXISTS (
+            SELECT 1
+            FROM core_path p
+            WHERE p.source = n.id OR p.target = n.id
+        );
 
--- After a path is set to draft or invisible, its source and target nodes must be set to NULL.
--- This is because of the cleaning of the orphaned nodes after recomputing the pgRouting topology.
--- For instance, a node linked to an invisible path (and no other) would be deleted from the node table.
--- Once the path is visible again, for the node to be recreated, the path should have its source or target to NULL.
-CREATE FUNCTION {{ schema_geotrek }}.set_pgrouting_values_to_null_if_draft_or_invisible() RETURNS trigger SECURITY DEFINER AS $$
-DECLARE
-BEGIN
-    UPDATE core_path SET source = NULL, target = NULL
-    WHERE id = NEW.id AND (draft = true OR visible = false);
     RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER core_path_pgrouting_values_null_draft_visible_tgr
-AFTER UPDATE OF draft, visible ON core_path
-FOR EACH ROW EXECUTE PROCEDURE set_pgrouting_values_to_null_if_draft_or_invisible();
+CREATE TRIGGER core_path_pgrouting_topology_iud_tgr
+AFTER INSERT OR UPDATE OF geom, draft, visible OR DELETE ON core_path
+FOR EACH ROW EXECUTE PROCEDURE update_pgrouting_topology_of_path();
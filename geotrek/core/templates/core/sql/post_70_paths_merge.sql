@@ -183,3 +183,76 @@ BEGIN
 
 END;
 $$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_merge_path_chain(kept integer, paths integer[], reversed boolean[])
+  RETURNS integer AS $$
+-- Merge a chain of paths (ordered and oriented end to end) into path `kept`.
+-- Topologies of the whole chain are moved and relocated at once.
+
+DECLARE
+    merged integer[];
+    rebuild_line geometry;
+
+BEGIN
+    merged := array_remove(paths, kept);
+
+    IF array_length(merged, 1) IS NULL OR array_length(merged, 1) != array_length(paths, 1) - 1
+    THEN
+        RETURN 0;
+    END IF;
+
+    SELECT ST_MakeLine(array_agg(CASE WHEN c.is_reversed THEN ST_Reverse(p.geom) ELSE p.geom END ORDER BY c.position))
+        INTO rebuild_line
+        FROM unnest(paths, reversed) WITH ORDINALITY AS c(path_id, is_reversed, position)
+        JOIN core_path p ON p.id = c.path_id;
+
+    -- reverse offset of topologies on reversed paths
+    UPDATE core_topology
+           SET "offset" = -"offset"
+           WHERE id IN (SELECT et.topo_object_id
+                        FROM core_pathaggregation et
+                        JOIN unnest(paths, reversed) AS c(path_id, is_reversed) ON et.path_id = c.path_id
+                        WHERE c.is_reversed);
+
+    -- relocate events of every path of the chain on kept path
+    WITH chain AS (
+        SELECT c.path_id, c.is_reversed, c.position, ST_Length(p.geom) AS length
+        FROM unnest(paths, reversed) WITH ORDINALITY AS c(path_id, is_reversed, position)
+        JOIN core_path p ON p.id = c.path_id
+    ), located AS (
+        SELECT path_id, is_reversed, length,
+               SUM(length) OVER (ORDER BY position) - length AS before,
+               SUM(length) OVER () AS total
+        FROM chain
+    )
+    UPDATE core_pathaggregation et
+           SET path_id = kept,
+               start_position = (l.before + l.length * CASE WHEN l.is_reversed THEN 1 - et.start_position ELSE et.start_position END) / l.total,
+               end_position = (l.before + l.length * CASE WHEN l.is_reversed THEN 1 - et.end_position ELSE et.end_position END) / l.total
+           FROM located l
+           WHERE et.path_id = l.path_id;
+
+    -- fix new geom to kept
+    UPDATE core_path
+           SET geom = rebuild_line
+           WHERE id = kept;
+
+    -- link elements to kept path, unless already present
+    INSERT INTO core_path_networks (path_id, network_id)
+           SELECT DISTINCT kept, network_id FROM core_path_networks WHERE path_id = ANY(merged)
+           ON CONFLICT DO NOTHING;
+    DELETE FROM core_path_networks WHERE path_id = ANY(merged);
+
+    INSERT INTO core_path_usages (path_id, usage_id)
+           SELECT DISTINCT kept, usage_id FROM core_path_usages WHERE path_id = ANY(merged)
+           ON CONFLICT DO NOTHING;
+    DELETE FROM core_path_usages WHERE path_id = ANY(merged);
+
+    -- Delete merged Paths
+    DELETE FROM core_path WHERE id = ANY(merged);
+
+    RETURN array_length(merged, 1);
+
+END;
+$$ LANGUAGE plpgsql;
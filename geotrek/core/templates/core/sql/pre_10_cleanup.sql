@@ -21,6 +21,7 @@ DROP FUNCTION IF EXISTS topology_latest_updated_d() CASCADE;
 
 DROP FUNCTION IF EXISTS update_geometry_of_evenement(integer) CASCADE;
 DROP FUNCTION IF EXISTS update_geometry_of_topology(integer) CASCADE;
+DROP FUNCTION IF EXISTS update_geometry_of_pending_topologies(integer) CASCADE;
 
 DROP FUNCTION IF EXISTS update_evenement_geom_when_offset_changes() CASCADE;
 DROP FUNCTION IF EXISTS update_topology_geom_when_offset_changes() CASCADE;
@@ -56,6 +57,7 @@ DROP FUNCTION IF EXISTS troncon_latest_updated_d() CASCADE;
 DROP FUNCTION IF EXISTS path_latest_updated_d() CASCADE;
 DROP FUNCTION IF EXISTS set_pgrouting_values_to_null() CASCADE;
 DROP FUNCTION IF EXISTS set_pgrouting_values_to_null_if_draft_or_invisible() CASCADE;
+DROP FUNCTION IF EXISTS update_pgrouting_topology_of_path() CASCADE;
 
 -- 50
 
@@ -73,6 +75,7 @@ DROP VIEW IF EXISTS v_trails CASCADE;
 -- 70
 
 DROP FUNCTION IF EXISTS ft_merge_path(integer,integer) CASCADE;
+DROP FUNCTION IF EXISTS ft_merge_path_chain(integer,integer[],boolean[]) CASCADE;
 
 -- 80
 
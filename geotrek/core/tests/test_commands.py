@@ -8,10 +8,16 @@ from django.core.management import call_command
 from django.core.management.base import CommandError
 from django.db import IntegrityError, connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
+from geotrek.api.v2.cache import get_cache_version
 from geotrek.authent.models import Structure
+from geotrek.common.models import Attachment
+from geotrek.common.tests.factories import AttachmentFactory
+from geotrek.core.management.commands.reorder_topologies import reorder_topologies
 from geotrek.core.models import Path, PathAggregation
 from geotrek.core.tests.factories import PathFactory, TopologyFactory
+from geotrek.trekking.models import POI
 from geotrek.trekking.tests.factories import POIFactory, TrekFactory
 
 
@@ -105,7 +111,9 @@ class RemoveDuplicatePathTest(TestCase):
 
     def test_remove_duplicate_path_fail(self):
         output = StringIO()
-        with mock.patch("geotrek.core.models.Path.delete") as mock_delete:
+        with mock.patch(
+            "geotrek.core.management.commands.remove_duplicate_paths.Command.delete_duplicates"
+        ) as mock_delete:
             mock_delete.side_effect = Exception("An ERROR")
             call_command("remove_duplicate_paths", verbosity=2, stdout=output)
         self.assertIn("An ERROR", output.getvalue())
@@ -113,6 +121,32 @@ class RemoveDuplicatePathTest(TestCase):
         self.assertEqual(Path.objects.count(), 9)
         self.assertIn("0 duplicate paths have been deleted", output.getvalue())
 
+    def test_remove_duplicate_path_attachments_and_cache(self):
+        kept_attachment = AttachmentFactory.create(content_object=self.p1)
+        AttachmentFactory.create(content_object=self.p2)
+        version = get_cache_version(Path)
+        call_command("remove_duplicate_paths", verbosity=0)
+        self.assertEqual(
+            list(Attachment.objects.filter(object_id__in=(self.p1.pk, self.p2.pk))),
+            [kept_attachment],
+        )
+        self.assertNotEqual(get_cache_version(Path), version)
+
+    def test_remove_duplicate_path_keep_topologies(self):
+        poi1, poi2 = POI.objects.filter(name__in=("POI1", "POI2")).order_by("name")
+        call_command("remove_duplicate_paths", verbosity=0)
+        self.assertEqual(
+            list(poi1.aggregations.values_list("path", flat=True)), [self.p1.pk]
+        )
+        self.assertEqual(
+            list(poi2.aggregations.values_list("path", flat=True)), [self.p1.pk]
+        )
+        self.assertFalse(
+            PathAggregation.objects.filter(
+                path__in=(self.p2.pk, self.p4.pk, self.p7.pk, self.p9.pk)
+            ).exists()
+        )
+
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
 class LoadPathsCommandTest(TestCase):
@@ -258,6 +292,68 @@ class LoadPathsCommandTest(TestCase):
         with self.assertRaises(IntegrityError):
             call_command("loadpaths", filename, "-i", verbosity=2, stdout=output)
 
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk(self):
+        output = StringIO()
+        call_command(
+            "loadpaths",
+            self.filename,
+            "-i",
+            bulk=True,
+            comment=["comment"],
+            verbosity=2,
+            stdout=output,
+        )
+        self.assertEqual(Path.objects.count(), 2)
+        for path in Path.objects.all():
+            self.assertIn(f"Create path with pk : {path.pk}", output.getvalue())
+            self.assertEqual(path.structure, self.structure)
+            self.assertIsNotNone(path.geom_3d)
+            self.assertIsNotNone(path.source_pgr)
+            self.assertIsNotNone(path.target_pgr)
+        value = Path.objects.first()
+        self.assertEqual(value.name, "lulu")
+        self.assertEqual(value.comments, "Comment 2")
+
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk_leaves_no_orphan_node(self):
+        # Split by the loaded paths
+        PathFactory.create(geom=LineString((-1, 1), (3, 1), srid=4326))
+        call_command(
+            "loadpaths", self.filename, "-i", bulk=True, verbosity=0, stdout=StringIO()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("""SELECT COUNT(*) FROM core_pgroutingnode n
+                              WHERE NOT EXISTS (
+                                  SELECT 1 FROM core_path p
+                                  WHERE p.source = n.id OR p.target = n.id)""")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk_dry(self):
+        output = StringIO()
+        call_command(
+            "loadpaths",
+            self.filename,
+            "-i",
+            bulk=True,
+            dry=True,
+            verbosity=2,
+            stdout=output,
+        )
+        self.assertIn("2 objects will be create, 0 objects failed;", output.getvalue())
+        self.assertEqual(Path.objects.count(), 0)
+
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk_fail_with_dry(self):
+        filename = os.path.join(os.path.dirname(__file__), "data", "bad_path.geojson")
+        output = StringIO()
+        call_command(
+            "loadpaths", filename, "-i", bulk=True, dry=True, verbosity=2, stdout=output
+        )
+        self.assertIn("0 objects will be create, 1 objects failed;", output.getvalue())
+        self.assertEqual(Path.objects.count(), 0)
+
     @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, -1, 1, 5))
     def test_load_paths_within_spatial_extent_no_srid_geom(self):
         filename = os.path.join(os.path.dirname(__file__), "data", "paths_no_srid.shp")
@@ -540,6 +636,53 @@ class ReorderTopologiesPathAggregationTest(TestCase):
                 [0, 1, 2],
             )
 
+    def test_split_by_chunks(self):
+        """Topologies are reordered by chunks, and progress is reported"""
+        topos = [
+            TopologyFactory.create(paths=[(self.path_1_a, 0, 1), (self.path_1_b, 0, 1)])
+            for i in range(3)
+        ]
+        PathFactory.create(
+            geom=LineString(
+                Point(700000, 6600090), Point(700090, 6600000), srid=settings.SRID
+            )
+        )
+
+        output = StringIO()
+        call_command("reorder_topologies", stdout=output, chunk_size=2, verbosity=2)
+
+        self.assertIn("2/3 topologies processed\n", output.getvalue())
+        self.assertIn("3/3 topologies processed\n", output.getvalue())
+        self.assertIn("3 topologies have been updated\n", output.getvalue())
+        for topo in topos:
+            self.assertEqual(
+                list(
+                    PathAggregation.objects.filter(topo_object=topo).values_list(
+                        "order", flat=True
+                    )
+                ),
+                [0, 1, 2],
+            )
+
+    def test_aggregations_written_in_one_query(self):
+        topo = TopologyFactory.create(
+            paths=[(self.path_1_a, 0, 1), (self.path_1_b, 0, 1)]
+        )
+        PathFactory.create(
+            geom=LineString(
+                Point(700000, 6600090), Point(700090, 6600000), srid=settings.SRID
+            )
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reorder_topologies([topo.pk]), ([topo.pk], []))
+        writes = [
+            query["sql"]
+            for query in queries.captured_queries
+            if "UPDATE core_pathaggregation" in query["sql"]
+            or "DELETE FROM core_pathaggregation" in query["sql"]
+        ]
+        self.assertEqual(len(writes), 1)
+
     def test_split_no_reorder_needed_one_path_aggregation(self):
         """
 
@@ -1402,41 +1545,83 @@ class MergePathsTest(TestCase):
         #                |
         #
         output_str = (
-            f"┌ STEP 1\n"
+            f"┌ PLAN\n"
+            f"└ 3 chains, 6 merges\n"
+            f"┌ MERGE\n"
             f"├ Merged {self.p2.pk} into {self.p1.pk}\n"
-            f"├ Merged {self.p9.pk} into {self.p14.pk}\n"
-            f"├ Cannot merge {self.p16.pk} and {self.p13.pk}\n"
-            f"├ Merged {self.p8.pk} into {self.p14.pk}\n"
-            f"├ Already discarded {self.p16.pk} and {self.p13.pk}\n"
-            f"└ 3 merges\n"
-            f"┌ STEP 2\n"
-            f"├ Cannot merge {self.p1.pk} and {self.p3.pk}\n"
-            f"├ Merged {self.p3.pk} into {self.p5.pk}\n"
-            f"├ Merged {self.p5.pk} into {self.p6.pk}\n"
-            f"├ Cannot merge {self.p14.pk} and {self.p7.pk}\n"
-            f"└ 2 merges\n"
-            f"┌ STEP 3\n"
-            f"├ Cannot merge {self.p6.pk} and {self.p1.pk}\n"
-            f"├ Cannot merge {self.p6.pk} and {self.p4.pk}\n"
-            f"├ Merged {self.p7.pk} into {self.p6.pk}\n"
-            f"├ Cannot merge {self.p7.pk} and {self.p6.pk}\n"
-            f"├ Cannot merge {self.p7.pk} and {self.p13.pk}\n"
-            f"├ Already discarded {self.p7.pk} and {self.p14.pk}\n"
-            f"├ Cannot merge {self.p10.pk} and {self.p4.pk}\n"
-            f"├ Cannot merge {self.p10.pk} and {self.p11.pk}\n"
-            f"├ Cannot merge {self.p10.pk} and {self.p15.pk}\n"
-            f"├ Cannot merge {self.p12.pk} and {self.p4.pk}\n"
-            f"├ Cannot merge {self.p12.pk} and {self.p11.pk}\n"
-            f"├ Cannot merge {self.p12.pk} and {self.p15.pk}\n"
-            f"├ Already discarded {self.p13.pk} and {self.p7.pk}\n"
-            f"├ Cannot merge {self.p13.pk} and {self.p14.pk}\n"
-            f"├ Already discarded {self.p13.pk} and {self.p16.pk}\n"
-            f"└ 1 merges\n"
+            f"├ Merged {self.p5.pk}, {self.p6.pk}, {self.p7.pk} into {self.p3.pk}\n"
+            f"├ Merged {self.p9.pk}, {self.p14.pk} into {self.p8.pk}\n"
+            f"└ 6 merges\n"
             f"\n"
             f"--- RAN 6 MERGES - FROM 16 TO 10 PATHS ---\n"
         )
         self.assertEqual(Path.objects.count(), 10)
         self.assertIn(output_str, output.getvalue())
+        self.p3.refresh_from_db()
+        self.assertEqual(
+            self.p3.geom,
+            LineString((2, 2), (3, 3), (4, 4), (5, 5), (6, 6), srid=settings.SRID),
+        )
+
+    def test_sleeptime_is_deprecated(self):
+        output = StringIO()
+        call_command(
+            "merge_segmented_paths",
+            "-d",
+            "1",
+            dry_run=True,
+            stdout=StringIO(),
+            stderr=output,
+        )
+        self.assertIn("--sleeptime option is deprecated and ignored", output.getvalue())
+
+    @override_settings(PATH_SNAPPING_DISTANCE=0, PATH_MERGE_SNAPPING_DISTANCE=0)
+    def test_dry_run(self):
+        output = StringIO()
+        call_command("merge_segmented_paths", dry_run=True, stdout=output)
+        self.assertEqual(Path.objects.count(), 16)
+        self.assertIn(
+            f"├ Would merge {self.p5.pk}, {self.p6.pk}, {self.p7.pk} into {self.p3.pk}\n",
+            output.getvalue(),
+        )
+        self.assertIn(
+            "--- PLANNED 6 MERGES - FROM 16 TO 10 PATHS ---", output.getvalue()
+        )
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
+class MergeChainOfPathsTest(TestCase):
+    @override_settings(PATH_SNAPPING_DISTANCE=0, PATH_MERGE_SNAPPING_DISTANCE=0)
+    def test_topologies_are_relocated_on_chain(self):
+        """
+        A-------B   C-------B   C-------D         A-----------------------D
+            |---------------------|        =>         |-----------|
+            E1                                        E1
+        """
+        path_AB = PathFactory.create(geom=LineString((0, 1), (10, 1)))
+        path_CB = PathFactory.create(geom=LineString((20, 1), (10, 1)))
+        path_CD = PathFactory.create(geom=LineString((20, 1), (30, 1)))
+        e1 = TopologyFactory.create(
+            paths=[(path_AB, 0.5, 1), (path_CB, 1, 0), (path_CD, 0, 0.5)]
+        )
+        call_command("merge_segmented_paths", stdout=StringIO())
+        self.assertEqual(Path.objects.count(), 1)
+        path_AB.refresh_from_db()
+        self.assertEqual(
+            path_AB.geom,
+            LineString((0, 1), (10, 1), (20, 1), (30, 1), srid=settings.SRID),
+        )
+        positions = [
+            (round(a.start_position, 6), round(a.end_position, 6))
+            for a in PathAggregation.objects.filter(topo_object=e1).order_by("order")
+        ]
+        self.assertEqual(
+            positions,
+            [(0.166667, 0.333333), (0.333333, 0.666667), (0.666667, 0.833333)],
+        )
+        self.assertEqual(
+            PathAggregation.objects.filter(topo_object=e1, path=path_AB).count(), 3
+        )
 
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
@@ -1,15 +1,21 @@
 import json
 import math
-from unittest import skipIf
+from io import StringIO
+from unittest import mock, skipIf
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Point
-from django.db import DEFAULT_DB_ALIAS, connections
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, override_settings
 
+from geotrek.api.v2.cache import get_cache_version
 from geotrek.common.tests.mixins import dictfetchall
 from geotrek.common.utils import dbnow
+from geotrek.common.utils.postgresql import load_sql_files
 from geotrek.core.models import Path, PathAggregation, Topology
+from geotrek.core.tasks import update_pending_topologies
 from geotrek.core.tests.factories import (
     PathAggregationFactory,
     PathFactory,
@@ -1040,3 +1046,93 @@ class TopologyOverlappingTest(TestCase):
 
         overlaps = Topology.overlapping(Trek.objects.all())
         self.assertEqual(list(overlaps), [])
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
+class TopologyPendingUpdateTest(TestCase):
+    def setUp(self):
+        self.path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.topology = TopologyFactory.create(paths=[self.path])
+        # Move path without computing again the geometry of its topologies
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "ALTER TABLE core_path DISABLE TRIGGER core_path_90_topologies_geom_u_tgr"
+            )
+            cursor.execute(
+                "UPDATE core_path SET geom = ST_Translate(geom, 0, 10) WHERE id = %s",
+                [self.path.pk],
+            )
+            cursor.execute(
+                "ALTER TABLE core_path ENABLE TRIGGER core_path_90_topologies_geom_u_tgr"
+            )
+        Topology.objects.filter(pk=self.topology.pk).update(geom_pending_update=True)
+
+    def test_pending_topologies_are_updated_by_task(self):
+        self.topology.reload()
+        self.assertEqual(self.topology.geom.coords, ((0, 0), (10, 0)))
+        self.assertEqual(update_pending_topologies(), 1)
+        self.topology.refresh_from_db()
+        self.assertFalse(self.topology.geom_pending_update)
+        self.assertEqual(self.topology.geom.coords, ((0, 10), (10, 10)))
+        self.assertEqual(update_pending_topologies(), 0)
+
+    @override_settings(TOPOLOGY_GEOMETRY_DEFERRED_UPDATE_BATCH_SIZE=1)
+    def test_pending_topologies_are_updated_by_batches(self):
+        other = TopologyFactory.create(paths=[self.path])
+        Topology.objects.filter(pk=other.pk).update(geom_pending_update=True)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT update_geometry_of_pending_topologies(1)")
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(Topology.objects.filter(geom_pending_update=True).count(), 1)
+        self.assertEqual(update_pending_topologies(), 1)
+        self.assertFalse(Topology.objects.filter(geom_pending_update=True).exists())
+
+    @override_settings(TOPOLOGY_GEOMETRY_DEFERRED_UPDATE=True)
+    def test_path_save_launches_task(self):
+        with mock.patch(
+            "geotrek.core.tasks.update_pending_topologies.delay"
+        ) as mocked_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.path.save()
+        mocked_delay.assert_called_once_with()
+
+    def test_command_updates_pending_topologies(self):
+        output = StringIO()
+        call_command("update_pending_topologies", stdout=output)
+        self.assertIn("1 topology has been updated", output.getvalue())
+        self.topology.refresh_from_db()
+        self.assertEqual(self.topology.geom.coords, ((0, 10), (10, 10)))
+
+    def test_pending_topologies_invalidate_api_cache(self):
+        version = get_cache_version(Path)
+        update_pending_topologies()
+        self.assertNotEqual(get_cache_version(Path), version)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
+class TopologyDeferredUpdateTriggerTest(TestCase):
+    def test_path_update_flags_topologies(self):
+        # The setting is applied by triggers: install them again (before any
+        # pending change on core tables in this transaction). SQL templates
+        # are rendered with the settings object itself, not with overrides.
+        core = apps.get_app_config("core")
+        with mock.patch.object(
+            settings._wrapped, "TOPOLOGY_GEOMETRY_DEFERRED_UPDATE", True
+        ):
+            load_sql_files(core, "pre")
+            load_sql_files(core, "post")
+
+        path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        topology = TopologyFactory.create(paths=[path])
+        self.assertFalse(Topology.objects.get(pk=topology.pk).geom_pending_update)
+
+        path.geom = LineString((0, 10), (10, 10), srid=settings.SRID)
+        path.save()
+        topology.refresh_from_db()
+        self.assertTrue(topology.geom_pending_update)
+        self.assertEqual(topology.geom.coords, ((0, 0), (10, 0)))
+
+        update_pending_topologies()
+        topology.refresh_from_db()
+        self.assertFalse(topology.geom_pending_update)
+        self.assertEqual(topology.geom.coords, ((0, 10), (10, 10)))
@@ -5,6 +5,9 @@ from django.contrib.gis.geos import GEOSGeometry, LineString
 from django.db import DEFAULT_DB_ALIAS, connections
 from django.test import TestCase
 
+from geotrek.core.models import Path
+from geotrek.core.tests.factories import PathFactory
+
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
 class SmartMakelineTest(TestCase):
@@ -65,3 +68,56 @@ class SmartMakelineTest(TestCase):
             ),
             merged.coords,
         )
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
+class PgRoutingTopologyTriggerTest(TestCase):
+    def get_nodes_count(self):
+        cursor = connections[DEFAULT_DB_ALIAS].cursor()
+        cursor.execute("SELECT COUNT(*) FROM core_pgroutingnode")
+        return cursor.fetchone()[0]
+
+    def test_nodes_are_set_when_paths_are_created(self):
+        path_1 = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        path_2 = PathFactory.create(geom=LineString((10, 0), (10, 10)))
+        path_1.refresh_from_db()
+        path_2.refresh_from_db()
+        self.assertIsNotNone(path_1.source_pgr)
+        self.assertEqual(path_1.target_pgr, path_2.source_pgr)
+        self.assertIsNotNone(path_2.target_pgr)
+        self.assertEqual(self.get_nodes_count(), 3)
+
+    def test_nodes_are_set_when_path_is_split(self):
+        PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        PathFactory.create(geom=LineString((5, -5), (5, 5)))
+        self.assertEqual(Path.objects.count(), 4)
+        for path in Path.objects.all():
+            self.assertIsNotNone(path.source_pgr)
+            self.assertIsNotNone(path.target_pgr)
+        # 4 extremities and the intersection
+        self.assertEqual(self.get_nodes_count(), 5)
+
+    def test_nodes_are_updated_when_path_geometry_changes(self):
+        path_1 = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        path_2 = PathFactory.create(geom=LineString((10, 0), (10, 10)))
+        path_2.geom = LineString((20, 0), (20, 10), srid=settings.SRID)
+        path_2.save()
+        path_1.refresh_from_db()
+        path_2.refresh_from_db()
+        self.assertNotEqual(path_1.target_pgr, path_2.source_pgr)
+        self.assertEqual(self.get_nodes_count(), 4)
+
+    def test_nodes_are_removed_when_path_is_draft_or_deleted(self):
+        PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        path_2 = PathFactory.create(geom=LineString((10, 0), (10, 10)))
+        path_2.draft = True
+        path_2.save()
+        path_2.refresh_from_db()
+        self.assertIsNone(path_2.source_pgr)
+        self.assertIsNone(path_2.target_pgr)
+        self.assertEqual(self.get_nodes_count(), 2)
+        path_2.draft = False
+        path_2.save()
+        self.assertEqual(self.get_nodes_count(), 3)
+        path_2.delete()
+        self.assertEqual(self.get_nodes_count(), 2)
@@ -8,6 +8,7 @@ from django.contrib.auth.models import Permission
 from django.contrib.gis.geos import LineString, MultiPolygon, Point, Polygon
 from django.core.cache import caches
 from django.core.files.storage import default_storage
+from django.core.management import call_command
 from django.db import connection
 from django.test import TestCase, override_settings
 from django.urls import reverse
@@ -279,6 +280,48 @@ class PathViewsTest(CommonTest):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/json")
 
+    def get_tile_url(self, geom, z=14, dx=0):
+        origin = 20037508.342789244
+        size = 2 * origin / 2**z
+        point = geom.centroid.transform(3857, clone=True)
+        x, y = int((point.x + origin) // size), int((origin - point.y) // size)
+        return f"/api/path/drf/paths/tiles/{z}/{x + dx}/{y}.mvt"
+
+    def test_tile(self):
+        path = PathFactory(
+            geom=LineString((700000, 6600000), (700100, 6600100), srid=settings.SRID)
+        )
+        response = self.client.get(self.get_tile_url(path.geom))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertIn(b"path", response.content)
+
+    def test_tile_at_the_edge_of_spatial_extent(self):
+        xmin, ymin = settings.SPATIAL_EXTENT[:2]
+        path = PathFactory(
+            geom=LineString((xmin, ymin), (xmin + 100, ymin + 100), srid=settings.SRID)
+        )
+        for z in (2, 4, 8, 14):
+            response = self.client.get(self.get_tile_url(path.geom, z))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"path", response.content)
+        response = self.client.get(self.get_tile_url(path.geom, 14, dx=-1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+
+    def test_tile_without_drafts(self):
+        path = PathFactory(
+            geom=LineString((700000, 6600000), (700100, 6600100), srid=settings.SRID),
+            draft=True,
+        )
+        response = self.client.get(self.get_tile_url(path.geom) + "?_no_draft=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+
+    def test_tile_out_of_range(self):
+        response = self.client.get("/api/path/drf/paths/tiles/1/2/0.mvt")
+        self.assertEqual(response.status_code, 404)
+
     def test_sum_path_zero(self):
         response = self.client.get("/api/path/drf/paths/filter_infos.json")
         self.assertEqual(response.status_code, 200)
@@ -1354,6 +1397,8 @@ class PathRouteViewTestCase(TestCase):
             srid=settings.SRID,
         )
         path2 = PathFactory(geom=pathGeom2)
+        # The graph must be regenerated after modifying PGROUTING_TOLERANCE
+        call_command("generate_pgr_network_topology", "--flush")
 
         response = self.get_route_geometry(
             {
@@ -2345,6 +2390,64 @@ class PathRouteViewTestCase(TestCase):
         cursor.execute("SELECT id, source, target FROM core_path")
         self.assertIn((path2.pk, None, None), cursor.fetchall())
 
+    @override_settings(PATH_ROUTER_IN_MEMORY_GRAPH=True)
+    def test_route_geometry_in_memory_graph_with_draft_path(self):
+        """
+        Same as test_route_geometry_with_draft_path_fail_then_succeed, using the
+        in-memory paths graph, which must be reloaded after path4 is modified
+        """
+        path1 = PathFactory(geom=self.path_geometries["1"])
+        path2 = PathFactory(geom=self.path_geometries["2"])
+        path4 = PathFactory(geom=self.path_geometries["4"], draft=True)
+        steps = {
+            "steps": [
+                dict(ChainMap({"path_id": path1.pk}, self.steps_positions["1"])),
+                dict(ChainMap({"path_id": path2.pk}, self.steps_positions["2"])),
+            ]
+        }
+
+        response1 = self.get_route_geometry(steps)
+        self.assertEqual(response1.status_code, 400)
+
+        path4.draft = False
+        path4.save()
+        response2 = self.get_route_geometry(steps)
+        self.assertEqual(response2.status_code, 200)
+        expected_data = self.get_expected_data(
+            "through_path4",
+            {
+                "1": path1.pk,
+                "2": path2.pk,
+                "4": path4.pk,
+            },
+        )
+        self.check_route_geometry_response(response2.data, expected_data)
+
+    def test_route_geometry_in_memory_graph_same_as_pgrouting(self):
+        """
+        Routing with several steps gives the same result with pgRouting
+        and with the in-memory paths graph
+        """
+        path1 = PathFactory(geom=self.path_geometries["1"])
+        path2 = PathFactory(geom=self.path_geometries["2"])
+        path3 = PathFactory(geom=self.path_geometries["3"])
+        path4 = PathFactory(geom=self.path_geometries["4"])
+        steps = {
+            "steps": [
+                {"path_id": path1.pk, "positionOnPath": 0.2},
+                {"path_id": path4.pk, "positionOnPath": 0.5},
+                {"path_id": path4.pk, "positionOnPath": 0.3},
+                {"path_id": path2.pk, "positionOnPath": 0.6},
+                {"path_id": path3.pk, "positionOnPath": 0.6},
+            ]
+        }
+        response1 = self.get_route_geometry(steps)
+        self.assertEqual(response1.status_code, 200)
+        with override_settings(PATH_ROUTER_IN_MEMORY_GRAPH=True):
+            response2 = self.get_route_geometry(steps)
+        self.assertEqual(response2.status_code, 200)
+        self.check_route_geometry_response(response2.data, response1.data)
+
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, "Test with dynamic segmentation only")
 class PathKmlGPXTest(TestCase):
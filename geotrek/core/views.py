@@ -256,6 +256,7 @@ class PathViewSet(GeotrekMapentityViewSet):
     geojson_serializer_class = PathGeojsonSerializer
     filterset_class = PathFilterSet
     mapentity_list_class = PathList
+    tile_fields = ("id", "draft")
 
     def get_permissions(self):
         if self.action == "route_geometry":
@@ -282,9 +283,11 @@ class PathViewSet(GeotrekMapentityViewSet):
 
     def get_queryset(self):
         qs = self.model.objects.all()
+        if self.format_kwarg in ("geojson", "mvt") and self.request.GET.get(
+            "_no_draft"
+        ):
+            qs = qs.exclude(draft=True)
         if self.format_kwarg == "geojson":
-            if self.request.GET.get("_no_draft"):
-                qs = qs.exclude(draft=True)
             # get display name if name is undefined to display tooltip on map feature hover
             # Can't use annotate because it doesn't allow to use a model field name
             # Can't use Case(When) in qs.extra
@@ -9,7 +9,7 @@ from django.contrib.auth.models import Permission
 from django.contrib.gis.geos import Point
 from django.core import mail
 from django.core.cache import caches
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 from django.test.utils import override_settings
 from django.utils.module_loading import import_string
 from freezegun import freeze_time
@@ -18,6 +18,7 @@ from rest_framework.reverse import reverse
 
 from geotrek.authent.tests.base import AuthentFixturesMixin
 from geotrek.feedback import models as feedback_models
+from geotrek.feedback.views import ReportViewSet
 from geotrek.maintenance.tests.factories import (
     InfrastructureInterventionFactory,
     ReportInterventionFactory,
@@ -348,6 +349,19 @@ class ReportViewsTest(CommonTest):
                 },
             )
 
+    @override_settings(SURICATE_WORKFLOW_ENABLED=True)
+    def test_tile_cache_key_depends_on_user(self):
+        feedback_factories.ReportFactory()
+        view = ReportViewSet()
+        keys = set()
+        for user in (UserFactory(), UserFactory()):
+            view.request = RequestFactory().get(
+                "/api/report/drf/reports/tiles/0/0/0.mvt"
+            )
+            view.request.user = user
+            keys.add(view.get_tile_cache_key(Report.objects.all()))
+        self.assertEqual(len(keys), 2)
+
     @test_for_workflow_mode
     def test_creation_redirects_to_list_view(self):
         data = {
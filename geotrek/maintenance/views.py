@@ -239,6 +239,8 @@ class InterventionViewSet(GeotrekMapentityViewSet):
     gtam_serializer_class = InterventionGTAMSerializer
     filterset_class = InterventionFilterSet
     mapentity_list_class = InterventionList
+    # Geometry of the target, maintained by triggers
+    tile_geometry_field = "geom_3d"
 
     def get_queryset(self):
         qs = self.model.objects.existing()
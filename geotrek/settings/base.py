@@ -360,6 +360,23 @@ CACHES = {
         "LOCATION": os.path.join(CACHE_ROOT, "api_v2"),
         "TIMEOUT": 2592000,  # 30 days
     },
+    # Versions of the API v2 cached responses, which must be shared by all processes,
+    # never culled and incremented atomically
+    "api_v2_versions": {
+        "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+        "TIMEOUT": None,
+        "KEY_PREFIX": "api_v2_versions",
+        "LOCATION": "{}:{}".format(
+            os.getenv("MEMCACHED_HOST", "memcached"),
+            os.getenv("MEMCACHED_PORT", "11211"),
+        ),
+    },
+    # The parsers backend stores the state of downloaded attachments
+    "parsers": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(CACHE_ROOT, "parsers"),
+        "TIMEOUT": 2592000,  # 30 days
+    },
 }
 
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
@@ -491,6 +508,9 @@ PATH_MERGE_SNAPPING_DISTANCE = 2  # minimum distance to merge paths
 # Consult the Geotrek-admin's documentation section that refers to this setting before modifying
 # it, as regenerating pgRouting's network topology is required for the change to take effect.
 PGROUTING_TOLERANCE = 0.001
+# Compute routes with an in-memory copy of the paths graph (loaded once per process
+# and reloaded when paths change) instead of running pgRouting for each pair of steps.
+PATH_ROUTER_IN_MEMORY_GRAPH = False
 
 ALTIMETRIC_PROFILE_PRECISION = 25  # Sampling precision in meters
 ALTIMETRIC_PROFILE_AVERAGE = 2  # nb of points for altimetry moving average
@@ -822,6 +842,11 @@ SWAGGER_SETTINGS = {
 }
 
 API_IS_PUBLIC = True
+# Cache API v2 list responses too (detail responses are always cached)
+API_V2_CACHE_LISTS = False
+# Serialize geometries in database (ST_AsGeoJSON) instead of in Python
+API_V2_GEOJSON_IN_DB = False
+API_V2_GEOJSON_PRECISION = 7
 
 SENSITIVITY_DEFAULT_RADIUS = 100  # meters
 SENSITIVE_AREA_INTERSECTION_MARGIN = 500  # meters (always used)
@@ -952,6 +977,10 @@ REPORT_FILETYPE = "Report"
 PARSER_RETRY_SLEEP_TIME = 60  # time of sleep between requests
 PARSER_NUMBER_OF_TRIES = 3  # number of requests to try before abandon
 PARSER_RETRY_HTTP_STATUS = [503]
+PARSER_READ_AHEAD_PAGES = 1  # number of API pages fetched in advance while parsing
+PARSER_ATTACHMENTS_WORKERS = 4  # number of attachments downloaded at the same time
+# time during which downloaded attachments are not checked again
+PARSER_ATTACHMENTS_CACHE_TIMEOUT = 86400
 
 USE_BOOKLET_PDF = False
 HIDDEN_FORM_FIELDS = {"report": ["current_user"]}
@@ -973,6 +1002,11 @@ SIMPLE_JWT = {
 
 ALLOW_PATH_DELETION_TOPOLOGY = True
 
+# Compute again geometries of topologies in a celery task (by batches) instead
+# of in the path update. Run migrate after changing it.
+TOPOLOGY_GEOMETRY_DEFERRED_UPDATE = False
+TOPOLOGY_GEOMETRY_DEFERRED_UPDATE_BATCH_SIZE = 100
+
 ENABLE_HD_VIEWS = True
 
 PAPERCLIP_ALLOWED_EXTENSIONS = [
@@ -40,3 +40,4 @@ LOGGING['loggers']['']['level'] = 'DEBUG'
 LOGGING['handlers']['console']['level'] = 'INFO'
 
 CACHES['default']['BACKEND'] = 'django.core.cache.backends.locmem.LocMemCache'
+CACHES['api_v2_versions']['BACKEND'] = 'django.core.cache.backends.locmem.LocMemCache'
@@ -35,11 +35,23 @@ CACHES['fat'] = {
     'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     'LOCATION': 'fat',
 }
+# Versions counters of API v2 responses are not rolled back with the test
+# transactions: tests of the cache enable it with override_settings
 CACHES['api_v2'] = {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+}
+CACHES['api_v2_versions'] = {
     'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    'LOCATION': 'api_v2',
+    'LOCATION': 'api_v2_versions',
+}
+CACHES['parsers'] = {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
 }
 
+# Fetch pages and download attachments in the same order as the mocked requests
+PARSER_READ_AHEAD_PAGES = 0
+PARSER_ATTACHMENTS_WORKERS = 1
+
 
 class DisableMigrations:
     def __contains__(self, item):
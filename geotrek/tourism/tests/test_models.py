@@ -7,10 +7,12 @@ from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 from django.test.utils import override_settings
 
+from geotrek.common.utils import intersecting_pks
 from geotrek.core.tests import factories as core_factories
 from geotrek.tourism.models import (
     TouristicContent,
     TouristicContentType,
+    TouristicEvent,
     TouristicEventOrganizer,
 )
 from geotrek.tourism.tests import factories as tourism_factories
@@ -166,6 +168,30 @@ class TourismRelations(TestCase):
         self.assertEqual(self.trek.touristic_contents.all()[0], self.content2)
         self.assertEqual(self.trek.touristic_contents.all()[1], self.content)
 
+    def test_spatial_links_in_batch(self):
+        contents = intersecting_pks(TouristicContent, [self.trek, self.content])
+        self.assertEqual(
+            contents,
+            {
+                self.trek.pk: sorted([self.content.pk, self.content2.pk]),
+                self.content.pk: [self.content2.pk],
+            },
+        )
+
+    def test_spatial_links_in_batch_with_practice_distance(self):
+        self.trek.practice.distance = 10
+        self.trek.practice.save()
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            other_trek = trekking_factories.TrekFactory(paths=[self.path])
+        else:
+            other_trek = trekking_factories.TrekFactory(
+                geom=f"SRID={settings.SRID};LINESTRING(0 100, 100 100)"
+            )
+        with self.assertNumQueries(2):
+            events = intersecting_pks(TouristicEvent, [self.trek, other_trek])
+        self.assertEqual(events[self.trek.pk], [])
+        self.assertEqual(events[other_trek.pk], sorted([self.event.pk, self.event2.pk]))
+
 
 class OrganizerModelTest(TestCase):
     def test_str(self):
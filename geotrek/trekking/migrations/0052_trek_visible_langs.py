@@ -0,0 +1,56 @@
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+def compute_visible_langs(apps, schema_editor):
+    Trek = apps.get_model("trekking", "Trek")
+    OrderedTrekChild = apps.get_model("trekking", "OrderedTrekChild")
+    languages = settings.MODELTRANSLATION_LANGUAGES
+
+    def published_langs(trek):
+        if settings.PUBLISHED_BY_LANG:
+            return {lang for lang in languages if getattr(trek, f"published_{lang}")}
+        return set(languages) if trek.published else set()
+
+    treks = {trek.pk: trek for trek in Trek.objects.all()}
+    visible_langs = {pk: published_langs(trek) for pk, trek in treks.items()}
+    for child_id, parent_id in OrderedTrekChild.objects.values_list(
+        "child_id", "parent_id"
+    ):
+        if not treks[child_id].deleted and not treks[parent_id].deleted:
+            visible_langs[child_id] |= published_langs(treks[parent_id])
+    for pk, langs in visible_langs.items():
+        if langs:
+            Trek.objects.filter(pk=pk).update(
+                visible_langs=[lang for lang in languages if lang in langs]
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trekking", "0051_alter_poi_eid_alter_service_eid_alter_trek_eid"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trek",
+            name="visible_langs",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=10),
+                default=list,
+                editable=False,
+                help_text="Published itself or as the child of a published trek",
+                size=None,
+                verbose_name="Visible in languages",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trek",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["visible_langs"], name="trek_visible_langs_gin_idx"
+            ),
+        ),
+        migrations.RunPython(compute_visible_langs, migrations.RunPython.noop),
+    ]
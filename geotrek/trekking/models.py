@@ -7,10 +7,12 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.gis.db import models
 from django.contrib.gis.db.models.functions import LineLocatePoint, Transform
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db.models import F
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.template.defaultfilters import slugify
 from django.urls import reverse
@@ -411,6 +413,13 @@ class Trek(
     )
     attachments_accessibility = GenericRelation("common.AccessibilityAttachment")
     view_points = GenericRelation("common.HDViewPoint", related_query_name="trek")
+    visible_langs = ArrayField(
+        models.CharField(max_length=10),
+        default=list,
+        editable=False,
+        verbose_name=_("Visible in languages"),
+        help_text=_("Published itself or as the child of a published trek"),
+    )
 
     capture_map_image_waitfor = (
         ".poi_enum_loaded.services_loaded.info_desks_loaded.ref_points_loaded"
@@ -422,6 +431,9 @@ class Trek(
         verbose_name = _("Trek")
         verbose_name_plural = _("Treks")
         ordering = ("name",)
+        indexes = [
+            GinIndex(name="trek_visible_langs_gin_idx", fields=["visible_langs"]),
+        ]
 
     def __str__(self):
         return self.name
@@ -655,8 +667,33 @@ class Trek(
             if picture:
                 return picture
 
+    def get_visible_langs(self, exclude_parent=None):
+        """Languages in which the trek is published, itself or as the child of an existing published trek"""
+        langs = set(self.published_langs)
+        if self.pk is not None and not self.deleted:
+            parents = Trek.objects.existing().filter(trek_children__child=self)
+            if exclude_parent is not None:
+                parents = parents.exclude(pk=exclude_parent)
+            for parent in parents:
+                langs.update(parent.published_langs)
+        return [
+            language[0]
+            for language in settings.MAPENTITY_CONFIG["TRANSLATED_LANGUAGES"]
+            if language[0] in langs
+        ]
+
+    @classmethod
+    def refresh_visible_langs(cls, treks, exclude_parent=None):
+        for trek in treks:
+            visible_langs = trek.get_visible_langs(exclude_parent)
+            if visible_langs != trek.visible_langs:
+                cls.objects.filter(pk=trek.pk).update(visible_langs=visible_langs)
+
     def save(self, *args, **kwargs):
-        if self.pk is not None and kwargs.get("update_fields", None) is None:
+        self.visible_langs = self.get_visible_langs()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "visible_langs"}
+        elif self.pk is not None:
             field_names = set()
             for field in self._meta.concrete_fields:
                 if not field.primary_key and not hasattr(field, "through"):
@@ -670,8 +707,10 @@ class Trek(
                 self.geom_3d, tolerance=0.00001
             ):
                 field_names.remove("geom_3d")
-            return super().save(update_fields=field_names, *args, **kwargs)
+            kwargs["update_fields"] = field_names
         super().save(*args, **kwargs)
+        # Children are visible in the languages their parents are published in
+        Trek.refresh_visible_langs(Trek.objects.filter(trek_parents__parent=self))
 
     def duplicate(self, **kwargs):
         clone = super().duplicate(**kwargs)
@@ -720,6 +759,20 @@ class Trek(
         return {"maplayers": maplayers}
 
 
+@receiver(post_save, sender=OrderedTrekChild)
+def refresh_visible_langs_on_child_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Trek.refresh_visible_langs([instance.child])
+
+
+@receiver(post_delete, sender=OrderedTrekChild)
+def refresh_visible_langs_on_child_delete(sender, instance, **kwargs):
+    # The parent may be being deleted itself
+    Trek.refresh_visible_langs(
+        Trek.objects.filter(pk=instance.child_id), exclude_parent=instance.parent_id
+    )
+
+
 @receiver(pre_delete, sender=Topology)
 def log_cascade_deletion_from_trek_topology(sender, instance, using, **kwargs):
     # Treks are deleted when Topologies are deleted
@@ -557,6 +557,38 @@ class TrekItinerancyTest(TestCase):
         self.assertEqual(list(trekC.children_id), [trekA.id])
 
 
+class TrekVisibleLangsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = TrekFactory(published=False, published_en=False, published_fr=True)
+        cls.child = TrekFactory(published=True, published_en=True, published_fr=False)
+        OrderedTrekChild.objects.create(parent=cls.parent, child=cls.child)
+
+    def test_published_langs(self):
+        self.assertEqual(self.parent.visible_langs, ["fr"])
+
+    def test_inherit_parent_langs(self):
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.visible_langs, ["en", "fr"])
+
+    def test_parent_publication_changes(self):
+        self.parent.published_fr = False
+        self.parent.published_it = True
+        self.parent.save()
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.visible_langs, ["en", "it"])
+
+    def test_parent_removed(self):
+        OrderedTrekChild.objects.filter(child=self.child).delete()
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.visible_langs, ["en"])
+
+    def test_parent_deleted(self):
+        self.parent.delete()
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.visible_langs, ["en"])
+
+
 class MapImageExtentTest(TestCase):
     @classmethod
     def setUpTestData(cls):
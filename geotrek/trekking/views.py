@@ -334,6 +334,14 @@ class TrekMultiDelete(BelongStructureMixin, MapEntityMultiDelete):
 class TrekMultiUpdate(PublishedFieldMixin, BelongStructureMixin, MapEntityMultiUpdate):
     model = Trek
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        # Publication is updated without saving each trek
+        treks = self.get_queryset()
+        Trek.refresh_visible_langs(treks)
+        Trek.refresh_visible_langs(Trek.objects.filter(trek_parents__parent__in=treks))
+        return response
+
 
 class POIList(CustomColumnsMixin, FlattenPicturesMixin, MapEntityList):
     queryset = POI.objects.existing()
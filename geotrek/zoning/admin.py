@@ -3,17 +3,20 @@ from django.utils.translation import gettext as _
 from leaflet.admin import LeafletGeoAdmin
 
 from geotrek.common.mixins.actions import MergeActionMixin
+from geotrek.common.signals import objects_changed
 from geotrek.zoning import models as zoning_models
 
 
 @admin.action(description=_("Publish (visible on Geotrek-rando)"))
 def publish(modeladmin, request, queryset):
     queryset.update(published=True)
+    objects_changed.send(sender=queryset.model)
 
 
 @admin.action(description=_("Unpublish (hidden on Geotrek-rando)"))
 def unpublish(modeladmin, request, queryset):
     queryset.update(published=False)
+    objects_changed.send(sender=queryset.model)
 
 
 class RestrictedAreaTypeAdmin(MergeActionMixin, admin.ModelAdmin):
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from geotrek.zoning.models import ZoningRelation
+
+
+class Command(BaseCommand):
+    help = "Compute again intersections between objects and zones (cities, districts and restricted areas)\n"
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT zoning_relations_rebuild()")
+        if options["verbosity"]:
+            self.stdout.write(
+                f"{ZoningRelation.objects.count()} zoning relations have been computed"
+            )
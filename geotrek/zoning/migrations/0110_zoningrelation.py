@@ -0,0 +1,65 @@
+# Generated by Django 5.2.11 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("zoning", "0109_alter_restrictedarea_name_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ZoningRelation",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_table", models.CharField(max_length=63)),
+                ("object_id", models.IntegerField()),
+                ("position", models.FloatField(null=True)),
+                (
+                    "area",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="zoning_relations",
+                        to="zoning.restrictedarea",
+                    ),
+                ),
+                (
+                    "city",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="zoning_relations",
+                        to="zoning.city",
+                    ),
+                ),
+                (
+                    "district",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="zoning_relations",
+                        to="zoning.district",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["object_table", "object_id"],
+                        name="zoningrelation_object_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,12 +1,72 @@
-import hashlib
-
-from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from geotrek.common.utils import intersecting, uniquify
 
-from .models import City, District, RestrictedArea
+from .models import City, District, RestrictedArea, ZoningRelation
+
+ZONING_MODELS = {
+    "areas": RestrictedArea,
+    "cities": City,
+    "districts": District,
+}
+
+
+def get_zoning_relation_key(obj):
+    """
+    Returns the (table, id) of an object in zoning_zoningrelation,
+    or None if its zones are not maintained by the SQL triggers.
+    """
+    if obj is None or obj.pk is None:
+        return None
+    try:
+        field = obj._meta.get_field("geom")
+    except FieldDoesNotExist:
+        return None
+    table = field.model._meta.db_table
+    if table not in ZoningRelation.OBJECT_TABLES:
+        return None
+    return table, obj.pk
+
+
+def get_zones_queryset(kind):
+    """Zones of a kind, ordered along linear objects then by the zone model ordering"""
+    model = ZONING_MODELS[kind]
+    qs = model.objects.defer("geom")
+    if model is RestrictedArea:
+        qs = qs.select_related("area_type")
+    return qs.order_by(
+        F("zoning_relations__position").asc(nulls_last=True), *model._meta.ordering
+    )
+
+
+def prefetch_zoning(objects, kinds=("cities", "districts", "areas")):
+    """
+    Fetch zones of a list of objects with one query per kind of zone,
+    instead of a few queries per object.
+    """
+    objects_by_key = {}
+    for obj in objects:
+        key = get_zoning_relation_key(obj.zoning_property)
+        if key is not None:
+            objects_by_key.setdefault(key, []).append(obj)
+    for kind in kinds:
+        zones_by_key = {key: [] for key in objects_by_key}
+        tables = {table for table, pk in objects_by_key}
+        for table in tables:
+            ids = [pk for key_table, pk in objects_by_key if key_table == table]
+            zones = get_zones_queryset(kind).filter(
+                zoning_relations__object_table=table,
+                zoning_relations__object_id__in=ids,
+            )
+            for zone in zones.annotate(object_id=F("zoning_relations__object_id")):
+                zones_by_key[table, zone.object_id].append(zone)
+        for key, objs in objects_by_key.items():
+            for obj in objs:
+                prefetched = obj.__dict__.setdefault("_prefetched_zoning", {})
+                prefetched[kind] = zones_by_key[key]
 
 
 class ZoningPropertiesMixin:
@@ -16,6 +76,20 @@ class ZoningPropertiesMixin:
     def zoning_property(self):
         return self
 
+    def get_zones(self, kind):
+        prefetched = getattr(self, "_prefetched_zoning", {})
+        if kind in prefetched:
+            return prefetched[kind]
+        key = get_zoning_relation_key(self.zoning_property)
+        if key is None:
+            return None
+        table, pk = key
+        return list(
+            get_zones_queryset(kind).filter(
+                zoning_relations__object_table=table, zoning_relations__object_id=pk
+            )
+        )
+
     def get_areas(self):
         return uniquify(
             intersecting(
@@ -25,19 +99,9 @@ class ZoningPropertiesMixin:
 
     @property
     def areas(self):
-        last_update_and_count = RestrictedArea.last_update_and_count
-        last_update_iso_format = (
-            last_update_and_count["last_update"].isoformat()
-            if last_update_and_count["last_update"]
-            else "no-data"
-        )
-        count = last_update_and_count["count"]
-        cache_string = f"areas:{self.pk}:{self.date_update.isoformat()}:{last_update_iso_format}:{count}"
-        cache_key = hashlib.md5(cache_string.encode("utf-8")).hexdigest()
-        if cache_key in cache:
-            return cache.get(cache_key)
-        areas = self.get_areas()
-        cache.set(cache_key, areas)
+        areas = self.get_zones("areas")
+        if areas is None:
+            return self.get_areas()
         return areas
 
     def get_districts(self):
@@ -47,19 +111,9 @@ class ZoningPropertiesMixin:
 
     @property
     def districts(self):
-        last_update_and_count = District.last_update_and_count
-        last_update_iso_format = (
-            last_update_and_count["last_update"].isoformat()
-            if last_update_and_count["last_update"]
-            else "no-data"
-        )
-        count = last_update_and_count["count"]
-        cache_string = f"districts:{self.pk}:{self.date_update.isoformat()}:{last_update_iso_format}:{count}"
-        cache_key = hashlib.md5(cache_string.encode("utf-8")).hexdigest()
-        if cache_key in cache:
-            return cache.get(cache_key)
-        districts = self.get_districts()
-        cache.set(cache_key, districts)
+        districts = self.get_zones("districts")
+        if districts is None:
+            return self.get_districts()
         return districts
 
     def get_cities(self):
@@ -69,21 +123,9 @@ class ZoningPropertiesMixin:
 
     @property
     def cities(self):
-        last_update_and_count = City.last_update_and_count
-        last_update_iso_format = (
-            last_update_and_count["last_update"].isoformat()
-            if last_update_and_count["last_update"]
-            else "no-data"
-        )
-        count = last_update_and_count["count"]
-        cache_string = f"cities:{self.pk}:{self.date_update.isoformat()}:{last_update_iso_format}:{count}"
-        cache_key = hashlib.md5(cache_string.encode("utf-8")).hexdigest()
-        data = cache.get(cache_key)
-        if data:
-            return data
-
-        cities = self.get_cities()
-        cache.set(cache_key, cities)
+        cities = self.get_zones("cities")
+        if cities is None:
+            return self.get_cities()
         return cities
 
     @cached_property
@@ -125,3 +125,45 @@ class District(TimeStampedModelMixin, BBoxMixin, models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ZoningRelation(models.Model):
+    """
+    Intersections between objects and zones, maintained by SQL triggers
+    on the zones tables and on the objects tables listed in ``OBJECT_TABLES``.
+    """
+
+    OBJECT_TABLES = (
+        "core_path",
+        "core_topology",
+        "diving_dive",
+        "feedback_report",
+        "outdoor_course",
+        "outdoor_site",
+        "tourism_touristiccontent",
+        "tourism_touristicevent",
+    )
+
+    object_table = models.CharField(max_length=63)
+    object_id = models.IntegerField()
+    city = models.ForeignKey(
+        City, null=True, on_delete=models.CASCADE, related_name="zoning_relations"
+    )
+    district = models.ForeignKey(
+        District, null=True, on_delete=models.CASCADE, related_name="zoning_relations"
+    )
+    area = models.ForeignKey(
+        RestrictedArea,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="zoning_relations",
+    )
+    # Position of the zone along linear objects (fraction of the line)
+    position = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            Index(
+                name="zoningrelation_object_idx", fields=["object_table", "object_id"]
+            ),
+        ]
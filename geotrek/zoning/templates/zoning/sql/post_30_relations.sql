@@ -0,0 +1,168 @@
+-------------------------------------------------------------------------------
+-- Keep intersections between objects and zones in zoning_zoningrelation
+-------------------------------------------------------------------------------
+
+-- Tables followed by the triggers (see ZoningRelation.OBJECT_TABLES)
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_relations_tables() RETURNS text[] IMMUTABLE AS $$
+    SELECT ARRAY[
+        'core_path',
+        'core_topology'
+        {% if "geotrek.diving" in INSTALLED_APPS %}, 'diving_dive'{% endif %}
+        {% if "geotrek.feedback" in INSTALLED_APPS %}, 'feedback_report'{% endif %}
+        {% if "geotrek.outdoor" in INSTALLED_APPS %}, 'outdoor_course', 'outdoor_site'{% endif %}
+        {% if "geotrek.tourism" in INSTALLED_APPS %}, 'tourism_touristiccontent', 'tourism_touristicevent'{% endif %}
+    ]::text[];
+$$ LANGUAGE SQL;
+
+-- Zones tables, with the column referencing them in zoning_zoningrelation
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_relations_zones() RETURNS text[][] IMMUTABLE AS $$
+    SELECT ARRAY[
+        ['zoning_city', 'city_id'],
+        ['zoning_district', 'district_id'],
+        ['zoning_restrictedarea', 'area_id']
+    ]::text[][];
+$$ LANGUAGE SQL;
+
+-- Position of the zone along a linear object, so that zones are listed
+-- in the order they are crossed
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_relation_position(object_geom geometry, zone_geom geometry) RETURNS float IMMUTABLE AS $$
+    SELECT CASE WHEN GeometryType(object_geom) = 'LINESTRING' THEN (
+        SELECT MIN(ST_LineLocatePoint(object_geom, ST_StartPoint(d.geom)))
+        FROM ST_Dump(ST_Intersection(object_geom, zone_geom)) d
+    ) END;
+$$ LANGUAGE SQL;
+
+
+-------------------------------------------------------------------------------
+-- Refresh relations of an object when its geometry changes
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_relations_object_iud() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    t_zone text[];
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM zoning_zoningrelation
+        WHERE object_table = TG_TABLE_NAME::text AND object_id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.geom IS NOT NULL THEN
+        FOREACH t_zone SLICE 1 IN ARRAY zoning_relations_zones() LOOP
+            EXECUTE format(
+                'INSERT INTO zoning_zoningrelation (object_table, object_id, %2$I, position)
+                 SELECT $1, $2, z.id, zoning_relation_position($3, z.geom)
+                 FROM %1$I z WHERE ST_Intersects(z.geom, $3)',
+                t_zone[1], t_zone[2]
+            ) USING TG_TABLE_NAME::text, NEW.id, NEW.geom;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t_table text;
+BEGIN
+    FOREACH t_table IN ARRAY zoning_relations_tables() LOOP
+        EXECUTE format(
+            'CREATE TRIGGER zoning_relations_id_tgr
+             AFTER INSERT OR DELETE ON %I
+             FOR EACH ROW EXECUTE PROCEDURE zoning_relations_object_iud()',
+            t_table
+        );
+        EXECUTE format(
+            'CREATE TRIGGER zoning_relations_u_tgr
+             AFTER UPDATE OF geom ON %I
+             FOR EACH ROW WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+             EXECUTE PROCEDURE zoning_relations_object_iud()',
+            t_table
+        );
+    END LOOP;
+END;
+$$;
+
+
+-------------------------------------------------------------------------------
+-- Refresh relations of a zone when its geometry changes
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_relations_zone_iud() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    t_column text := TG_ARGV[0];
+    t_table text;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('DELETE FROM zoning_zoningrelation WHERE %I = $1', t_column)
+        USING OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        FOREACH t_table IN ARRAY zoning_relations_tables() LOOP
+            EXECUTE format(
+                'INSERT INTO zoning_zoningrelation (object_table, object_id, %2$I, position)
+                 SELECT %1$L, o.id, $1, zoning_relation_position(o.geom, $2)
+                 FROM %1$I o WHERE ST_Intersects(o.geom, $2)',
+                t_table, t_column
+            ) USING NEW.id, NEW.geom;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t_zone text[];
+BEGIN
+    FOREACH t_zone SLICE 1 IN ARRAY zoning_relations_zones() LOOP
+        EXECUTE format(
+            'CREATE TRIGGER %1$s_relations_id_tgr
+             AFTER INSERT OR DELETE ON %1$I
+             FOR EACH ROW EXECUTE PROCEDURE zoning_relations_zone_iud(%2$L)',
+            t_zone[1], t_zone[2]
+        );
+        EXECUTE format(
+            'CREATE TRIGGER %1$s_relations_u_tgr
+             AFTER UPDATE OF geom ON %1$I
+             FOR EACH ROW WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+             EXECUTE PROCEDURE zoning_relations_zone_iud(%2$L)',
+            t_zone[1], t_zone[2]
+        );
+    END LOOP;
+END;
+$$;
+
+
+-------------------------------------------------------------------------------
+-- Rebuild all relations (see rebuild_zoning_relations command)
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_relations_rebuild() RETURNS void SECURITY DEFINER AS $$
+DECLARE
+    t_table text;
+    t_zone text[];
+BEGIN
+    DELETE FROM zoning_zoningrelation;
+    FOREACH t_table IN ARRAY zoning_relations_tables() LOOP
+        FOREACH t_zone SLICE 1 IN ARRAY zoning_relations_zones() LOOP
+            EXECUTE format(
+                'INSERT INTO zoning_zoningrelation (object_table, object_id, %3$I, position)
+                 SELECT %1$L, o.id, z.id, zoning_relation_position(o.geom, z.geom)
+                 FROM %1$I o JOIN %2$I z ON ST_Intersects(o.geom, z.geom)',
+                t_table, t_zone[1], t_zone[2]
+            );
+        END LOOP;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial fill only, relations are then kept up to date by triggers
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM zoning_zoningrelation) THEN
+        PERFORM zoning_relations_rebuild();
+    END IF;
+END;
+$$;
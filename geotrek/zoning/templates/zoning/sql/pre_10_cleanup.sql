@@ -19,3 +19,12 @@ DROP VIEW IF EXISTS f_v_secteur CASCADE;
 DROP VIEW IF EXISTS v_districts CASCADE;
 DROP VIEW IF EXISTS f_v_zonage CASCADE;
 DROP VIEW IF EXISTS v_restrictedareas CASCADE;
+
+-- 30
+
+DROP FUNCTION IF EXISTS zoning_relations_object_iud() CASCADE;
+DROP FUNCTION IF EXISTS zoning_relations_zone_iud() CASCADE;
+DROP FUNCTION IF EXISTS zoning_relations_rebuild() CASCADE;
+DROP FUNCTION IF EXISTS zoning_relation_position(geometry, geometry) CASCADE;
+DROP FUNCTION IF EXISTS zoning_relations_tables() CASCADE;
+DROP FUNCTION IF EXISTS zoning_relations_zones() CASCADE;
@@ -6,7 +6,15 @@ from django.core.management import call_command
 from django.core.management.base import CommandError
 from django.test import TestCase, override_settings
 
-from geotrek.zoning.models import City, District, RestrictedArea, RestrictedAreaType
+from geotrek.core.tests.factories import PathFactory
+from geotrek.zoning.models import (
+    City,
+    District,
+    RestrictedArea,
+    RestrictedAreaType,
+    ZoningRelation,
+)
+from geotrek.zoning.tests.factories import CityFactory
 
 
 class RestrictedAreasCommandTest(TestCase):
@@ -488,3 +496,23 @@ class DistrictsCommandTest(TestCase):
         self.assertIn("NOM, Insee", output.getvalue())
         call_command("loaddistricts", self.filename, "-i", name="toto", stdout=output)
         self.assertIn("NOM, Insee", output.getvalue())
+
+
+class RebuildZoningRelationsCommandTest(TestCase):
+    def test_rebuild_zoning_relations(self):
+        city = CityFactory.create(
+            geom="SRID=2154;MULTIPOLYGON(((200000 300000, 900000 300000, 900000 1200000, 200000 1200000, "
+            "200000 300000)))"
+        )
+        path = PathFactory.create(
+            geom="SRID=2154;LINESTRING(200000 300000, 300000 400000)"
+        )
+        ZoningRelation.objects.all().delete()
+        output = StringIO()
+        call_command("rebuild_zoning_relations", stdout=output)
+        self.assertIn("zoning relations have been computed", output.getvalue())
+        self.assertTrue(
+            ZoningRelation.objects.filter(
+                object_table="core_path", object_id=path.pk, city=city
+            ).exists()
+        )
@@ -1,9 +1,13 @@
+from django.apps import apps
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase
 
 from geotrek.core.models import Path
 from geotrek.core.tests.factories import PathFactory
 from geotrek.trekking.tests.factories import TrekFactory
+from geotrek.zoning.mixins import prefetch_zoning
+from geotrek.zoning.models import ZoningRelation
 from geotrek.zoning.tests.factories import (
     CityFactory,
     DistrictFactory,
@@ -139,3 +143,61 @@ class ZoningPropertiesMixinTest(TestCase):
             [a.pk for a in path.published_areas], [area.pk, self.area.pk]
         )
         self.assertEqual(len(path.published_areas), 2)
+
+    def test_relations_follow_zones_changes(self):
+        city = CityFactory.create(geom=self.geom_2_wkt)
+        self.assertListEqual([c.pk for c in self.path.cities], [self.city.pk, city.pk])
+
+        city.geom = "SRID=2154;MULTIPOLYGON(((0 0, 1000 0, 1000 1000, 0 1000, 0 0)))"
+        city.save()
+        self.assertListEqual([c.pk for c in self.path.cities], [self.city.pk])
+
+        self.city.delete()
+        self.assertListEqual(self.path.cities, [])
+        self.assertFalse(ZoningRelation.objects.filter(city__isnull=False).exists())
+
+    def test_relations_follow_objects_changes(self):
+        self.path.geom = "SRID=2154;LINESTRING(0 0, 1000 1000)"
+        self.path.save()
+        self.assertListEqual(Path.objects.get(pk=self.path.pk).cities, [])
+
+        path = PathFactory.create(
+            geom="SRID=2154;LINESTRING(200000 300000, 300000 400000)"
+        )
+        self.assertListEqual(path.cities, [self.city])
+        pk = path.pk
+        path.delete()
+        self.assertFalse(
+            ZoningRelation.objects.filter(
+                object_table="core_path", object_id=pk
+            ).exists()
+        )
+
+    def test_prefetch_zoning(self):
+        other_path = PathFactory.create(geom="SRID=2154;LINESTRING(0 0, 1000 1000)")
+        paths = list(Path.objects.filter(pk__in=[self.path.pk, other_path.pk]))
+        with self.assertNumQueries(3):
+            prefetch_zoning(paths)
+        with self.assertNumQueries(0):
+            zones = {
+                path.pk: (path.cities, path.districts, path.areas) for path in paths
+            }
+        self.assertEqual(
+            zones[self.path.pk], ([self.city], [self.district], [self.area])
+        )
+        self.assertEqual(zones[other_path.pk], ([], [], []))
+
+    def test_triggers_installed(self):
+        tables = [
+            model._meta.db_table
+            for model in apps.get_models()
+            if model._meta.db_table in ZoningRelation.OBJECT_TABLES
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT event_object_table FROM information_schema.triggers "
+                "WHERE trigger_name = 'zoning_relations_id_tgr'"
+            )
+            triggered = {row[0] for row in cursor.fetchall()}
+        self.assertTrue(tables)
+        self.assertSetEqual(set(tables), triggered)